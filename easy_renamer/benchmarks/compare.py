@@ -0,0 +1,52 @@
+"""2つのベンチマーク結果（run.pyのJSON）を比べ、遅くなった計測を表示する
+
+    python benchmarks/compare.py results/old.json results/new.json --threshold 1.2
+
+遅くなった計測がthresholdを超えていれば終了コード1を返す。
+"""
+import argparse
+import json
+import sys
+
+def load(path):
+    with open(path, "r", encoding="utf-8") as f:
+        result = json.load(f)
+    records = {}
+    for record in result["results"]:
+        records[(record["name"], record["files"], record["word_map"])] = record
+    return result, records
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="2つのベンチマーク結果を比べる")
+    parser.add_argument("base", help="基準の結果JSON")
+    parser.add_argument("new", help="比べる結果JSON")
+    parser.add_argument("--threshold", type=float, default=1.2, help="遅くなったとみなす比率（既定: 1.2）")
+    parser.add_argument("--min-seconds", type=float, default=0.01, help="これより短い計測は誤差が大きいので判定しない")
+    args = parser.parse_args(argv)
+
+    base, base_records = load(args.base)
+    new, new_records = load(args.new)
+    print(f"基準: {base.get('commit')} ({base.get('time')})  比較: {new.get('commit')} ({new.get('time')})")
+    print(f"{'計測':<14} {'件数':>8} {'word_map':>8} {'基準(秒)':>10} {'比較(秒)':>10} {'比率':>7}")
+    regressions = 0
+    for key, record in new_records.items():
+        name, files, word_map = key
+        old = base_records.get(key)
+        if old is None:
+            continue
+        ratio = record["seconds"] / old["seconds"] if old["seconds"] > 0 else float("inf")
+        mark = ""
+        if ratio > args.threshold and max(record["seconds"], old["seconds"]) >= args.min_seconds:
+            mark = "  遅化"
+            regressions += 1
+        elif ratio < 1 / args.threshold:
+            mark = "  改善"
+        print(f"{name:<14} {files:>8} {word_map if word_map is not None else '-':>8} "
+              f"{old['seconds']:>10.3f} {record['seconds']:>10.3f} {ratio:>6.2f}x{mark}")
+    missing = [key for key in base_records if key not in new_records]
+    if missing:
+        print(f"比較側に無い計測: {len(missing)}件")
+    return 1 if regressions else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,124 @@
+"""ベンチマーク用の合成コーパス（A1111形式の生成情報を持つPNG/JPEGとword_map）を作る"""
+import io
+import json
+import os
+import random
+import shutil
+import struct
+import zlib
+
+# よく使われるタグ（プロンプトとword_mapの両方に使う）
+TAGS = [
+    "masterpiece", "best quality", "high quality", "ultra detailed", "absurdres", "highres", "8k",
+    "1girl", "1boy", "solo", "2girls", "multiple girls", "looking at viewer", "smile", "open mouth",
+    "blush", "closed eyes", "long hair", "short hair", "medium hair", "very long hair", "black hair",
+    "blonde hair", "brown hair", "silver hair", "white hair", "pink hair", "blue hair", "red hair",
+    "twintails", "ponytail", "hime cut", "bangs", "blue eyes", "red eyes", "green eyes", "brown eyes",
+    "large breasts", "small breasts", "medium breasts", "huge breasts", "school uniform", "serafuku",
+    "dress", "white dress", "kimono", "swimsuit", "bikini", "maid", "jacket", "skirt", "pleated skirt",
+    "thighhighs", "pantyhose", "boots", "gloves", "hat", "ribbon", "hair ribbon", "hair ornament",
+    "jewelry", "earrings", "necklace", "outdoors", "indoors", "sky", "cloud", "night", "sunset",
+    "beach", "city", "street", "classroom", "bedroom", "forest", "flower", "cherry blossoms", "rain",
+    "snow", "upper body", "full body", "cowboy shot", "portrait", "from above", "from below",
+    "from side", "standing", "sitting", "lying", "walking", "arms up", "hand on hip", "peace sign",
+    "depth of field", "bokeh", "lens flare", "cinematic lighting", "dramatic lighting", "anime",
+    "realistic", "photorealistic", "illustration", "watercolor", "mifl",
+]
+NEGATIVE = "lowres, bad anatomy, bad hands, text, error, missing fingers, worst quality, low quality, jpeg artifacts, signature, watermark"
+SAMPLERS = ["Euler a", "DPM++ 2M Karras", "DPM++ SDE Karras", "DDIM", "UniPC"]
+MODELS = [("anything-v5", "7f96a1a9ca"), ("counterfeit-v3", "cbfba64e66"), ("meinamix", "e4a30e4607")]
+PNG_SIGNATURE = b"\x89PNG\r\n\x1a\n"
+
+def make_prompt(rng):
+    """A1111のparametersテキストを1つ作る"""
+    tags = rng.sample(TAGS, rng.randint(12, 35))
+    words = [f"({tag}:{rng.choice((1.1, 1.2, 1.3))})" if rng.random() < 0.1 else tag for tag in tags]
+    model, model_hash = rng.choice(MODELS)
+    width, height = rng.choice(((512, 768), (768, 512), (512, 512), (832, 1216)))
+    return (
+        ", ".join(words) + "\n"
+        f"Negative prompt: {NEGATIVE}\n"
+        f"Steps: {rng.choice((20, 25, 28, 30))}, Sampler: {rng.choice(SAMPLERS)}, "
+        f"CFG scale: {rng.choice((5, 6, 7, 7.5, 8))}, Seed: {rng.randrange(2 ** 32)}, "
+        f"Size: {width}x{height}, Model hash: {model_hash}, Model: {model}"
+    )
+
+def make_word_map(size, rng):
+    """size件のword_mapを作る（実在タグを優先し、足りない分は合成タグで埋める）"""
+    word_map = {}
+    for index, tag in enumerate(TAGS[:size]):
+        word_map[tag] = f"訳語{index}"
+    index = len(word_map)
+    while len(word_map) < size:
+        word_map[f"synthetic tag {index} {rng.randrange(10 ** 6)}"] = f"合成{index}"
+        index += 1
+    return word_map
+
+def png_chunk(chunk_type, data):
+    return struct.pack(">I", len(data)) + chunk_type + data + struct.pack(">I", zlib.crc32(chunk_type + data) & 0xFFFFFFFF)
+
+def png_pixels(size, rng):
+    """size x size のRGB画像のIDAT（ノイズを混ぜて実際の画像程度に圧縮しにくくする）"""
+    row = bytes(rng.randrange(256) for _ in range(size * 3))
+    raw = b"".join(b"\x00" + row[i:] + row[:i] for i in range(size))
+    return zlib.compress(raw, 6)
+
+def make_png(parameters, idat, size):
+    ihdr = struct.pack(">IIBBBBB", size, size, 8, 2, 0, 0, 0)
+    return (PNG_SIGNATURE + png_chunk(b"IHDR", ihdr)
+            + png_chunk(b"tEXt", b"parameters\x00" + parameters.encode("latin-1", errors="replace"))
+            + png_chunk(b"IDAT", idat) + png_chunk(b"IEND", b""))
+
+def exif_user_comment(text):
+    """UserComment（UNICODE, リトルエンディアン）だけを持つTIFF構造"""
+    comment = b"UNICODE\x00" + text.encode("utf-16-le")
+    ifd0 = struct.pack("<H", 1) + struct.pack("<HHII", 0x8769, 4, 1, 26) + struct.pack("<I", 0)
+    exif_ifd = struct.pack("<H", 1) + struct.pack("<HHII", 0x9286, 7, len(comment), 44) + struct.pack("<I", 0)
+    return b"II*\x00" + struct.pack("<I", 8) + ifd0 + exif_ifd + comment
+
+def jpeg_template(size):
+    """Pillowで小さなJPEGを1つだけ作り、以降はAPP1を差し込んで使い回す"""
+    from PIL import Image
+
+    buffer = io.BytesIO()
+    Image.effect_noise((size, size), 64).convert("RGB").save(buffer, "JPEG", quality=85)
+    return buffer.getvalue()
+
+def make_jpeg(parameters, template):
+    payload = b"Exif\x00\x00" + exif_user_comment(parameters)
+    app1 = b"\xff\xe1" + struct.pack(">H", len(payload) + 2) + payload
+    return template[:2] + app1 + template[2:]
+
+def build_corpus(folder, count, jpeg_ratio=0.2, seed=0, pixels=64):
+    """folderにcount枚の画像を作る（既に同じ条件で作られていれば再利用する）。画像パスのリストを返す"""
+    manifest_path = os.path.join(folder, "corpus.json")
+    spec = {"count": count, "jpeg_ratio": jpeg_ratio, "seed": seed, "pixels": pixels}
+    if os.path.exists(manifest_path):
+        with open(manifest_path, "r", encoding="utf-8") as f:
+            manifest = json.load(f)
+        # リネームの計測が途中で止まった場合などは、名前が揃っていないので作り直す
+        names = set(os.listdir(folder))
+        if (manifest.get("spec") == spec and len(names) == count + 1
+                and all(os.path.basename(p) in names for p in manifest["paths"])):
+            return manifest["paths"]
+    shutil.rmtree(folder, ignore_errors=True)
+
+    os.makedirs(folder)
+    rng = random.Random(seed)
+    idat = png_pixels(pixels, rng)
+    template = jpeg_template(pixels) if jpeg_ratio > 0 else None
+    paths = []
+    for index in range(count):
+        parameters = make_prompt(rng)
+        if template is not None and rng.random() < jpeg_ratio:
+            path = os.path.join(folder, f"{index:06d}.jpg")
+            data = make_jpeg(parameters, template)
+        else:
+            path = os.path.join(folder, f"{index:06d}.png")
+            data = make_png(parameters, idat, pixels)
+        with open(path, "wb") as f:
+            f.write(data)
+        paths.append(path)
+    with open(manifest_path, "w", encoding="utf-8") as f:
+        json.dump({"spec": spec, "paths": paths}, f)
+    return paths
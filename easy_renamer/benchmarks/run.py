@@ -0,0 +1,217 @@
+"""合成コーパスで主要な処理の時間を計測し、結果をJSONに保存する
+
+    python benchmarks/run.py                      # 1,000 / 10,000件
+    python benchmarks/run.py --full               # 1,000〜200,000件
+    python benchmarks/run.py --sizes 5000 --word-maps 10,20000 -o result.json
+
+コーパスは一時フォルダに作って次回以降も使い回す（--rootで変更可）。
+結果の比較は benchmarks/compare.py で行う。
+"""
+import argparse
+import json
+import logging
+import os
+import platform
+import random
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+SRC_DIR = os.path.join(os.path.dirname(BENCH_DIR), "src")
+sys.path.insert(0, SRC_DIR)
+
+from corpus import build_corpus, make_word_map
+from core.metadata import MetadataParser
+from core.normalize import normalize_string
+from core.plan import build_plan, SUFFIX
+from core.renamer import Renamer
+from core.settings import Settings
+from core.template import compile_template
+from utils.log import setup_logging
+from utils.width import display_width
+
+logger = logging.getLogger("benchmarks")
+
+QUICK_SIZES = (1000, 10000)
+FULL_SIZES = (1000, 10000, 50000, 200000)
+WORD_MAPS = (10, 1000, 20000)
+RENAME_WORD_MAP = 1000
+# 合成word_mapの先頭に必ず入るタグを使う
+PATTERN = "{masterpiece} {1girl} {solo} {seed} {seq:6}"
+
+class Recorder:
+    """計測結果をためる"""
+
+    def __init__(self):
+        self.records = []
+
+    def measure(self, name, func, files, word_map=None, items=None):
+        """func()の所要時間を記録し、その戻り値を返す"""
+        started = time.perf_counter()
+        result = func()
+        seconds = time.perf_counter() - started
+        items = files if items is None else items
+        self.records.append({
+            "name": name,
+            "files": files,
+            "word_map": word_map,
+            "seconds": round(seconds, 6),
+            "items": items,
+            "per_second": round(items / seconds, 1) if seconds > 0 else None,
+        })
+        logger.info("%-14s files=%-7d word_map=%-6s %9.3f秒", name, files, word_map if word_map is not None else "-", seconds)
+        return result
+
+def prepare_workdir(root, name, word_map):
+    """settings.jsonを置いた空の作業フォルダに移動する（キャッシュやジャーナルもここに作られる）"""
+    workdir = os.path.join(root, "work", name)
+    shutil.rmtree(workdir, ignore_errors=True)
+    os.makedirs(workdir)
+    with open(os.path.join(workdir, "settings.json"), "w", encoding="utf-8") as f:
+        json.dump({"templates": ["カスタム"], "search_words": [], "word_map": word_map}, f, ensure_ascii=False)
+    os.chdir(workdir)
+    # 設定はプロセスで共有されているので、このフォルダのsettings.jsonに切り替える
+    Settings().reload(os.path.join(workdir, "settings.json"))
+    # 正規化の結果も前の計測から持ち越さない
+    normalize_string.cache_clear()
+    return workdir
+
+def bench_parse(recorder, root, paths, word_map_size, jobs):
+    """MetadataParserの初期化・parse（キャッシュなし/あり）・parse_manyとパターンの展開"""
+    files = len(paths)
+    word_map = make_word_map(word_map_size, random.Random(word_map_size))
+    prepare_workdir(root, f"parse-{files}-{word_map_size}", word_map)
+    parser = recorder.measure("parser_init", MetadataParser, files, word_map_size, items=1)
+    recorder.measure("parse_cold", lambda: [parser.parse(p) for p in paths], files, word_map_size)
+    parser.cache.flush()
+    recorder.measure("parse_warm", lambda: [parser.parse(p) for p in paths], files, word_map_size)
+
+    prepare_workdir(root, f"parse-many-{files}-{word_map_size}", word_map)
+    parser = MetadataParser()
+    results = recorder.measure("parse_many", lambda: list(parser.parse_many(paths, jobs)), files, word_map_size)
+    parser.cache.flush()
+
+    template = compile_template(PATTERN, parser.matcher)
+    names = recorder.measure("render", lambda: [template.render(i, path, translated, fields)
+                                                for i, (path, translated, fields) in enumerate(results)],
+                             files, word_map_size)
+    recorder.measure("width", lambda: [display_width(name) for name in names], files, word_map_size)
+
+def bench_rename(recorder, root, paths, jobs):
+    """Renamerの計画（キャッシュなし/あり）・実行・取り消しと、循環する名前の計画"""
+    files = len(paths)
+    word_map = make_word_map(RENAME_WORD_MAP, random.Random(RENAME_WORD_MAP))
+    prepare_workdir(root, f"rename-{files}", word_map)
+    renamer = Renamer()
+    recorder.measure("plan_cold", lambda: renamer.plan_renames(paths, PATTERN, jobs=jobs), files, RENAME_WORD_MAP)
+    renamer.metadata_parser.cache.flush()
+    plan = recorder.measure("plan_warm", lambda: renamer.plan_renames(paths, PATTERN, jobs=jobs), files, RENAME_WORD_MAP)
+
+    renamed = recorder.measure("execute", lambda: renamer.execute(plan), files, RENAME_WORD_MAP, items=len(plan.pending()))
+    results = recorder.measure("undo", renamer.undo_last, files, RENAME_WORD_MAP, items=len(renamed))
+    restored = sum(1 for _, _, status in results if status == "renamed")
+    if restored != len(renamed):
+        # コーパスが壊れたまま次の計測に使われないようにする（次回のbuild_corpusで作り直される）
+        raise RuntimeError(f"undo restored {restored} of {len(renamed)} files")
+
+    # 全ファイルが1つ隣の名前に変わる（1つの大きな循環）最悪ケース
+    pairs = list(zip(paths, paths[1:] + paths[:1]))
+    recorder.measure("plan_cycle", lambda: build_plan(pairs, SUFFIX), files)
+
+def bench_load_images(recorder, folder, files):
+    """ImageList.load_imagesで走査が終わり、全件がモデルに入るまで（PyQt5が無ければ省略）"""
+    os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+    try:
+        from PyQt5.QtCore import QEventLoop
+        from PyQt5.QtWidgets import QApplication
+        from ui.image_list import ImageList
+    except ImportError as e:
+        logger.warning("Skipping load_images: %s", e)
+        return
+    app = QApplication.instance() or QApplication([])
+    image_list = ImageList()
+
+    def load():
+        image_list.load_images(folder)
+        # 走査が終わるとhandle_scan_finishedでscannerがNoneになる
+        while image_list.scanner is not None:
+            app.processEvents(QEventLoop.WaitForMoreEvents)
+        return len(image_list.images)
+
+    loaded = recorder.measure("load_images", load, files)
+    if loaded != files:
+        raise RuntimeError(f"load_images found {loaded} of {files} files")
+    image_list.deleteLater()
+
+def git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=BENCH_DIR, capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def parse_sizes(text):
+    return [int(value.replace("_", "")) for value in text.split(",") if value.strip()]
+
+def build_parser():
+    parser = argparse.ArgumentParser(description="合成したStable Diffusion画像で処理時間を計測する")
+    parser.add_argument("--sizes", type=parse_sizes, help="画像の枚数（カンマ区切り、既定: 1000,10000）")
+    parser.add_argument("--full", action="store_true", help="1,000〜200,000件で計測する")
+    parser.add_argument("--word-maps", type=parse_sizes, default=list(WORD_MAPS), help="word_mapの件数（カンマ区切り、既定: 10,1000,20000）")
+    parser.add_argument("--jpeg-ratio", type=float, default=0.2, help="JPEGの割合（既定: 0.2）")
+    parser.add_argument("-j", "--jobs", type=int, default=None, help="parse_manyと計画の並列数")
+    parser.add_argument("--root", default=os.path.join(tempfile.gettempdir(), "easy_renamer_bench"),
+                        help="コーパスと作業フォルダの場所")
+    parser.add_argument("--skip", default="", help="省略する計測（parse, rename, load_imagesをカンマ区切り）")
+    parser.add_argument("-o", "--output", help="結果のJSON（既定: benchmarks/results/日時-コミット.json）")
+    return parser
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    setup_logging()
+    sizes = args.sizes or (FULL_SIZES if args.full else QUICK_SIZES)
+    skip = {name.strip() for name in args.skip.split(",") if name.strip()}
+    root = os.path.abspath(args.root)
+    # 計測中は作業フォルダに移動するので、先に絶対パスにしておく
+    output = os.path.abspath(args.output) if args.output else None
+    commit = git_commit()
+    started = time.time()
+    recorder = Recorder()
+    # 幅と不可視文字の表は初回だけ作られるので、最初の計測に含めないよう先に作っておく
+    display_width("幅")
+    normalize_string("幅")
+
+    for size in sizes:
+        folder = os.path.join(root, f"corpus-{size}")
+        paths = build_corpus(folder, size, args.jpeg_ratio)
+        if "parse" not in skip:
+            for word_map_size in args.word_maps:
+                bench_parse(recorder, root, paths, word_map_size, args.jobs)
+        if "rename" not in skip:
+            bench_rename(recorder, root, paths, args.jobs)
+        if "load_images" not in skip:
+            bench_load_images(recorder, folder, size)
+
+    result = {
+        "commit": commit,
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "time": time.strftime("%Y-%m-%dT%H:%M:%S", time.localtime(started)),
+        "options": {"sizes": list(sizes), "word_maps": args.word_maps, "jpeg_ratio": args.jpeg_ratio,
+                    "jobs": args.jobs, "pattern": PATTERN},
+        "results": recorder.records,
+    }
+    if output is None:
+        name = time.strftime("%Y%m%d-%H%M%S", time.localtime(started)) + (f"-{commit}" if commit else "")
+        output = os.path.join(BENCH_DIR, "results", name + ".json")
+    os.makedirs(os.path.dirname(output), exist_ok=True)
+    with open(output, "w", encoding="utf-8") as f:
+        json.dump(result, f, ensure_ascii=False, indent=2)
+    logger.info("Saved results to %s", output)
+
+if __name__ == "__main__":
+    main()
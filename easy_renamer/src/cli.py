@@ -0,0 +1,159 @@
+"""PyQt5を使わずにフォルダやglobの画像を一括リネームするコマンドラインモード"""
+import argparse
+import cProfile
+import glob
+import json
+import os
+import pstats
+import sys
+from core.executor import execute_plan
+from utils.log import setup_logging
+from core.plan import POLICIES, SUFFIX, FAILED, UNCHANGED, SKIPPED
+from core.renamer import Renamer
+from core.settings import Settings
+from core.stats import STATS
+from core.template import TemplateError
+from core.scanner import IMAGE_EXTENSIONS, scan_images
+
+def build_parser():
+    parser = argparse.ArgumentParser(
+        prog="easy_renamer",
+        description="Stable Diffusion画像をメタデータに基づいて一括リネームする（GUIなし）"
+    )
+    parser.add_argument("paths", nargs="*", help="対象のフォルダ、画像ファイル、またはglobパターン")
+    parser.add_argument("-p", "--pattern", help="リネームパターン（例: \"{long hair} gr1\"）")
+    parser.add_argument("--fixed-part", default="", help="連番の固定部分（例: gr）")
+    parser.add_argument("--start", default="1", help="連番の開始番号（例: 001）")
+    parser.add_argument("--dry-run", action="store_true", help="リネームせずに計画だけを出力する")
+    parser.add_argument("--on-conflict", choices=POLICIES, default=SUFFIX,
+                        help="名前が重複した時の扱い（番号を付ける / スキップ / 上書き）")
+    parser.add_argument("--resume", action="store_true", help="途中で中断されたリネームの残りを実行する（再開しない場合は--discard）")
+    parser.add_argument("--discard", action="store_true",
+                        help="途中で中断されたリネームを再開せずに閉じる（一時名のファイルは元の名前に戻し、以降は再開の対象にしない）")
+    parser.add_argument("--undo", action="store_true", help="最後に実行したリネームを元に戻す")
+    parser.add_argument("--import-words", metavar="PATH", help="CSV/TSVの (英語, 日本語) をword_mapに取り込む")
+    parser.add_argument("--replace-words", action="store_true", help="--import-wordsでファイルに無いワードを削除する")
+    parser.add_argument("--export-words", metavar="PATH", help="word_mapをCSV/TSVに書き出す（拡張子が.tsvならタブ区切り）")
+    parser.add_argument("-v", "--verbose", action="store_true", help="ファイルごとの処理を含む詳細なログを標準エラーに出す")
+    parser.add_argument("--stats", nargs="?", const="-", metavar="PATH",
+                        help="段階ごとの時間と件数をJSONで書き出す（PATH省略時は標準エラー）")
+    parser.add_argument("--profile", metavar="PATH", help="cProfileで計測し、結果をPATHに保存して上位を標準エラーに出す（抽出も計測できるよう--jobsの既定は1になる）")
+    parser.add_argument("-j", "--jobs", type=int, default=None, help="メタデータ抽出の並列数")
+    return parser
+
+def collect_images(paths):
+    """フォルダ・ファイル・globパターンから画像パスを集め、名前順に並べる"""
+    images = []
+    for path in paths:
+        if os.path.isdir(path):
+            for batch in scan_images(path):
+                images.extend(batch)
+        elif os.path.isfile(path):
+            images.append(path)
+        else:
+            images.extend(p for p in glob.glob(path, recursive=True)
+                          if p.lower().endswith(IMAGE_EXTENSIONS) and os.path.isfile(p))
+    # 重複を除き、連番が安定するよう名前順にする
+    return sorted(set(images))
+
+def emit(record, out):
+    out.write(json.dumps(record, ensure_ascii=False) + "\n")
+
+def run_journal(args, out):
+    """--resume / --undo / --discard: ジャーナルに記録されたリネームを再開・取り消し・破棄する"""
+    renamer = Renamer()
+    if args.discard:
+        left = renamer.discard_interrupted()
+        for path in left:
+            emit({"source": path, "status": "error", "error": "could not restore the original name"}, out)
+        emit({"status": "discarded", "left": len(left)}, out)
+        return 1 if left else 0
+    results = renamer.undo_last() if args.undo else renamer.resume()
+    failed = 0
+    for source, target, status in results:
+        if status not in ("renamed", "already"):
+            failed += 1
+        emit({"source": source, "target": target, "status": status}, out)
+    return 1 if failed else 0
+
+def run_words(args, out):
+    """--import-words / --export-words: word_mapをCSV/TSVと相互に変換する"""
+    word_map = Settings().get_word_map()
+    try:
+        if args.import_words:
+            changed = word_map.import_file(args.import_words, args.replace_words)
+            emit({"status": "imported", "path": args.import_words, "changed": changed, "total": len(word_map)}, out)
+        if args.export_words:
+            count = word_map.export_file(args.export_words)
+            emit({"status": "exported", "path": args.export_words, "total": count}, out)
+    except (OSError, UnicodeDecodeError) as e:
+        emit({"status": "error", "error": str(e)}, out)
+        return 1
+    return 0
+
+def run(args, out):
+    images = collect_images(args.paths)
+    if not images:
+        emit({"status": "error", "error": "no images found"}, out)
+        return 1
+
+    renamer = Renamer()
+    try:
+        renamer.compile_pattern(args.pattern, args.fixed_part, args.start)
+    except TemplateError as e:
+        emit({"status": "error", "error": str(e), "unknown": e.unknown}, out)
+        return 2
+    plan = renamer.plan_renames(images, args.pattern, args.fixed_part, args.start, args.jobs, args.on_conflict)
+    if args.dry_run:
+        for op in plan.ops:
+            emit(op.to_dict(), out)
+        return 0
+
+    failed = 0
+    for op in execute_plan(plan, renamer.journal):
+        if op.status == FAILED:
+            failed += 1
+        emit(op.to_dict(), out)
+    # 実行しなかった操作（変更なし・スキップ）も報告する
+    for op in plan.ops:
+        if op.status in (UNCHANGED, SKIPPED):
+            emit(op.to_dict(), out)
+    return 1 if failed else 0
+
+def main(argv=None):
+    parser = build_parser()
+    args = parser.parse_args(argv)
+    words = args.import_words or args.export_words
+    journal = args.resume or args.undo or args.discard
+    if not (journal or words) and (not args.paths or not args.pattern):
+        parser.error("paths and --pattern are required unless --resume, --undo, --discard, --import-words or --export-words is given")
+    # ログは標準エラーに出るので、標準出力はJSON Linesだけになる
+    setup_logging(args.verbose)
+    if words:
+        command = run_words
+    elif journal:
+        command = run_journal
+    else:
+        command = run
+    if args.profile:
+        if args.jobs is None:
+            args.jobs = 1  # cProfileはメインスレッドしか計測しないので、抽出も同じスレッドで行う
+        profiler = cProfile.Profile()
+        status = profiler.runcall(command, args, sys.stdout)
+        profiler.dump_stats(args.profile)
+        pstats.Stats(profiler, stream=sys.stderr).sort_stats("cumulative").print_stats(25)
+    else:
+        status = command(args, sys.stdout)
+    if args.stats:
+        write_stats(args.stats)
+    return status
+
+def write_stats(path):
+    if path == "-":
+        sys.stderr.write(STATS.to_json() + "\n")
+    else:
+        with open(path, "w", encoding="utf-8") as f:
+            f.write(STATS.to_json() + "\n")
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,175 @@
+import os
+import time
+from core.plan import RENAMED, FAILED, CANCELLED
+from core.stats import STATS
+
+# フォルダのファイルディスクリプタを使った相対パスでのリネームが使えるか（Windowsでは使えない）
+SUPPORTS_DIR_FD = os.rename in os.supports_dir_fd and os.stat in os.supports_dir_fd
+
+class DirectoryHandles:
+    """フォルダごとに1回だけ開いたディスクリプタを使い回し、リネームのたびのパス解決を省く"""
+
+    def __init__(self):
+        self.fds = {}
+        self.seconds = 0.0  # 存在確認とリネームに掛かった時間の合計
+
+    def split(self, path):
+        """(フォルダのfd, ファイル名) を返す。fdが使えなければ (None, パス)"""
+        if not SUPPORTS_DIR_FD:
+            return None, path
+        folder, name = os.path.split(path)
+        fd = self.fds.get(folder, -1)
+        if fd == -1:
+            try:
+                fd = os.open(folder or ".", os.O_RDONLY)
+            except OSError:
+                fd = None
+            self.fds[folder] = fd
+        if fd is None:
+            return None, path
+        return fd, name
+
+    def exists(self, path):
+        started = time.perf_counter()
+        fd, name = self.split(path)
+        try:
+            os.stat(name, dir_fd=fd)
+        except OSError:
+            return False
+        finally:
+            self.seconds += time.perf_counter() - started
+        return True
+
+    def move(self, source, target, overwrite=False):
+        source_fd, source_name = self.split(source)
+        target_fd, target_name = self.split(target)
+        if source_fd is None or target_fd is None:
+            source_fd = target_fd = None
+            source_name, target_name = source, target
+        # POSIXではどちらも上書きするので、上書きしない場合は事前に存在を確認する
+        mover = os.replace if overwrite else os.rename
+        started = time.perf_counter()
+        try:
+            mover(source_name, target_name, src_dir_fd=source_fd, dst_dir_fd=target_fd)
+        finally:
+            self.seconds += time.perf_counter() - started
+
+    def close(self):
+        for fd in self.fds.values():
+            if fd is not None:
+                os.close(fd)
+        self.fds = {}
+
+def temp_path(op, token, index):
+    """2段階リネームの一時名（新しい名前と同じフォルダの隠しファイル）"""
+    return os.path.join(os.path.dirname(op.target), f".{token}-{index}.renaming")
+
+def by_directory(indexes, pending):
+    """フォルダごとにまとめる（各フォルダ内の順序は保つ）"""
+    return sorted(indexes, key=lambda i: os.path.dirname(pending[i].source))
+
+def execute_plan(plan, journal=None, is_cancelled=None, **journal_info):
+    """計画を実行し、処理した操作を1件ずつ返すジェネレーター
+
+    連鎖（001→002, 002→003）や循環（入れ替え）に含まれる操作と大文字小文字だけの変更は、
+    いったん全て一時名に移してから新しい名前に移す。それ以外は直接リネームする。
+    journalが与えられれば、実行前に一時名を含む全操作を書き込み、実行済みの印を付けながら進める。
+    is_cancelled() が真になれば、直接リネームする操作の間で止め、残りをキャンセル済みとして返す
+    （一時名を使う操作は途中で止めない）。
+    """
+    linked_ops = {plan.ops[i] for i in plan.linked}
+    pending = plan.pending()
+    token = f"{time.time_ns():x}"
+    two_phase = []
+    direct = []
+    for index, op in enumerate(pending):
+        if op in linked_ops or op.case_only:
+            op.temp = temp_path(op, token, index)
+            two_phase.append(index)
+        else:
+            direct.append(index)
+
+    batch_id = journal.begin(pending, **journal_info) if journal is not None and pending else None
+    dirs = DirectoryHandles()
+
+    def done(index, op):
+        STATS.count("renamed")
+        op.status = RENAMED
+        if batch_id is not None:
+            journal.mark_done(batch_id, index)
+
+    def fail(op, reason):
+        STATS.count("rename_failed")
+        op.status = FAILED
+        op.reason = reason
+
+    def cancel(indexes):
+        for index in indexes:
+            op = pending[index]
+            op.status = CANCELLED
+            yield op
+
+    try:
+        if is_cancelled is not None and is_cancelled():
+            yield from cancel(two_phase + direct)
+            two_phase = direct = []
+
+        # 1段階目: 連鎖・循環の元の名前を全て空ける
+        moved = []
+        for index in by_directory(two_phase, pending):
+            op = pending[index]
+            try:
+                if dirs.exists(op.temp):
+                    raise FileExistsError(f"Temporary name already exists: {op.temp}")
+                dirs.move(op.source, op.temp)
+                moved.append(index)
+            except OSError as e:
+                fail(op, str(e))
+                yield op
+        if batch_id is not None and two_phase:
+            # これ以降、一時名が無い操作は2段階目で移動済み（実行済みの印が失われても再実行しない）
+            journal.mark_moved_to_temp(batch_id)
+
+        # 2段階目: 一時名から新しい名前へ
+        for index in by_directory(moved, pending):
+            op = pending[index]
+            try:
+                if not op.overwrite and dirs.exists(op.target):
+                    raise FileExistsError(f"Target already exists: {op.target}")
+                dirs.move(op.temp, op.target, op.overwrite)
+                done(index, op)
+            except OSError as e:
+                # 一時名のまま残さないよう、空いていれば元の名前に戻す
+                try:
+                    if dirs.exists(op.source):
+                        raise FileExistsError(op.source)
+                    dirs.move(op.temp, op.source)
+                    fail(op, str(e))
+                except OSError:
+                    fail(op, f"{e} (left as {op.temp})")
+            yield op
+        if journal is not None:
+            journal.sync()
+
+        direct = by_directory(direct, pending)
+        for position, index in enumerate(direct):
+            if is_cancelled is not None and is_cancelled():
+                yield from cancel(direct[position:])
+                break
+            op = pending[index]
+            try:
+                if not op.overwrite and dirs.exists(op.target):
+                    raise FileExistsError(f"Target already exists: {op.target}")
+                dirs.move(op.source, op.target, op.overwrite)
+                done(index, op)
+            except OSError as e:
+                fail(op, str(e))
+            yield op
+
+        if batch_id is not None:
+            journal.commit(batch_id)
+    finally:
+        STATS.add_time("execute", dirs.seconds, sum(1 for op in pending if op.status in (RENAMED, FAILED)))
+        dirs.close()
+        if journal is not None:
+            journal.sync()
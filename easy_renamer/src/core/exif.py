@@ -0,0 +1,85 @@
+import struct
+
+EXIF_HEADER = b"Exif\x00\x00"
+TAG_EXIF_IFD = 0x8769
+TAG_USER_COMMENT = 0x9286
+TYPE_SIZES = {1: 1, 2: 1, 3: 2, 4: 4, 5: 8, 6: 1, 7: 1, 8: 2, 9: 4, 10: 8, 11: 4, 12: 8}
+
+ASCII_PREFIX = b"ASCII\x00\x00\x00"
+UNICODE_PREFIX = b"UNICODE\x00"
+JIS_PREFIX = b"JIS\x00\x00\x00\x00\x00"
+UNDEFINED_PREFIX = b"\x00" * 8
+
+def read_user_comment(data):
+    """EXIF（TIFF構造）のIFDを辿り、UserComment(0x9286)だけをデコードして返す"""
+    if data.startswith(EXIF_HEADER):
+        data = data[len(EXIF_HEADER):]
+    if data[:2] == b"II":
+        byte_order = "<"
+    elif data[:2] == b"MM":
+        byte_order = ">"
+    else:
+        return None
+    try:
+        if struct.unpack(byte_order + "H", data[2:4])[0] != 42:
+            return None
+        ifd0 = struct.unpack(byte_order + "I", data[4:8])[0]
+        exif_ifd = find_entry(data, byte_order, ifd0, TAG_EXIF_IFD)
+        if exif_ifd is None:
+            return None
+        exif_offset = struct.unpack(byte_order + "I", exif_ifd[2])[0]
+        entry = find_entry(data, byte_order, exif_offset, TAG_USER_COMMENT)
+        if entry is None:
+            return None
+        value_type, count, value = entry
+        size = TYPE_SIZES.get(value_type, 1) * count
+        if size > 4:
+            offset = struct.unpack(byte_order + "I", value)[0]
+            value = data[offset:offset + size]
+        else:
+            value = value[:size]
+        return decode_user_comment(value, byte_order)
+    except struct.error:
+        return None
+
+def find_entry(data, byte_order, ifd_offset, tag):
+    """IFD内から指定タグのエントリ (型, 個数, 値/オフセットの4バイト) を探す"""
+    count = struct.unpack(byte_order + "H", data[ifd_offset:ifd_offset + 2])[0]
+    entry_format = byte_order + "HHI4s"
+    for i in range(count):
+        start = ifd_offset + 2 + i * 12
+        entry_tag, value_type, value_count, value = struct.unpack(entry_format, data[start:start + 12])
+        if entry_tag == tag:
+            return value_type, value_count, value
+    return None
+
+def decode_user_comment(value, byte_order=">"):
+    """先頭8バイトの文字コード指定に従ってUserCommentをデコードする"""
+    prefix, body = value[:8], value[8:]
+    if prefix == UNICODE_PREFIX:
+        text = decode_utf16(body, byte_order)
+    elif prefix == ASCII_PREFIX:
+        # ASCII指定でもUTF-8を書き込むツールがあるためUTF-8として読む
+        text = body.decode("utf-8", errors="replace")
+    elif prefix == JIS_PREFIX:
+        text = body.decode("cp932", errors="replace")
+    elif prefix == UNDEFINED_PREFIX:
+        text = body.decode("utf-8", errors="replace")
+    else:
+        text = value.decode("utf-8", errors="replace")
+    return text.rstrip("\x00 ")
+
+def decode_utf16(body, byte_order):
+    """UTF-16本文をデコード（BOM > 上位バイトの0の位置 > TIFFのバイト順の優先で判定）"""
+    if body[:2] in (b"\xff\xfe", b"\xfe\xff"):
+        return body.decode("utf-16", errors="replace")
+    encoding = "utf-16-be" if byte_order == ">" else "utf-16-le"
+    # 英字主体のプロンプトは上位バイトが0になるため、0が偶数位置ならBE、奇数位置ならLE
+    sample = body[:256]
+    even_zeros = sample[0::2].count(0)
+    odd_zeros = sample[1::2].count(0)
+    if even_zeros > odd_zeros:
+        encoding = "utf-16-be"
+    elif odd_zeros > even_zeros:
+        encoding = "utf-16-le"
+    return body[:len(body) - len(body) % 2].decode(encoding, errors="replace")
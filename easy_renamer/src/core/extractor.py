@@ -0,0 +1,47 @@
+import os
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+def default_jobs():
+    """ヘッダー読み込みはI/O待ちが主なので、CPU数より少し多めのスレッドを使う"""
+    return min(16, (os.cpu_count() or 1) + 4)
+
+class ExtractionPool:
+    """メタデータ抽出をスレッドプールで先読みし、入力順のまま結果を流す"""
+
+    def __init__(self, jobs=None, prefetch=4):
+        self.jobs = max(1, jobs or default_jobs())
+        # 先読みする件数の上限（メモリと未処理タスクを一定に保つ）
+        self.window_size = self.jobs * prefetch
+
+    def imap(self, func, items):
+        """itemsの各要素にfuncを並列適用し、入力順に (要素, 結果, 例外) を返すジェネレーター"""
+        if self.jobs == 1:
+            for item in items:
+                try:
+                    yield item, func(item), None
+                except Exception as e:
+                    yield item, None, e
+            return
+
+        window = deque()
+        executor = ThreadPoolExecutor(max_workers=self.jobs, thread_name_prefix="extract")
+        try:
+            for item in items:
+                window.append((item, executor.submit(func, item)))
+                if len(window) >= self.window_size:
+                    yield self.resolve(*window.popleft())
+            while window:
+                yield self.resolve(*window.popleft())
+        finally:
+            # 途中で打ち切られた場合は未着手のタスクを破棄する
+            for _, future in window:
+                future.cancel()
+            executor.shutdown(wait=True)
+
+    @staticmethod
+    def resolve(item, future):
+        error = future.exception()
+        if error is not None:
+            return item, None, error
+        return item, future.result(), None
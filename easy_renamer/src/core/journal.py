@@ -0,0 +1,307 @@
+import json
+import os
+import time
+from core.executor import execute_plan
+from core.plan import build_plan, SKIP, RENAMED, SKIPPED
+
+# 件数の多いop・doneの行は、一覧だけが必要な時はJSONとして解析しない（json.dumpsはキーを書いた順に出力する）
+BULK_PREFIXES = ('{"type": "op"', '{"type": "done"')
+BATCH_KEY = '"batch": "'
+
+class JournalBatch:
+    """ジャーナルから読み戻した1回分のリネーム"""
+
+    def __init__(self, batch_id):
+        self.batch_id = batch_id
+        self.count = 0       # 操作の数
+        self.ops = []        # (元のパス, 新しいパス)（summaryで読んだ場合は空）
+        self.temps = {}      # 操作の番号 -> 2段階リネームの一時名
+        self.done = set()    # 実行済みとして記録された操作の番号
+        self.moved_to_temp = False  # 2段階リネームの1段階目（一時名への移動）が終わった
+        self.committed = False
+        self.undone = False
+        self.discarded = False  # 再開しないことにした未完了のバッチ（取り消しもできない）
+        self.is_undo = False  # 別のバッチを取り消すためのバッチ
+        self.supersedes = None  # 再開で引き継いだバッチのID
+        self.origin = self      # 再開を繰り返した場合も含め、最初に実行したバッチ
+
+class RenameJournal:
+    """リネームの先行書き込みジャーナル（追記専用のJSON Lines）
+
+    実行前に計画した全操作を書き込んでfsyncし、実行済みの印はSYNC_EVERY件ごとに
+    まとめてfsyncする。2段階リネームは1段階目が終わった印をfsyncしてから2段階目に進む。
+    クラッシュで失われた印はファイルの有無（とこの印）から復元できる。
+    """
+
+    SYNC_EVERY = 256
+    UNDO_DEPTH = 5  # 続けて元に戻せるバッチの数（これより古いバッチは完了時にジャーナルから取り除く）
+
+    def __init__(self, path):
+        self.path = path
+        self.file = None
+        self.unsynced = 0
+
+    def open(self):
+        if self.file is None:
+            self.file = open(self.path, "a", encoding="utf-8")
+        return self.file
+
+    def append(self, record):
+        self.open().write(json.dumps(record, ensure_ascii=False) + "\n")
+        self.unsynced += 1
+
+    def sync(self):
+        if self.file is not None and self.unsynced:
+            self.file.flush()
+            os.fsync(self.file.fileno())
+            self.unsynced = 0
+
+    def close(self):
+        if self.file is not None:
+            self.sync()
+            self.file.close()
+            self.file = None
+
+    def begin(self, ops, supersedes=None, undo_of=None):
+        """計画した操作を全て書き込んでからバッチIDを返す
+
+        supersedesは再開で引き継ぐ未完了のバッチ、undo_ofは取り消すバッチ。
+        """
+        batch_id = f"{time.time_ns():x}"
+        record = {"type": "begin", "batch": batch_id, "count": len(ops), "time": time.time()}
+        if supersedes:
+            record["supersedes"] = supersedes
+        if undo_of:
+            record["undo_of"] = undo_of
+        self.append(record)
+        for index, op in enumerate(ops):
+            record = {"type": "op", "batch": batch_id, "i": index, "source": op.source, "target": op.target}
+            if op.temp:
+                record["temp"] = op.temp
+            self.append(record)
+        self.sync()
+        return batch_id
+
+    def mark_done(self, batch_id, index):
+        self.append({"type": "done", "batch": batch_id, "i": index})
+        if self.unsynced >= self.SYNC_EVERY:
+            self.sync()
+
+    def mark_moved_to_temp(self, batch_id):
+        self.append({"type": "moved", "batch": batch_id})
+        self.sync()
+
+    def commit(self, batch_id):
+        self.append({"type": "commit", "batch": batch_id})
+        self.sync()
+        self.compact()
+
+    def mark_undone(self, batch_id):
+        self.append({"type": "undo", "batch": batch_id})
+        self.sync()
+        self.compact()
+
+    def mark_discarded(self, batch_id):
+        self.append({"type": "discard", "batch": batch_id})
+        self.sync()
+        self.compact()
+
+    def compact(self):
+        """再開にも取り消しにも使わなくなったバッチの行を取り除く（追記だけではファイルが増え続ける）"""
+        batches = self.read_batches(summary=True)
+        by_id = {batch.batch_id: batch for batch in batches}
+        keep = set()
+
+        def keep_chain(batch):
+            # 再開したバッチは、取り消す時に引き継いだ元のバッチの操作を使う
+            while batch is not None and batch.batch_id not in keep:
+                keep.add(batch.batch_id)
+                batch = by_id.get(batch.supersedes)
+
+        undoable = 0
+        for batch in reversed(batches):
+            if batch.discarded or undoable >= self.UNDO_DEPTH:
+                break
+            if batch.committed and not batch.undone and not batch.is_undo:
+                keep_chain(batch)
+                undoable += 1
+        incomplete = find_incomplete(batches)
+        if incomplete is not None:
+            keep_chain(incomplete)
+        if len(keep) == len(batches):
+            return
+
+        self.close()
+        temp_path = self.path + ".tmp"
+        try:
+            with open(self.path, "r", encoding="utf-8") as source, open(temp_path, "w", encoding="utf-8") as f:
+                for line in source:
+                    start = line.find(BATCH_KEY) + len(BATCH_KEY)
+                    if start >= len(BATCH_KEY) and line[start:line.find('"', start)] in keep:
+                        f.write(line)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(temp_path, self.path)
+        except OSError:
+            # 取り除けなくても記録は正しいので、次の完了時にもう一度試す
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+
+    def read_batches(self, summary=False):
+        """ジャーナル全体を読み、バッチを書き込み順に返す（壊れた最終行は無視する）
+
+        summaryなら各操作と実行済みの印は読まず（ops, done, tempsは空）、状態と件数だけを返す。
+        """
+        batches = {}
+        if not os.path.exists(self.path):
+            return []
+        with open(self.path, "r", encoding="utf-8") as f:
+            for line in f:
+                if summary and line.startswith(BULK_PREFIXES):
+                    continue
+                try:
+                    record = json.loads(line)
+                except json.JSONDecodeError:
+                    continue
+                batch = batches.get(record.get("batch"))
+                kind = record.get("type")
+                if kind == "begin":
+                    batch = batches[record["batch"]] = JournalBatch(record["batch"])
+                    batch.count = record.get("count", 0)
+                    batch.supersedes = record.get("supersedes")
+                    # 引き継いだバッチは完了扱い、取り消したバッチは取り消し済みにする
+                    if record.get("supersedes") in batches:
+                        batches[record["supersedes"]].committed = True
+                    if record.get("undo_of") in batches:
+                        batches[record["undo_of"]].undone = True
+                        batch.is_undo = True
+                elif batch is None:
+                    continue
+                elif kind == "op":
+                    batch.ops.append((record["source"], record["target"]))
+                    if "temp" in record:
+                        batch.temps[record["i"]] = record["temp"]
+                elif kind == "done":
+                    batch.done.add(record["i"])
+                elif kind == "moved":
+                    batch.moved_to_temp = True
+                elif kind == "commit":
+                    batch.committed = True
+                elif kind == "undo":
+                    batch.undone = True
+                elif kind == "discard":
+                    batch.discarded = True
+        ordered = list(batches.values())
+        for batch in ordered:
+            if batch.supersedes in batches:
+                batch.origin = batches[batch.supersedes].origin
+        # 再開したバッチを取り消したら、引き継いだ元のバッチも取り消し済みにする
+        for batch in reversed(ordered):
+            if batch.undone and batch.supersedes in batches:
+                batches[batch.supersedes].undone = True
+        return ordered
+
+    def incomplete_batch(self, summary=False):
+        """クラッシュなどで完了しなかった最後のバッチ（summaryなら件数と状態だけ）"""
+        return find_incomplete(self.read_batches(summary))
+
+    def last_committed_batch(self, summary=False):
+        """元に戻せる最後のバッチ（最後のバッチを破棄した場合はNone。summaryなら件数と状態だけ）"""
+        for batch in reversed(self.read_batches(summary)):
+            if batch.discarded:
+                return None
+            if batch.committed and not batch.undone and not batch.is_undo:
+                return batch
+        return None
+
+    def resume(self):
+        """未完了のバッチの残りを実行し、(元のパス, 新しいパス, 状態) のリストを返す"""
+        batch = self.incomplete_batch()
+        if batch is None:
+            return []
+        remaining = []
+        for index, (source, target) in enumerate(batch.ops):
+            if index in batch.done:
+                continue
+            temp = batch.temps.get(index)
+            if temp and os.path.exists(temp):
+                # 2段階目の途中で止まった操作は一時名から続ける
+                current = temp
+            elif temp and batch.moved_to_temp:
+                # 1段階目の後で一時名が無ければ移動済み（元の名前は循環の別のファイルが使っている）
+                continue
+            else:
+                current = source
+            remaining.append((current, target))
+        return self.replay(remaining, supersedes=batch.batch_id)
+
+    def discard(self):
+        """未完了のバッチを再開せずに閉じ、次回から尋ねないようにする
+
+        2段階リネームの一時名に残ったファイルは、元の名前が空いていれば戻す。
+        戻せなかった一時名のリストを返す。
+        """
+        batch = self.incomplete_batch()
+        if batch is None:
+            return []
+        left = []
+        for index, (source, target) in enumerate(batch.ops):
+            temp = batch.temps.get(index)
+            if not temp or not os.path.exists(temp):
+                continue
+            try:
+                if os.path.exists(source):
+                    raise FileExistsError(source)
+                os.rename(temp, source)
+            except OSError:
+                left.append(temp)
+        self.mark_discarded(batch.batch_id)
+        return left
+
+    def undo_last(self):
+        """最後のバッチを元に戻し、(戻したパス, 元のパス, 状態) のリストを返す"""
+        batch = self.last_committed_batch()
+        if batch is None:
+            return []
+        # 再開したバッチの元のパスは一時名なので、最初に実行したバッチの元のパスに戻す
+        origin = batch.origin
+        reverse = []
+        for index, (source, target) in enumerate(origin.ops):
+            if index not in origin.done and not os.path.exists(target):
+                continue  # 実行されていない操作
+            reverse.append((target, source))
+        return self.replay(reverse, undo_of=batch.batch_id)
+
+    def replay(self, pairs, **journal_info):
+        """再開・取り消しを新しいバッチとして実行する（入れ替えも2段階で処理され、既存のファイルは上書きしない）"""
+        results = []
+        runnable = []
+        for source, target in pairs:
+            if os.path.exists(source):
+                runnable.append((source, target))
+            else:
+                results.append((source, target, "already" if os.path.exists(target) else "missing"))
+        plan = build_plan(runnable, SKIP)
+        has_pending = bool(plan.pending())
+        for op in execute_plan(plan, self, **journal_info):
+            status = "renamed" if op.status == RENAMED else f"error: {op.reason}"
+            results.append((op.source, op.target, status))
+        for op in plan.ops:
+            if op.status == SKIPPED:
+                results.append((op.source, op.target, "target exists"))
+        if not has_pending:
+            # 実行する操作が無くてもバッチを閉じる
+            self.close_batch(**journal_info)
+        return results
+
+    def close_batch(self, supersedes=None, undo_of=None):
+        if supersedes:
+            self.commit(supersedes)
+        if undo_of:
+            self.mark_undone(undo_of)
+
+def find_incomplete(batches):
+    for batch in reversed(batches):
+        if not batch.committed and not batch.undone and not batch.discarded:
+            return batch
+    return None
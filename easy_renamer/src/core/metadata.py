@@ -1,66 +1,160 @@
-from PIL import Image
+import atexit
+import logging
 import os
-import unicodedata
+import sqlite3
+import threading
+import time
 from core.settings import Settings
+from core.stats import STATS
+from core.metadata_cache import MetadataCache
+from core.normalize import normalize_string, normalize_prompt
+from core.exif import read_user_comment
+from core.extractor import ExtractionPool
+from core.prompt_reader import read_prompt, parse_parameters
+from core.word_matcher import WordMatcher
+
+logger = logging.getLogger(__name__)
 
 class MetadataParser:
     def __init__(self):
         self.settings = Settings()
-        self.word_map = self.settings.get_word_map()
+        self.word_matcher = None  # 初めて照合する時にword_mapを読み込んで作る
+        self.matcher_lock = threading.Lock()
+        self.word_map_hash = self.settings.word_map_hash()
+        self.cache = self.open_cache()
+        self.settings.subscribe(self.settings_changed)
+    
+    def open_cache(self):
+        """settings.jsonと同じ場所にメタデータキャッシュを開く（失敗時はキャッシュなし）"""
+        config_dir = os.path.dirname(os.path.abspath(self.settings.config_file))
+        try:
+            cache = MetadataCache(os.path.join(config_dir, "metadata_cache.sqlite3"))
+        except sqlite3.Error as e:
+            logger.warning("Metadata cache disabled: %s", e)
+            return None
+        atexit.register(cache.close)
+        return cache
+    
+    @property
+    def matcher(self):
+        matcher = self.word_matcher
+        if matcher is None:
+            with self.matcher_lock:
+                if self.word_matcher is None:
+                    self.word_matcher = WordMatcher(self.settings.get_word_map(), normalize_string)
+                matcher = self.word_matcher
+        return matcher
+    
+    def settings_changed(self, changes):
+        if "word_map" in changes:
+            removed, changed = changes["word_map"]
+            self.apply_word_map(removed, changed)
     
     def update_word_map(self):
-        """設定変更後にword_mapを更新"""
-        self.word_map = self.settings.get_word_map()
-        print(f"Updated word_map: {self.word_map}")
+        """設定変更後にword_mapを更新（次に照合する時に全件から作り直す）"""
+        with self.matcher_lock:
+            self.word_matcher = None
+            self.word_map_hash = self.settings.word_map_hash()
+    
+    def apply_word_map(self, removed, changed):
+        """変わったキーだけを照合器に反映する（ファイルは読み直さない）"""
+        with self.matcher_lock:
+            # 照合器を先に差し替え、古い照合結果が新しいハッシュでキャッシュされないようにする
+            if self.word_matcher is not None:
+                self.word_matcher = self.word_matcher.updated(removed, changed)
+            self.word_map_hash = self.settings.word_map_hash()
+        logger.info("Updated word_map (%d removed, %d added or changed)", len(removed), len(changed))
     
     def normalize_string(self, s):
         """文字列を正規化（ユニコード正規化＋不可視文字除去＋スペース正規化）"""
-        # NULL文字（\x00）を除去
-        s = s.replace('\x00', '')
-        # ユニコード正規化（NFC形式）
-        s = unicodedata.normalize('NFC', s)
-        # 不可視文字や制御文字を除去
-        s = ''.join(c for c in s if unicodedata.category(c) not in ('Cc', 'Cf'))
-        # スペースを正規化
-        s = ' '.join(s.split())
-        return s.strip()
+        return normalize_string(s)
+
+    def extract_prompt(self, image_path):
+        """画像のメタデータから (プロンプトワード, 構造化フィールド) を抽出する"""
+        started = time.perf_counter()
+        try:
+            return self.read_prompt_words(image_path)
+        finally:
+            STATS.add_time("parse", time.perf_counter() - started)
+    
+    def read_prompt_words(self, image_path):
+        source = read_prompt(image_path)
+        logger.debug("Raw prompt source for %s: %s", image_path, source)
+        
+        text = None
+        if source is not None:
+            kind, value = source
+            STATS.count("metadata_bytes", len(value))
+            if kind == 'text':
+                text = value
+            elif kind == 'exif':
+                text = read_user_comment(value)
+        
+        if not text:
+            return [], {}
+        fields = parse_parameters(text)
+        # ネガティブプロンプトや生成設定は除き、プロンプト本文だけをカンマ区切りで分割して正規化
+        prompt_words = normalize_prompt(fields["prompt"])
+        logger.debug("Extracted prompt words: %s", prompt_words)
+        return prompt_words, fields
+    
+    def translate(self, image_path, prompt_words):
+        """プロンプトワード（なければファイル名）をword_mapで翻訳する"""
+        started = time.perf_counter()
+        translated = self.match(image_path, prompt_words)
+        STATS.add_time("match", time.perf_counter() - started)
+        STATS.count("words_checked", len(prompt_words))
+        STATS.count("words_matched", len(translated))
+        return translated if translated else {"no_match": "一致なし"}
+    
+    def match(self, image_path, prompt_words):
+        translated = self.matcher.match_words(prompt_words)
+        if not translated:
+            filename = os.path.splitext(os.path.basename(image_path))[0].lower()
+            logger.debug("Extracting from filename: %s", filename)
+            translated = self.matcher.match_substrings(filename.split())
+        return translated
+
+    def load(self, image_path):
+        """(翻訳結果, 構造化フィールド) を返す（キャッシュを優先）"""
+        stat = os.stat(image_path)
+        cached = self.cache.get(image_path, stat, self.word_map_hash) if self.cache else None
+        if cached is not None:
+            prompt_words, fields, translated = cached
+            if translated is not None:
+                STATS.count("cache_hits")
+                return translated, fields
+        else:
+            prompt_words, fields = self.extract_prompt(image_path)
+        STATS.count("cache_misses")
+        
+        translated = self.translate(image_path, prompt_words)
+        if self.cache:
+            self.cache.put(image_path, stat, prompt_words, fields, self.word_map_hash, translated)
+        return translated, fields
 
     def parse(self, image_path):
         try:
-            with Image.open(image_path) as img:
-                metadata = img.info
-            print(f"Raw metadata from PIL for {image_path}: {metadata}")
-            
-            translated = {}
-            for key, value in metadata.items():
-                if key == 'exif' and isinstance(value, bytes):
-                    value = value.decode('utf-8', errors='ignore')
-                    if 'UNICODE' in value:
-                        prompt_start = value.index('UNICODE') + len('UNICODE\x00\x00')
-                        prompt = value[prompt_start:]
-                        # カンマ区切りで分割し、改行や余分なスペースを除去
-                        prompt_words = [word.strip().replace('\n', ' ').replace('\r', '') for word in prompt.split(',')]
-                        # さらに正規化
-                        prompt_words = [self.normalize_string(word) for word in prompt_words if word]
-                        print(f"Extracted prompt words: {prompt_words}")
-                        for word in prompt_words:
-                            for en_word, jp_word in self.word_map.items():
-                                normalized_en_word = self.normalize_string(en_word)
-                                if normalized_en_word == word:
-                                    translated[en_word] = jp_word
-                                else:
-                                    print(f"No match: '{word}' ({repr(word)}) does not match '{normalized_en_word}' ({repr(normalized_en_word)})")
-            
-            if not translated:
-                filename = os.path.splitext(os.path.basename(image_path))[0].lower()
-                print(f"Extracting from filename: {filename}")
-                words = filename.split()
-                for word in words:
-                    for en_word, jp_word in self.word_map.items():
-                        if en_word in word:
-                            translated[en_word] = jp_word
-            
-            return translated if translated else {"no_match": "一致なし"}
+            return self.load(image_path)[0]
+        except Exception as e:
+            logger.warning("Error parsing metadata for %s: %s", image_path, e)
+            return {"error": str(e)}
+
+    def parse_with_fields(self, image_path):
+        """翻訳結果とプロンプトの構造化フィールド（seed, stepsなど）を両方返す"""
+        try:
+            return self.load(image_path)
         except Exception as e:
-            print(f"Error parsing metadata for {image_path}: {e}")
-            return {"error": str(e)}
\ No newline at end of file
+            logger.warning("Error parsing metadata for %s: %s", image_path, e)
+            return {"error": str(e)}, {}
+
+
+    def parse_many(self, image_paths, jobs=None):
+        """複数画像を並列に先読み解析し、入力順に (パス, 翻訳結果, フィールド) を返す"""
+        pool = ExtractionPool(jobs)
+        for image_path, result, error in pool.imap(self.load, image_paths):
+            if error is not None:
+                logger.warning("Error parsing metadata for %s: %s", image_path, error)
+                yield image_path, {"error": str(error)}, {}
+            else:
+                yield image_path, result[0], result[1]
\ No newline at end of file
@@ -0,0 +1,88 @@
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+
+class MetadataCache:
+    """画像ごとのプロンプトワード・構造化フィールド・翻訳結果を (パス, サイズ, mtime_ns) で保持する永続キャッシュ"""
+
+    SCHEMA_VERSION = 3
+    COMMIT_EVERY = 200  # まとめてコミットする件数
+    COMMIT_INTERVAL = 1.0  # 最後のコミットからの最大秒数
+
+    def __init__(self, db_path):
+        self.db_path = db_path
+        self.lock = threading.Lock()
+        self.conn = sqlite3.connect(db_path, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        version = self.conn.execute("PRAGMA user_version").fetchone()[0]
+        if version != self.SCHEMA_VERSION:
+            # スキーマが古い場合は作り直す（キャッシュなので破棄して問題ない）
+            self.conn.execute("DROP TABLE IF EXISTS entries")
+            self.conn.execute(f"PRAGMA user_version={self.SCHEMA_VERSION}")
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS entries ("
+            "path TEXT PRIMARY KEY, size INTEGER, mtime_ns INTEGER, "
+            "prompt_words TEXT, fields TEXT, word_map_hash TEXT, translated TEXT)"
+        )
+        self.conn.commit()
+        self.pending = 0
+        self.last_commit = time.monotonic()
+
+    @staticmethod
+    def word_map_hash(word_map):
+        """word_mapの内容からハッシュを計算（変更検知用）"""
+        data = json.dumps(word_map, ensure_ascii=False, sort_keys=True)
+        return hashlib.sha1(data.encode("utf-8")).hexdigest()
+
+    @staticmethod
+    def key(image_path):
+        return os.path.normcase(os.path.abspath(image_path))
+
+    def get(self, image_path, stat, word_map_hash):
+        """(prompt_words, fields, translated) を返す。ファイルが変わっていればNone、
+        word_mapが変わっていればtranslatedのみNone"""
+        with self.lock:
+            row = self.conn.execute(
+                "SELECT size, mtime_ns, prompt_words, fields, word_map_hash, translated FROM entries WHERE path = ?",
+                (self.key(image_path),)
+            ).fetchone()
+        if row is None or row[0] != stat.st_size or row[1] != stat.st_mtime_ns:
+            return None
+        prompt_words = json.loads(row[2])
+        fields = json.loads(row[3])
+        translated = json.loads(row[5]) if row[4] == word_map_hash else None
+        return prompt_words, fields, translated
+
+    def put(self, image_path, stat, prompt_words, fields, word_map_hash, translated):
+        """抽出結果を保存する"""
+        with self.lock:
+            self.conn.execute(
+                "INSERT OR REPLACE INTO entries VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (self.key(image_path), stat.st_size, stat.st_mtime_ns,
+                 json.dumps(prompt_words, ensure_ascii=False),
+                 json.dumps(fields, ensure_ascii=False), word_map_hash,
+                 json.dumps(translated, ensure_ascii=False))
+            )
+            self.pending += 1
+            if self.pending >= self.COMMIT_EVERY or time.monotonic() - self.last_commit >= self.COMMIT_INTERVAL:
+                self._commit()
+
+    def _commit(self):
+        self.conn.commit()
+        self.pending = 0
+        self.last_commit = time.monotonic()
+
+    def flush(self):
+        """未コミットの書き込みを確定する"""
+        with self.lock:
+            if self.pending:
+                self._commit()
+
+    def close(self):
+        self.flush()
+        with self.lock:
+            self.conn.close()
@@ -0,0 +1,45 @@
+import unicodedata
+from functools import lru_cache
+
+ASCII_CONTROLS = dict.fromkeys(list(range(0x20)) + [0x7F])  # ASCIIの制御文字（削除用のtranslate表）
+
+_invisible = None  # 制御文字・不可視文字（Cc, Cf）の削除用のtranslate表
+
+def invisible_table():
+    global _invisible
+    if _invisible is None:
+        # Cc, CfはBMP・第1面と第14面（タグ文字）にしか無い
+        codes = list(range(0x20000)) + list(range(0xE0000, 0xE1000))
+        _invisible = dict.fromkeys(code for code in codes if unicodedata.category(chr(code)) in ("Cc", "Cf"))
+    return _invisible
+
+def clean(text):
+    """NULL文字を除いてNFCに正規化し、制御文字や不可視文字を除去する
+
+    ASCIIだけの文字列はNFC正規化で変わらないので、制御文字の除去だけを行う。
+    """
+    if text.isascii():
+        return text if text.isprintable() else text.translate(ASCII_CONTROLS)
+    text = unicodedata.normalize("NFC", text.replace("\x00", ""))
+    return text.translate(invisible_table())
+
+@lru_cache(maxsize=65536)
+def normalize_string(s):
+    """文字列を正規化（ユニコード正規化＋不可視文字除去＋スペース正規化）。同じワードは結果を使い回す"""
+    return " ".join(clean(s).split())
+
+def normalize_prompt(prompt):
+    """カンマ区切りのプロンプト全体を正規化し、空でないワードのリストを返す
+
+    改行の置き換えはプロンプト全体に1回だけ行い、各ワードは正規化済みの結果を使い回す
+    （同じタグは画像が変わっても繰り返し現れるので、ほとんどが辞書引きで済む）。
+    以前は空かどうかを正規化の前に判定していたため、不可視文字やNULL文字だけのワードが
+    空文字列として残っていた。どのワードにも一致せず、ファイル名では空のタグになるだけなので、
+    正規化した後で空になったワードも除く。
+    """
+    words = []
+    for word in prompt.replace("\n", " ").replace("\r", "").split(","):
+        word = normalize_string(word)
+        if word:
+            words.append(word)
+    return words
@@ -0,0 +1,70 @@
+import time
+
+# リネームの各段階（メタデータ読み込みと命名は1件ずつ流れるので1つの段階にまとめる）
+STAGE_EXTRACT = "extract"
+STAGE_PLAN = "plan"
+STAGE_EXECUTE = "execute"
+STAGE_LABELS = {
+    STAGE_EXTRACT: "メタデータ読み込み・命名",
+    STAGE_PLAN: "重複の確認",
+    STAGE_EXECUTE: "リネーム",
+}
+
+class Cancelled(Exception):
+    """キャンセルされたため、ファイルを変更する前に処理を中止した"""
+
+class Progress:
+    """段階ごとの処理件数から速度（件/秒）と残り時間を計算し、一定間隔でcallbackへ通知する
+
+    callback(段階, 処理済み, 全件, 件/秒, 残り秒) の残り秒は不明なら-1。
+    is_cancelledはファイル間でのキャンセル確認に使う。
+    """
+
+    INTERVAL = 0.1  # 通知の最短間隔（秒）
+
+    def __init__(self, callback=None, is_cancelled=None):
+        self.callback = callback
+        self.is_cancelled = is_cancelled
+        self.stage = None
+        self.total = 0
+        self.done = 0
+        self.started = 0.0
+        self.reported = 0.0
+
+    def start(self, stage, total):
+        self.stage = stage
+        self.total = total
+        self.done = 0
+        self.started = time.perf_counter()
+        self.report()
+
+    def advance(self, count=1):
+        self.done += count
+        if time.perf_counter() - self.reported >= self.INTERVAL or self.done >= self.total:
+            self.report()
+
+    def rate(self):
+        elapsed = time.perf_counter() - self.started
+        return self.done / elapsed if elapsed > 0 else 0.0
+
+    def report(self):
+        self.reported = time.perf_counter()
+        if self.callback is None:
+            return
+        rate = self.rate()
+        eta = (self.total - self.done) / rate if rate > 0 else -1.0
+        self.callback(self.stage, self.done, self.total, rate, eta)
+
+    def cancelled(self):
+        return bool(self.is_cancelled and self.is_cancelled())
+
+    def check(self):
+        if self.cancelled():
+            raise Cancelled()
+
+def track(items, progress):
+    """itemsを流しながら1件ごとに進捗を進め、キャンセルされていればCancelledを送出する"""
+    for item in items:
+        progress.check()
+        yield item
+        progress.advance()
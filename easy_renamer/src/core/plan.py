@@ -0,0 +1,220 @@
+import os
+import time
+from core.stats import STATS
+
+# 重複時の解決方法
+SUFFIX = "suffix"        # "名前 (2).png" のように番号を付ける
+SKIP = "skip"            # その画像はリネームしない
+OVERWRITE = "overwrite"  # 既存ファイルを上書きする
+POLICIES = (SUFFIX, SKIP, OVERWRITE)
+
+# 各操作の状態
+PENDING = "pending"      # 実行待ち
+UNCHANGED = "unchanged"  # 新しい名前が今の名前と同じ
+SKIPPED = "skipped"      # 重複のためリネームしない
+RENAMED = "renamed"      # 実行済み
+FAILED = "error"         # 実行に失敗
+CANCELLED = "cancelled"  # 実行前にキャンセルされた
+
+class PathKeys:
+    """重複判定用のキー (フォルダ, ファイル名) を作る（Windowsでは大文字小文字を区別しない）
+
+    abspathはフォルダごとに1回だけ計算する。
+    """
+
+    def __init__(self):
+        self.folders = {}
+
+    def __call__(self, path):
+        folder, _, name = path.rpartition(os.sep)
+        if not folder or folder.endswith(":") or (os.altsep and os.altsep in name):
+            # ルート直下・ドライブ直下・区切り文字が混在する場合は正式な分割を使う
+            folder, name = os.path.split(path)
+        folder_key = self.folders.get(folder)
+        if folder_key is None:
+            folder_key = self.folders[folder] = os.path.normcase(os.path.abspath(folder))
+        return folder_key, os.path.normcase(name)
+
+class RenameOp:
+    """1ファイル分のリネーム操作"""
+    __slots__ = ("source", "target", "status", "reason", "overwrite", "cycle", "case_only", "temp")
+
+    def __init__(self, source, target):
+        self.source = source
+        self.target = target
+        self.status = PENDING
+        self.reason = None
+        self.overwrite = False  # 計画外の既存ファイルを上書きする
+        self.cycle = None       # 循環（A→B, B→A など）に含まれる場合はその番号
+        self.case_only = False  # 大文字小文字だけが変わるリネーム
+        self.temp = None        # 2段階で実行する場合の一時名
+
+    def to_dict(self):
+        record = {"source": self.source, "target": self.target, "status": self.status}
+        if self.reason:
+            record["reason"] = self.reason
+        return record
+
+class RenamePlan:
+    """全ファイルの新しい名前を決めた計画。実行は別のステップで行う"""
+
+    def __init__(self, ops, policy):
+        self.ops = ops
+        self.policy = policy
+        self.order = list(range(len(ops)))  # 連鎖を壊さない実行順（opsのインデックス）
+        self.cycles = []                    # 循環する操作のインデックスのリスト
+        self.linked = set()                 # 連鎖か循環に含まれる操作のインデックス
+
+    def pending(self):
+        """実行が必要な操作を実行順に返す"""
+        return [self.ops[i] for i in self.order if self.ops[i].status == PENDING]
+
+    def counts(self):
+        counts = {}
+        for op in self.ops:
+            counts[op.status] = counts.get(op.status, 0) + 1
+        return counts
+
+def suffixed_path(path, number):
+    folder, name = os.path.split(path)
+    stem, ext = os.path.splitext(name)
+    if not ext and stem.startswith("."):
+        # splitextは".png"を拡張子の無い名前として扱うので、拡張子だけの名前として分ける
+        stem, ext = "", stem
+    return os.path.join(folder, f"{stem} ({number}){ext}")
+
+def build_plan(pairs, policy=SUFFIX, list_dir=os.listdir):
+    """(元のパス, 新しいパス) の列から計画を1パスで作る
+
+    重複はハッシュ集合で判定し、policyに従って自動で解決する。計画内の別の画像が
+    今いる名前への変更（連鎖）は重複として扱わず、実行順で解決する。
+    """
+    if policy not in POLICIES:
+        raise ValueError(f"Unknown conflict policy: {policy}")
+    ops = [RenameOp(source, target) for source, target in pairs]
+    started = time.perf_counter()
+    path_key = PathKeys()
+    source_keys = [path_key(op.source) for op in ops]
+    target_keys = [path_key(op.target) for op in ops]
+    sources = {key: index for index, key in enumerate(source_keys)}
+    existing = {}  # フォルダのキー -> そのフォルダのファイル名（キー）の集合
+    taken = set()
+
+    def exists_outside_plan(key):
+        folder, name = key
+        if folder not in existing:
+            try:
+                existing[folder] = {os.path.normcase(n) for n in list_dir(folder)}
+            except OSError:
+                existing[folder] = set()
+        return name in existing[folder] and key not in sources
+
+    def is_free(key):
+        return key not in taken and not exists_outside_plan(key)
+
+    for index, op in enumerate(ops):
+        source_key = source_keys[index]
+        target_key = target_keys[index]
+        if target_key == source_key:
+            if op.target == op.source or os.path.basename(op.target) == os.path.basename(op.source):
+                op.status = UNCHANGED
+                taken.add(target_key)
+                continue
+            op.case_only = True
+        elif not is_free(target_key):
+            if target_key not in taken and policy == OVERWRITE:
+                op.overwrite = True
+            elif policy == SKIP:
+                op.status = SKIPPED
+                op.reason = "conflict"
+                taken.add(source_key)  # 元の名前のまま残る
+                continue
+            else:
+                # SUFFIX（計画内どうしの重複はOVERWRITEでも番号で解決する）
+                number = 2
+                while not is_free(path_key(suffixed_path(op.target, number))):
+                    number += 1
+                op.target = suffixed_path(op.target, number)
+                op.reason = "suffixed"
+                target_key = target_keys[index] = path_key(op.target)
+        taken.add(target_key)
+
+    resolve_stationary(ops, source_keys, target_keys, sources, taken, policy, path_key)
+    plan = RenamePlan(ops, policy)
+    order_chains(plan, target_keys, sources)
+    STATS.add_time("plan", time.perf_counter() - started, len(ops))
+    STATS.count("conflicts_resolved", sum(1 for op in ops if op.reason in ("suffixed", "conflict") or op.overwrite))
+    return plan
+
+def resolve_stationary(ops, source_keys, target_keys, sources, taken, policy, path_key):
+    """リネームしないことになった画像の名前を別の操作が使っていれば解決し直す"""
+    changed = True
+    while changed:
+        changed = False
+        stationary = {source_keys[i] for i, op in enumerate(ops) if op.status in (UNCHANGED, SKIPPED)}
+        if not stationary:
+            return
+        for index, op in enumerate(ops):
+            if op.status != PENDING or op.case_only:
+                continue
+            target_key = target_keys[index]
+            if target_key not in stationary:
+                continue
+            changed = True
+            if policy == SKIP:
+                op.status = SKIPPED
+                op.reason = "conflict"
+                continue
+            number = 2
+            while True:
+                candidate = suffixed_path(op.target, number)
+                key = path_key(candidate)
+                if key not in taken and key not in stationary and (key in sources or not os.path.exists(candidate)):
+                    break
+                number += 1
+            taken.discard(target_key)
+            op.target = candidate
+            op.reason = "suffixed"
+            target_keys[index] = key
+            taken.add(key)
+
+def order_chains(plan, target_keys, sources):
+    """連鎖（001→002, 002→003）は後ろから実行する順に並べ、循環は検出して記録する
+
+    新しい名前は重複しないので、各操作から「自分の新しい名前を今使っている操作」への
+    辺は高々1本で、グラフは単純な鎖か輪になる。
+    """
+    ops = plan.ops
+    blocker = {}  # 操作 -> その操作の新しい名前を今使っている操作
+    for index, op in enumerate(ops):
+        if op.status != PENDING or op.case_only:
+            continue
+        other = sources.get(target_keys[index])
+        if other is not None and other != index and ops[other].status == PENDING:
+            blocker[index] = other
+            plan.linked.add(index)
+            plan.linked.add(other)
+
+    order = []
+    state = {}  # 0: 処理中, 1: 完了
+    for start in range(len(ops)):
+        if start in state:
+            continue
+        path = []
+        node = start
+        while node is not None and node not in state:
+            state[node] = 0
+            path.append(node)
+            node = blocker.get(node)
+        if node is not None and state[node] == 0:
+            # 辿った先が処理中のノード = 循環
+            cycle = path[path.index(node):]
+            cycle_id = len(plan.cycles)
+            for member in cycle:
+                ops[member].cycle = cycle_id
+            plan.cycles.append(cycle)
+        # 名前を空ける側（鎖の先）から実行する
+        for member in reversed(path):
+            state[member] = 1
+            order.append(member)
+    plan.order = order
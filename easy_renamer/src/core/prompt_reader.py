@@ -0,0 +1,131 @@
+import re
+import struct
+import zlib
+
+PNG_SIGNATURE = b"\x89PNG\r\n\x1a\n"
+JPEG_SOI = b"\xff\xd8"
+EXIF_HEADER = b"Exif\x00\x00"
+PNG_TEXT_CHUNKS = (b"tEXt", b"iTXt", b"zTXt")
+PROMPT_KEYWORDS = ("parameters",)  # Stable Diffusion WebUI (A1111) が書き込むキー
+# "Steps: 20, Sampler: Euler a, ..." の1項目（値は引用符で囲まれることがある）
+PARAM_PATTERN = re.compile(r'\s*(\w[\w \-/]+):\s*("(?:\\.|[^\\"])+"|[^,]*)(?:,|$)')
+
+def read_prompt(image_path):
+    """画素データをデコードせずにヘッダーだけを辿ってプロンプトを読み取る
+
+    戻り値は ("text", str)（PNGのテキストチャンク）、("exif", bytes)（EXIFブロック）、
+    見つからない場合はNone。
+    """
+    with open(image_path, "rb") as f:
+        head = f.read(8)
+        if head == PNG_SIGNATURE:
+            return read_png_prompt(f)
+        if head[:2] == JPEG_SOI:
+            f.seek(2)
+            return read_jpeg_prompt(f)
+    return None
+
+def read_png_prompt(f):
+    """PNGのチャンクヘッダーを辿り、テキストチャンクかeXIfチャンクだけを読む"""
+    while True:
+        header = f.read(8)
+        if len(header) < 8:
+            return None
+        length, chunk_type = struct.unpack(">I4s", header)
+        if chunk_type == b"IEND":
+            return None
+        if chunk_type in PNG_TEXT_CHUNKS:
+            keyword, text = decode_png_text(chunk_type, f.read(length))
+            f.seek(4, 1)  # CRC
+            if keyword in PROMPT_KEYWORDS and text:
+                return ("text", text)
+        elif chunk_type == b"eXIf":
+            data = f.read(length)
+            f.seek(4, 1)
+            return ("exif", data)
+        else:
+            # IDATなどは読まずに読み飛ばす
+            f.seek(length + 4, 1)
+
+def decode_png_text(chunk_type, data):
+    """tEXt/zTXt/iTXtチャンクから (キーワード, テキスト) を取り出す"""
+    keyword, sep, rest = data.partition(b"\x00")
+    if not sep:
+        return None, None
+    keyword = keyword.decode("latin-1")
+    try:
+        if chunk_type == b"tEXt":
+            return keyword, rest.decode("latin-1")
+        if chunk_type == b"zTXt":
+            return keyword, zlib.decompress(rest[1:]).decode("latin-1")
+        # iTXt: 圧縮フラグ, 圧縮方式, 言語タグ\0, 翻訳キーワード\0, テキスト
+        compressed = rest[0]
+        _, _, rest = rest[2:].partition(b"\x00")
+        _, _, text = rest.partition(b"\x00")
+        if compressed:
+            text = zlib.decompress(text)
+        return keyword, text.decode("utf-8", errors="replace")
+    except (zlib.error, IndexError):
+        return keyword, None
+
+def read_jpeg_prompt(f):
+    """JPEGのセグメントヘッダーを辿り、APP1のEXIFブロックだけを読む"""
+    while True:
+        byte = f.read(1)
+        if not byte:
+            return None
+        if byte != b"\xff":
+            continue
+        marker = f.read(1)
+        while marker == b"\xff":  # フィルバイト
+            marker = f.read(1)
+        if not marker:
+            return None
+        code = marker[0]
+        if code == 0xD8 or code == 0x01 or 0xD0 <= code <= 0xD7:
+            continue  # 長さを持たないマーカー
+        if code == 0xDA or code == 0xD9:
+            return None  # 画像データ（SOS）以降にEXIFはない
+        length_bytes = f.read(2)
+        if len(length_bytes) < 2:
+            return None
+        length = struct.unpack(">H", length_bytes)[0] - 2
+        if code == 0xE1:
+            data = f.read(length)
+            if data.startswith(EXIF_HEADER):
+                return ("exif", data[len(EXIF_HEADER):])
+        else:
+            f.seek(length, 1)
+
+def parse_parameters(text):
+    """A1111形式の生成情報を構造化する
+
+    プロンプト本文は "prompt"、"Negative prompt:" 以降は "negative_prompt"、
+    最終行の "Steps: ..." は "steps" や "cfg_scale" のような小文字のキーに分解する。
+    """
+    lines = text.strip().split("\n")
+    last_line = lines[-1]
+    params = PARAM_PATTERN.findall(last_line) if last_line.startswith("Steps:") else []
+    if params:
+        lines = lines[:-1]
+
+    prompt_lines = []
+    negative_lines = []
+    target = prompt_lines
+    for line in lines:
+        if line.startswith("Negative prompt:"):
+            target = negative_lines
+            line = line[len("Negative prompt:"):]
+        target.append(line.strip())
+
+    fields = {
+        "prompt": "\n".join(prompt_lines).strip(),
+        "negative_prompt": "\n".join(negative_lines).strip(),
+    }
+    for key, value in params:
+        key = re.sub(r"[^0-9a-z]+", "_", key.strip().lower()).strip("_")
+        value = value.strip()
+        if len(value) >= 2 and value[0] == value[-1] == '"':
+            value = value[1:-1].replace('\\"', '"')
+        fields[key] = value
+    return fields
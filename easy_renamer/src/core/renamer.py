@@ -1,11 +1,30 @@
+import logging
 import os
-from PyQt5.QtWidgets import QMessageBox
+from core.executor import execute_plan
+from core.journal import RenameJournal
 from core.metadata import MetadataParser
-from utils.helpers import count_fullwidth_chars
+from core.pipeline import track, STAGE_EXTRACT, STAGE_PLAN, STAGE_EXECUTE
+from core.template import compile_template
+from core.plan import build_plan, SUFFIX, SKIP, OVERWRITE, RENAMED, FAILED
+from utils.width import display_width, truncate_to_width, name_max, name_length, truncate_to_length
+
+logger = logging.getLogger(__name__)
+
+MAX_NAME_WIDTH = 130  # 表示幅（全角65文字）
+OVERFLOW_MARK = "[文字数オーバー]"
+SUFFIX_RESERVE = 8    # 重複時に付ける " (2)" などの分
+
+POLICY_LABELS = {
+    SUFFIX: "番号を付けます",
+    SKIP: "スキップします",
+    OVERWRITE: "上書きします",
+}
 
 class Renamer:
     def __init__(self):
         self.metadata_parser = MetadataParser()
+        config_dir = os.path.dirname(os.path.abspath(self.metadata_parser.settings.config_file))
+        self.journal = RenameJournal(os.path.join(config_dir, "rename_journal.jsonl"))
     
     def update_word_map(self):
         self.metadata_parser.update_word_map()
@@ -13,61 +32,99 @@ class Renamer:
     def get_metadata(self, image_path):
         return self.metadata_parser.parse(image_path)
     
-    def rename_files(self, image_paths, pattern, parent=None, fixed_part="", start_number="1"):
-        new_names = []
-        folder = os.path.dirname(image_paths[0])
-        existing_files = set(os.listdir(folder))
-        used_names = set()
-        
-        start_num = int(start_number) if start_number.isdigit() else 1
-        base_sequence = f"{fixed_part}{start_number}"
-        
-        for i, path in enumerate(image_paths):
-            metadata = self.get_metadata(path)
+    def compile_pattern(self, pattern, fixed_part="", start_number="1"):
+        """パターンを解析する。未知のプレースホルダーがあればTemplateErrorを送出する"""
+        return compile_template(pattern, self.metadata_parser.matcher, fixed_part, start_number)
+    
+    def build_names(self, image_paths, pattern, fixed_part="", start_number="1", jobs=None):
+        """各画像の (元のパス, 新しいパス) を入力順に返すジェネレーター"""
+        template = self.compile_pattern(pattern, fixed_part, start_number)
+        return self.render_names(image_paths, template, jobs)
+    
+    def render_names(self, image_paths, template, jobs=None):
+        limits = {}  # フォルダ -> ファイル名の最大長
+        for i, (path, translated, fields) in enumerate(self.metadata_parser.parse_many(image_paths, jobs)):
+            folder = os.path.dirname(path)
             ext = os.path.splitext(path)[1]
+            new_name = template.render(i, path, translated, fields)
+            if not new_name:
+                # パターンのワードタグが1つも無い画像は、拡張子だけの名前にせず元の名前のままにする
+                logger.debug("Empty name for %s, keeping the original name", path)
+                new_name = os.path.splitext(os.path.basename(path))[0]
             
-            sequence = f"{fixed_part}{start_num + i}"
-            try:
-                if base_sequence in pattern:
-                    new_name = pattern.replace(base_sequence, sequence)
-                else:
-                    new_name = pattern
-                new_name = new_name.format(**metadata)
-            except KeyError as e:
-                new_name = f"{pattern} {sequence}{ext}"
-            
-            char_count = count_fullwidth_chars(new_name)
-            if char_count > 65:
-                new_name = f"[文字数オーバー]{new_name[:62]}..."
-            
-            new_filename = new_name + ext
-            new_path = os.path.join(folder, new_filename)
+            if display_width(new_name) > MAX_NAME_WIDTH:
+                new_name = OVERFLOW_MARK + truncate_to_width(new_name, MAX_NAME_WIDTH - display_width(OVERFLOW_MARK), "...")
             
-            if new_filename in existing_files or new_filename in used_names:
-                reply = QMessageBox.question(
-                    parent, "確認",
-                    f"'{new_filename}' は既に存在するか、今回のリネームで重複します。\n上書きしますか？",
-                    QMessageBox.Yes | QMessageBox.No, QMessageBox.No
-                )
-                if reply == QMessageBox.No:
-                    return None
+            # ファイルシステムの上限（NAME_MAX）も超えないようにする
+            limit = limits.get(folder)
+            if limit is None:
+                limit = limits[folder] = name_max(folder) - SUFFIX_RESERVE
+            new_name = truncate_to_length(new_name, limit - name_length(ext))
             
-            new_names.append((path, new_path))
-            used_names.add(new_filename)
-        
-        # 複数画像の場合のみ実行確認
-        if parent and len(image_paths) > 1 and QMessageBox.question(
-            parent, "確認",
-            f"{len(new_names)}件のリネームを実行しますか？",
-            QMessageBox.Yes | QMessageBox.No, QMessageBox.Yes
-        ) != QMessageBox.Yes:
+            target = os.path.join(folder, new_name + ext)
+            # テンプレートが区切り文字を置き換えているので、新しい名前は必ず同じフォルダになる
+            assert os.path.dirname(target) == folder, target
+            yield path, target
+    
+    def plan_renames(self, image_paths, pattern, fixed_part="", start_number="1", jobs=None, policy=SUFFIX, progress=None):
+        """新しい名前を全て決め、重複をpolicyで解決した計画を作る（ファイルは変更しない）
+
+        progress（core.pipeline.Progress）が与えられれば進捗を通知し、キャンセル時はCancelledを送出する。
+        """
+        names = self.build_names(image_paths, pattern, fixed_part, start_number, jobs)
+        if progress is None:
+            return build_plan(names, policy)
+        progress.start(STAGE_EXTRACT, len(image_paths))
+        pairs = list(track(names, progress))
+        progress.start(STAGE_PLAN, len(pairs))
+        plan = build_plan(pairs, policy)
+        progress.advance(len(pairs))
+        return plan
+    
+    def confirm_message(self, plan, count):
+        """実行前に確認が必要ならそのメッセージを返す（不要ならNone）"""
+        pending = plan.pending()
+        resolved = sum(1 for op in plan.ops if op.reason in ("suffixed", "conflict") or op.overwrite)
+        # 複数画像の場合と、重複を自動で解決した場合は実行確認
+        if count <= 1 and not resolved:
+            return None
+        message = f"{len(pending)}件のリネームを実行しますか？"
+        if resolved:
+            message += f"\n（{resolved}件は名前が重複したため、{POLICY_LABELS[plan.policy]}）"
+        return message
+    
+    def execute(self, plan, progress=None):
+        """計画を実行し、リネームできた新しいパスのリストを返す。キャンセルはファイルの間で行う"""
+        if progress is not None:
+            progress.start(STAGE_EXECUTE, len(plan.pending()))
+        is_cancelled = progress.cancelled if progress is not None else None
+        for op in execute_plan(plan, self.journal, is_cancelled):
+            if op.status == FAILED:
+                logger.warning("Error renaming %s to %s: %s", op.source, op.target, op.reason)
+            if progress is not None:
+                progress.advance()
+        return [op.target for op in plan.ops if op.status == RENAMED]
+    
+    def rename_files(self, image_paths, pattern, confirm=None, fixed_part="", start_number="1", jobs=None, policy=SUFFIX):
+        """リネームを計画してから実行する。confirm(メッセージ, 既定の答え) が与えられれば実行前に確認する"""
+        plan = self.plan_renames(image_paths, pattern, fixed_part, start_number, jobs, policy)
+        if not plan.pending():
+            logger.info("Nothing to rename.")
             return None
         
-        for old_path, new_path in new_names:
-            try:
-                os.rename(old_path, new_path)
-            except OSError as e:
-                print(f"Error renaming {old_path} to {new_path}: {e}")
-                return None
-        
-        return [new_path for _, new_path in new_names]
\ No newline at end of file
+        message = self.confirm_message(plan, len(image_paths))
+        if confirm and message and not confirm(message, True):
+            return None
+        return self.execute(plan)
+    
+    def resume(self):
+        """クラッシュなどで途中になったリネームの残りを実行する"""
+        return self.journal.resume()
+    
+    def discard_interrupted(self):
+        """途中になったリネームを再開せずに閉じる（一時名のファイルは元の名前に戻す）"""
+        return self.journal.discard()
+    
+    def undo_last(self):
+        """最後に実行したリネームを元に戻す"""
+        return self.journal.undo_last()
\ No newline at end of file
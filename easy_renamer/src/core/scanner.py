@@ -0,0 +1,29 @@
+import os
+import time
+from core.stats import STATS
+
+IMAGE_EXTENSIONS = ('.png', '.jpg', '.jpeg')
+
+def scan_images(folder, batch_size=500, is_cancelled=None, first_batch_size=None):
+    """os.scandirでフォルダを走査し、画像パスをbatch_size件ずつのリストで返すジェネレーター
+
+    first_batch_sizeを指定すると最初のバッチだけ小さくし、最初のページを早く表示できる。
+    """
+    batch = []
+    limit = first_batch_size or batch_size
+    started = time.perf_counter()
+    with os.scandir(folder) as entries:
+        for entry in entries:
+            if is_cancelled is not None and is_cancelled():
+                return
+            if entry.name.lower().endswith(IMAGE_EXTENSIONS) and entry.is_file():
+                batch.append(entry.path)
+                if len(batch) >= limit:
+                    STATS.add_time("scan", time.perf_counter() - started, len(batch))
+                    yield batch
+                    started = time.perf_counter()
+                    batch = []
+                    limit = batch_size
+    STATS.add_time("scan", time.perf_counter() - started, len(batch))
+    if batch:
+        yield batch
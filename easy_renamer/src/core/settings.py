@@ -1,53 +1,277 @@
+import atexit
+import copy
 import json
+import logging
 import os
+import shutil
+import tempfile
+import threading
+import weakref
+from core.word_store import WordStore
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_CONFIG = {"templates": ["カスタム"], "search_words": []}
+WORD_STORE_FILE = "word_map.sqlite3"
 
 class Settings:
-    def __init__(self):
-        self.config_file = "settings.json"
-        self.config = self.load_config()
-    
+    """settings.jsonの内容をプロセス全体で共有する（Settings()は常に同じインスタンスを返す）
+
+    ファイルは最初の1回だけ読み込む。値を変えると、subscribeした関数に
+    {キー: (変更前, 変更後)} の辞書で通知する。取得した値は共有されているので変更せず、
+    変更はset_*やupdateで行う（値は丸ごと置き換えるので、他のスレッドが読んでいても壊れない）。
+
+    word_mapは件数が多いのでsettings.jsonとは別のWordStore（SQLite）に置き、
+    {"word_map": (削除したキーのリスト, 追加・変更した{英語: 日本語})} の形で差分だけを通知する。
+    """
+
+    CONFIG_FILE = "settings.json"
+    SAVE_DELAY = 0.5   # 最後の変更からこの秒数だけ待ってまとめて書き込む
+    BACKUP_COUNT = 3   # settings.json.bak.1（最新）〜.bak.3
+    _instance = None
+    _instance_lock = threading.Lock()
+
+    def __new__(cls):
+        with cls._instance_lock:
+            if cls._instance is None:
+                instance = super().__new__(cls)
+                instance.lock = threading.RLock()
+                instance.subscribers = []
+                instance.save_timer = None
+                instance.dirty = False
+                instance.saved_text = None  # 最後に書き込んだ内容（同じなら書き込まない）
+                instance.broken = False     # settings.jsonが読めなかった（バックアップに回さない）
+                # 作業フォルダが変わっても同じファイルを使うよう絶対パスで持つ
+                instance.config_file = os.path.abspath(cls.CONFIG_FILE)
+                instance.word_store = instance.open_word_store()
+                instance.config = instance.load_config()
+                atexit.register(instance.flush)
+                cls._instance = instance
+        return cls._instance
+
+    def open_word_store(self):
+        """settings.jsonと同じ場所のword_mapストアを開く"""
+        path = os.path.join(os.path.dirname(self.config_file), WORD_STORE_FILE)
+        return WordStore(path, self.word_map_changed)
+
     def load_config(self):
-        """設定ファイルを読み込む"""
-        if os.path.exists(self.config_file):
-            with open(self.config_file, "r", encoding="utf-8") as f:
-                config = json.load(f)
-                print(f"Loaded config: {config}")  # デバッグ出力
-                return config
-        return {"templates": ["カスタム"], "search_words": [], "word_map": {}}
-    
+        """設定ファイルを読み込む（壊れていればバックアップを新しい順に試す）"""
+        config = copy.deepcopy(DEFAULT_CONFIG)
+        self.broken = False
+        for path in [self.config_file] + self.backup_paths():
+            if not os.path.exists(path):
+                continue
+            try:
+                with open(path, "r", encoding="utf-8") as f:
+                    loaded = json.load(f)
+            except (OSError, ValueError) as e:
+                logger.warning("Could not read %s: %s", path, e)
+                self.broken = self.broken or path == self.config_file
+                continue
+            if path != self.config_file:
+                logger.warning("Restored settings from backup %s", path)
+            config.update(loaded)
+            if "word_map" in config:
+                self.migrate_word_map(config)
+            logger.debug("Loaded config from %s (%d templates, %d search words)",
+                         path, len(config["templates"]), len(config["search_words"]))
+            break
+        return config
+
+    def backup_paths(self):
+        return [f"{self.config_file}.bak.{number}" for number in range(1, self.BACKUP_COUNT + 1)]
+
+    def migrate_word_map(self, config):
+        """旧形式（settings.json内のword_map）をストアに移し、settings.jsonから取り除く"""
+        word_map = config.pop("word_map")
+        removed, changed = self.word_store.replace(word_map)
+        self.write_config(config)
+        logger.info("Moved word_map (%d entries, %d changed, %d removed) from %s to %s",
+                    len(word_map), len(changed), len(removed), self.config_file, self.word_store.db_path)
+
+    def reload(self, config_file=None):
+        """設定ファイルを読み直し（config_fileを指定すればそのファイルに切り替え）、変わった値を通知する"""
+        self.flush()
+        old_words = None
+        with self.lock:
+            if config_file is not None and os.path.abspath(config_file) != self.config_file:
+                # 別のフォルダの設定に切り替える時はword_mapのストアも開き直す
+                old_words = dict(self.word_store)
+                self.word_store.close()
+                self.config_file = os.path.abspath(config_file)
+                self.word_store = self.open_word_store()
+                self.saved_text = None
+            config = self.load_config()
+        if old_words is not None:
+            new_words = self.word_store.load()
+            removed = [en for en in old_words if en not in new_words]
+            changed = {en: jp for en, jp in new_words.items() if old_words.get(en) != jp}
+            if removed or changed:
+                self.word_map_changed(removed, changed)
+        return self.update(**config)
+
     def save_config(self):
-        """設定ファイルを保存する"""
-        with open(self.config_file, "w", encoding="utf-8") as f:
-            json.dump(self.config, f, ensure_ascii=False, indent=4)
-        print(f"Saved config: {self.config}")  # デバッグ出力
-    
+        """設定ファイルの保存を予約する（word_mapは変更のたびにストアへ書き込み済み）
+
+        続けて呼ばれた場合はSAVE_DELAY秒後に1回だけ書き込む。終了時には未保存の分を必ず書き込む。
+        """
+        with self.lock:
+            self.dirty = True
+            if self.save_timer is not None:
+                self.save_timer.cancel()
+            self.save_timer = threading.Timer(self.SAVE_DELAY, self.flush)
+            self.save_timer.daemon = True
+            self.save_timer.start()
+
+    def flush(self):
+        """予約中の保存があればすぐに書き込む
+
+        書き込めなかった場合（容量不足、権限、他のプログラムによるロックなど）はログに残し、
+        未保存のまま次の保存や終了時にもう一度書き込む（タイマーのスレッドでは例外を受け取る人がいない）。
+        """
+        with self.lock:
+            if self.save_timer is not None:
+                self.save_timer.cancel()
+                self.save_timer = None
+            if not self.dirty:
+                return
+            try:
+                self.write_config(self.config)
+            except OSError as e:
+                logger.error("Could not save %s: %s", self.config_file, e)
+                return
+            self.dirty = False
+
+    def write_config(self, config):
+        """一時ファイルに書いてfsyncしてから置き換える（書き込み中に落ちても元のファイルは壊れない）"""
+        text = json.dumps(config, ensure_ascii=False, indent=4)
+        with self.lock:
+            if text == self.saved_text:
+                return
+            folder = os.path.dirname(self.config_file)
+            fd, temp_path = tempfile.mkstemp(prefix=".settings-", suffix=".tmp", dir=folder)
+            try:
+                with os.fdopen(fd, "w", encoding="utf-8") as f:
+                    f.write(text)
+                    f.flush()
+                    os.fsync(f.fileno())
+                # mkstempは所有者のみ読み書きできる権限で作るので、今のファイルか通常の新規ファイルに合わせる
+                if os.path.exists(self.config_file):
+                    shutil.copymode(self.config_file, temp_path)
+                else:
+                    os.chmod(temp_path, 0o666 & ~current_umask())
+                if not self.broken:
+                    self.rotate_backups()
+                os.replace(temp_path, self.config_file)
+            except BaseException:
+                if os.path.exists(temp_path):
+                    os.remove(temp_path)
+                raise
+            sync_directory(folder)
+            self.saved_text = text
+            self.broken = False
+        logger.debug("Saved config to %s", self.config_file)
+
+    def rotate_backups(self):
+        """今の設定ファイルを.bak.1にコピーし、古いバックアップを1つずつずらす"""
+        if not os.path.exists(self.config_file):
+            return
+        paths = self.backup_paths()
+        for older, newer in zip(reversed(paths), reversed(paths[:-1])):
+            if os.path.exists(newer):
+                os.replace(newer, older)
+        # 置き換えるまで元のファイルは残しておく
+        shutil.copy2(self.config_file, paths[0])
+
+    def subscribe(self, callback):
+        """値が変わった時にcallback(changes)を呼ぶ。メソッドは弱参照で持つので、持ち主が消えれば自動で外れる"""
+        ref = weakref.WeakMethod(callback) if hasattr(callback, "__self__") else (lambda: callback)
+        with self.lock:
+            self.subscribers.append(ref)
+
+    def unsubscribe(self, callback):
+        with self.lock:
+            self.subscribers = [ref for ref in self.subscribers if ref() not in (None, callback)]
+
+    def update(self, **values):
+        """複数の値をまとめて変更し、実際に変わったものだけを通知する。通知した変更の辞書を返す"""
+        if "word_map" in values:
+            # word_mapは差分だけをストアに書き込み、ストアからの通知で知らせる
+            self.word_store.replace(values.pop("word_map"))
+        changes = {}
+        with self.lock:
+            for key, value in values.items():
+                old = self.config.get(key)
+                if old != value:
+                    self.config[key] = copy.copy(value)
+                    changes[key] = (old, self.config[key])
+        if changes:
+            self.notify(changes)
+        return changes
+
+    def word_map_changed(self, removed, changed):
+        self.notify({"word_map": (removed, changed)})
+
+    def notify(self, changes):
+        with self.lock:
+            subscribers = []
+            for ref in self.subscribers:
+                callback = ref()
+                if callback is not None:
+                    subscribers.append(callback)
+            self.subscribers = [ref for ref in self.subscribers if ref() is not None]
+        logger.debug("Settings changed: %s", ", ".join(changes))
+        # ロックの外で呼び、通知先から設定を読んでも詰まらないようにする
+        for callback in subscribers:
+            callback(changes)
+
     def get_templates(self):
         """テンプレートを取得する"""
-        templates = self.config.get("templates", ["カスタム"])
-        print(f"Retrieved templates: {templates}")  # デバッグ出力
-        return templates
-    
+        return self.config.get("templates", ["カスタム"])
+
     def set_templates(self, templates):
         """テンプレートを設定する"""
-        self.config["templates"] = templates
-        print(f"Set templates: {templates}")  # デバッグ出力
-    
+        self.update(templates=templates)
+
     def get_search_words(self):
         """検索ワードを取得する"""
         return self.config.get("search_words", [])
-    
+
     def set_search_words(self, words):
         """検索ワードを設定する"""
-        self.config["search_words"] = words
-    
+        self.update(search_words=words)
+
     def get_word_map(self):
-        """ワードマップを取得する"""
-        return self.config.get("word_map", {})
-    
+        """ワードマップを取得する（WordStore。辞書と同じように読み書きでき、変更はすぐに保存される）"""
+        return self.word_store
+
     def set_word_map(self, word_map):
-        """ワードマップを設定する"""
-        self.config["word_map"] = word_map
-    
+        """ワードマップを設定する（変わった項目だけを書き込む）"""
+        self.word_store.replace(word_map)
+
+    def word_map_hash(self):
+        """word_mapの内容のハッシュ（メタデータキャッシュの変更検知用。全件は読み込まない）"""
+        return self.word_store.digest()
+
     def save(self):
         """設定を保存する（互換性のために残す）"""
-        self.save_config()
\ No newline at end of file
+        self.save_config()
+
+def current_umask():
+    """プロセスのumask（読み取るには一度設定し直すしかない）"""
+    umask = os.umask(0)
+    os.umask(umask)
+    return umask
+
+def sync_directory(folder):
+    """置き換えた名前をディスクに確定させる（ディレクトリを開けないWindowsでは何もしない）"""
+    try:
+        fd = os.open(folder, os.O_RDONLY)
+    except OSError:
+        return
+    try:
+        os.fsync(fd)
+    except OSError:
+        pass
+    finally:
+        os.close(fd)
@@ -0,0 +1,80 @@
+import json
+import threading
+
+# 計測する段階（表示順）
+STAGES = ("scan", "parse", "match", "plan", "execute")
+STAGE_NAMES = {
+    "scan": "走査",
+    "parse": "解析",
+    "match": "照合",
+    "plan": "計画",
+    "execute": "実行",
+}
+
+class Stats:
+    """段階ごとの所要時間・処理件数と、キャッシュのヒット数などのカウンターを集計する
+
+    ワーカースレッドからも呼ばれるのでロックで保護する。並列に動く段階の秒数は
+    各スレッドの合計（壁時計の時間ではない）。
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self.lock:
+            self.stages = {}    # 段階 -> [秒数, 件数]
+            self.counters = {}
+
+    def add_time(self, stage, seconds, items=1):
+        with self.lock:
+            entry = self.stages.get(stage)
+            if entry is None:
+                entry = self.stages[stage] = [0.0, 0]
+            entry[0] += seconds
+            entry[1] += items
+
+    def count(self, name, amount=1):
+        with self.lock:
+            self.counters[name] = self.counters.get(name, 0) + amount
+
+    def snapshot(self):
+        """集計結果をJSONにできる辞書で返す"""
+        with self.lock:
+            stages = {stage: list(entry) for stage, entry in self.stages.items()}
+            counters = dict(self.counters)
+        result = {"stages": {}, "counters": counters}
+        for stage in sorted(stages, key=lambda s: STAGES.index(s) if s in STAGES else len(STAGES)):
+            seconds, items = stages[stage]
+            result["stages"][stage] = {
+                "seconds": round(seconds, 6),
+                "items": items,
+                "per_second": round(items / seconds, 1) if seconds > 0 else None,
+            }
+        match_seconds = stages.get("match", (0.0, 0))[0]
+        if match_seconds > 0:
+            counters["matches_per_second"] = round(counters.get("words_matched", 0) / match_seconds, 1)
+        lookups = counters.get("cache_hits", 0) + counters.get("cache_misses", 0)
+        if lookups:
+            counters["cache_hit_rate"] = round(counters.get("cache_hits", 0) / lookups, 3)
+        return result
+
+    def to_json(self):
+        return json.dumps(self.snapshot(), ensure_ascii=False, indent=2)
+
+    def summary(self):
+        """ステータスバー用の1行の要約"""
+        snapshot = self.snapshot()
+        parts = []
+        for stage, entry in snapshot["stages"].items():
+            parts.append(f"{STAGE_NAMES.get(stage, stage)} {entry['items']:,}件 {entry['seconds']:.2f}秒")
+        counters = snapshot["counters"]
+        if "cache_hit_rate" in counters:
+            parts.append(f"キャッシュ {counters['cache_hit_rate']:.0%}")
+        if "matches_per_second" in counters:
+            parts.append(f"照合速度 {counters['matches_per_second']:,.0f}語/秒")
+        return " | ".join(parts)
+
+# プロセス全体で共有する集計
+STATS = Stats()
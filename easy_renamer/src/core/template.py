@@ -0,0 +1,213 @@
+"""リネームパターンを一度だけ解析し、ファイルごとには連結だけで名前を作るテンプレート
+
+パターンの書き方:
+  {long hair}       ワードタグ（word_mapの英語ワード。画像のプロンプトに含まれていれば翻訳、無ければ空）
+  {seq} {seq:3}     連番（固定部分＋番号。:3 は3桁にゼロ埋め）。パターン中の "固定部分＋開始番号" の文字列も連番になる
+  {seed} {steps}    生成情報（PROMPT_FIELDS）。一覧に無い項目は {field:項目名}
+  {date:%Y%m%d}     実行日
+  {name} {folder}   元のファイル名（拡張子なし）とフォルダ名
+  {mtime:%Y%m%d}    ファイルの更新日時
+  {{ }}             波括弧そのもの
+
+プレースホルダーの値（プロンプトなど）は、ファイル名に使えない文字を置き換えてから連結する。
+画像に無いワードタグは空になるので、連結した名前の連続する空白は1つにまとめ、前後の空白は取り除く。
+"""
+import os
+import re
+import time
+from datetime import datetime
+
+# 生成情報の "Steps: ..." 行から得られる主な項目（prompt_reader.parse_parametersのキー）
+PROMPT_FIELDS = (
+    "prompt", "negative_prompt", "steps", "sampler", "schedule_type", "cfg_scale", "seed",
+    "size", "model", "model_hash", "vae", "vae_hash", "clip_skip", "denoising_strength",
+    "hires_upscale", "hires_steps", "hires_upscaler", "version",
+)
+DEFAULT_DATE_FORMAT = "%Y%m%d"
+# ファイル名に使えない文字（パスの区切りとWindowsの予約文字は"_"、改行などの制御文字は空白にする）
+RESERVED_CHARS = re.compile(r'[<>:"/\\|?*]')
+CONTROL_CHARS = re.compile(r"[\x00-\x1f\x7f]")
+SPACES = re.compile(r" {2,}")
+
+def sanitize(text, strip=True):
+    """ファイル名の一部として使える文字列にする（stripなら末尾のピリオドと空白も除く。Windowsでは使えない）"""
+    if os.altsep:
+        text = text.replace(os.altsep, "_")
+    text = CONTROL_CHARS.sub(" ", RESERVED_CHARS.sub("_", text.replace(os.sep, "_")))
+    return text.rstrip(". ") if strip else text
+
+class TemplateError(ValueError):
+    """パターンの構文エラー、または未知のプレースホルダー"""
+
+    def __init__(self, message, unknown=()):
+        super().__init__(message)
+        self.unknown = list(unknown)
+
+class WordTag:
+    __slots__ = ("en_words",)
+
+    def __init__(self, en_words):
+        self.en_words = en_words
+
+    def render(self, index, path, translated, fields):
+        for en_word in self.en_words:
+            value = translated.get(en_word)
+            if value:
+                return value
+        return ""
+
+class Field:
+    __slots__ = ("name",)
+
+    def __init__(self, name):
+        self.name = name
+
+    def render(self, index, path, translated, fields):
+        value = fields.get(self.name)
+        return "" if value is None else str(value)
+
+class Sequence:
+    __slots__ = ("fixed_part", "start", "width")
+
+    def __init__(self, fixed_part, start, width):
+        self.fixed_part = fixed_part
+        self.start = start
+        self.width = width
+
+    def render(self, index, path, translated, fields):
+        return f"{self.fixed_part}{self.start + index:0{self.width}d}"
+
+class FileName:
+    __slots__ = ()
+
+    def render(self, index, path, translated, fields):
+        return os.path.splitext(os.path.basename(path))[0]
+
+class FolderName:
+    __slots__ = ()
+
+    def render(self, index, path, translated, fields):
+        return os.path.basename(os.path.dirname(os.path.abspath(path)))
+
+class ModifiedTime:
+    __slots__ = ("date_format",)
+
+    def __init__(self, date_format):
+        self.date_format = date_format
+
+    def render(self, index, path, translated, fields):
+        try:
+            return time.strftime(self.date_format, time.localtime(os.stat(path).st_mtime))
+        except OSError:
+            return ""
+
+class Template:
+    """コンパイル済みのパターン。partsは文字列（そのまま）とプレースホルダーの列"""
+
+    def __init__(self, parts, has_sequence):
+        self.parts = parts
+        self.has_sequence = has_sequence
+
+    def render(self, index, path, translated, fields):
+        """index番目（0始まり）の画像の新しい名前（拡張子なし）を返す。空になることもある"""
+        name = "".join(part if part.__class__ is str else sanitize(part.render(index, path, translated, fields))
+                       for part in self.parts)
+        return SPACES.sub(" ", name).strip(" ")
+
+def split_pattern(pattern):
+    """パターンを (文字列, None) と (名前, 書式) の列に分ける"""
+    tokens = []
+    literal = []
+    i = 0
+    length = len(pattern)
+    while i < length:
+        char = pattern[i]
+        if char in "{}" and pattern.startswith(char * 2, i):
+            literal.append(char)
+            i += 2
+        elif char == "{":
+            end = pattern.find("}", i + 1)
+            if end == -1 or "{" in pattern[i + 1:end]:
+                raise TemplateError(f"Unclosed '{{' at position {i}")
+            if literal:
+                tokens.append(("".join(literal), None))
+                literal = []
+            tokens.append((None, pattern[i + 1:end]))
+            i = end + 1
+        elif char == "}":
+            raise TemplateError(f"Single '}}' at position {i}")
+        else:
+            literal.append(char)
+            i += 1
+    if literal:
+        tokens.append(("".join(literal), None))
+    return tokens
+
+def parse_start(start_number):
+    """開始番号の文字列から (番号, 桁数) を返す（"001" なら3桁ゼロ埋め）"""
+    if not start_number.isdigit():
+        return 1, 0
+    width = len(start_number) if start_number.startswith("0") else 0
+    return int(start_number), width
+
+def compile_template(pattern, matcher, fixed_part="", start_number="1", now=None):
+    """パターンを解析してTemplateを返す。未知のプレースホルダーはまとめてTemplateErrorにする
+
+    matcherはワードタグの解決に使うWordMatcher。
+    """
+    start, width = parse_start(start_number)
+    base_sequence = f"{fixed_part}{start_number}"
+    date_source = now or datetime.now()
+    parts = []
+    unknown = []
+    has_sequence = False
+
+    for text, placeholder in split_pattern(pattern):
+        if text is not None:
+            # 従来どおり、連番の開始値の文字列（例: gr441）は連番に置き換える
+            if base_sequence and base_sequence in text:
+                pieces = text.split(base_sequence)
+                for position, piece in enumerate(pieces):
+                    if position:
+                        parts.append(Sequence(fixed_part, start, width))
+                    if piece:
+                        parts.append(sanitize(piece, strip=False))
+                has_sequence = True
+            else:
+                # パターンに書いた文字列はそのまま使う（区切り文字などは置き換える）
+                parts.append(sanitize(text, strip=False))
+            continue
+
+        name = placeholder.strip()
+        spec = ""
+        en_words = matcher.exact.get(matcher.normalize(name))
+        if en_words is None and ":" in name:
+            name, spec = (s.strip() for s in name.split(":", 1))
+            en_words = matcher.exact.get(matcher.normalize(name)) if not spec else None
+
+        if en_words:
+            parts.append(WordTag(en_words))
+        elif name == "seq":
+            if spec and not spec.isdigit():
+                raise TemplateError(f"Invalid sequence width: {{{placeholder}}}")
+            parts.append(Sequence(fixed_part, start, int(spec) if spec else width))
+            has_sequence = True
+        elif name == "date":
+            parts.append(sanitize(date_source.strftime(spec or DEFAULT_DATE_FORMAT)))
+        elif name == "mtime":
+            parts.append(ModifiedTime(spec or DEFAULT_DATE_FORMAT))
+        elif name == "name" and not spec:
+            parts.append(FileName())
+        elif name == "folder" and not spec:
+            parts.append(FolderName())
+        elif name == "field" and spec:
+            parts.append(Field(spec))
+        elif name in PROMPT_FIELDS and not spec:
+            parts.append(Field(name))
+        else:
+            unknown.append(placeholder)
+
+    if unknown:
+        names = ", ".join(f"{{{u}}}" for u in unknown)
+        raise TemplateError(f"Unknown placeholders: {names}", unknown)
+    return Template(parts, has_sequence)
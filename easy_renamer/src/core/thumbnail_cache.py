@@ -0,0 +1,85 @@
+import hashlib
+import os
+import threading
+from PIL import Image
+
+class ThumbnailCache:
+    """縮小デコードしたサムネイルをディスクに保存し、容量を超えたら古い順に削除するキャッシュ"""
+
+    def __init__(self, cache_dir, thumb_size=128, max_bytes=256 * 1024 * 1024):
+        self.cache_dir = cache_dir
+        self.thumb_size = thumb_size
+        self.max_bytes = max_bytes
+        self.lock = threading.Lock()
+        self.total_bytes = None  # 初回の書き込み時に計算する
+        os.makedirs(cache_dir, exist_ok=True)
+
+    def key(self, image_path, stat):
+        """ファイルの同一性（パス・サイズ・更新時刻）とサムネイルサイズから決まるキー"""
+        identity = f"{os.path.abspath(image_path)}\0{stat.st_size}\0{stat.st_mtime_ns}\0{self.thumb_size}"
+        return hashlib.sha1(identity.encode("utf-8")).hexdigest()
+
+    def path_for(self, key):
+        # 1ディレクトリのファイル数が増えすぎないよう先頭2文字で分ける
+        return os.path.join(self.cache_dir, key[:2], key + ".jpg")
+
+    def get(self, image_path):
+        """サムネイルのファイルパスを返す（なければ生成する）"""
+        stat = os.stat(image_path)
+        thumb_path = self.path_for(self.key(image_path, stat))
+        if os.path.exists(thumb_path):
+            try:
+                os.utime(thumb_path)  # 最近使った印（LRU用）
+            except OSError:
+                pass
+            return thumb_path
+        self.generate(image_path, thumb_path)
+        return thumb_path
+
+    def generate(self, image_path, thumb_path):
+        """draft()とthumbnail()で縮小デコードしてJPEGで保存する"""
+        size = (self.thumb_size, self.thumb_size)
+        with Image.open(image_path) as img:
+            img.draft("RGB", size)  # JPEGはデコード時点で縮小される
+            img.thumbnail(size)
+            if img.mode != "RGB":
+                img = img.convert("RGB")
+            os.makedirs(os.path.dirname(thumb_path), exist_ok=True)
+            temp_path = f"{thumb_path}.{threading.get_ident()}.tmp"
+            img.save(temp_path, "JPEG", quality=85)
+        os.replace(temp_path, thumb_path)
+        self.add_bytes(os.path.getsize(thumb_path))
+
+    def add_bytes(self, size):
+        with self.lock:
+            if self.total_bytes is None:
+                self.total_bytes = sum(size for _, size, _ in self.entries())
+            else:
+                self.total_bytes += size
+            if self.total_bytes > self.max_bytes:
+                self.evict()
+
+    def entries(self):
+        for root, _, files in os.walk(self.cache_dir):
+            for name in files:
+                if name.endswith(".jpg"):
+                    path = os.path.join(root, name)
+                    try:
+                        stat = os.stat(path)
+                    except OSError:
+                        continue
+                    yield path, stat.st_size, stat.st_mtime
+
+    def evict(self):
+        """最近使われていないものから、上限の8割になるまで削除する"""
+        target = self.max_bytes * 0.8
+        entries = sorted(self.entries(), key=lambda entry: entry[2])
+        self.total_bytes = sum(size for _, size, _ in entries)
+        for path, size, _ in entries:
+            if self.total_bytes <= target:
+                break
+            try:
+                os.remove(path)
+                self.total_bytes -= size
+            except OSError:
+                pass
@@ -0,0 +1,121 @@
+from collections import deque
+
+
+class WordMatcher:
+    """word_mapを一度だけコンパイルし、プロンプト長に比例する時間で照合する"""
+
+    def __init__(self, word_map, normalize):
+        self.word_map = dict(word_map)
+        self.normalize = normalize
+        self.keys = list(self.word_map.keys())
+        self.build()
+
+    def build(self):
+        """完全一致用のハッシュ索引を構築（部分一致用のオートマトンは初めて使う時に作る）"""
+        # 正規化済みキー -> 元の英語ワード（同じ正規化結果になるキーは全て保持）
+        self.exact = {}
+        for en_word in self.keys:
+            self.exact.setdefault(self.normalize(en_word), []).append(en_word)
+        self.automaton = None
+
+    def updated(self, removed, changed):
+        """word_mapの差分（削除したキー, 追加・変更した{英語: 日本語}）を反映した照合器を返す
+
+        自身は変更しないので、照合中の他スレッドにも影響しない。完全一致の索引は
+        追加・削除されたキーの分だけ直し、訳語だけの変更なら部分一致のオートマトンもそのまま使い回す。
+        """
+        matcher = WordMatcher.__new__(WordMatcher)
+        matcher.normalize = self.normalize
+        matcher.word_map = dict(self.word_map)
+        removed = [en_word for en_word in removed if en_word in matcher.word_map]
+        added = [en_word for en_word in changed if en_word not in matcher.word_map]
+        for en_word in removed:
+            del matcher.word_map[en_word]
+        matcher.word_map.update(changed)
+        if not removed and not added:
+            matcher.keys = self.keys
+            matcher.exact = self.exact
+            matcher.automaton = self.automaton
+            return matcher
+
+        matcher.keys = list(matcher.word_map)
+        matcher.exact = dict(self.exact)
+        for en_word in removed:
+            key = self.normalize(en_word)
+            words = [w for w in matcher.exact[key] if w != en_word]
+            if words:
+                matcher.exact[key] = words
+            else:
+                del matcher.exact[key]
+        for en_word in added:
+            key = self.normalize(en_word)
+            matcher.exact[key] = matcher.exact.get(key, []) + [en_word]
+        matcher.automaton = None
+        return matcher
+
+    def build_automaton(self):
+        """ファイル名の部分一致用のAho-Corasickオートマトンを構築（キーは正規化せずそのまま使う）"""
+        goto = [{}]
+        fail = [0]
+        output = [[]]
+        always = []  # 空文字キーは常に部分一致する
+        for index, en_word in enumerate(self.keys):
+            if not en_word:
+                always.append(index)
+                continue
+            state = 0
+            for char in en_word:
+                next_state = goto[state].get(char)
+                if next_state is None:
+                    next_state = len(goto)
+                    goto[state][char] = next_state
+                    goto.append({})
+                    fail.append(0)
+                    output.append([])
+                state = next_state
+            output[state].append(index)
+
+        queue = deque(goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for char, next_state in goto[state].items():
+                queue.append(next_state)
+                fallback = fail[state]
+                while fallback and char not in goto[fallback]:
+                    fallback = fail[fallback]
+                target = goto[fallback].get(char, 0)
+                fail[next_state] = target if target != next_state else 0
+                output[next_state] = output[next_state] + output[fail[next_state]]
+        # 複数のスレッドが同時に作っても、まとめて1回で差し替えるので途中の状態は見えない
+        self.automaton = (goto, fail, output, always)
+        return self.automaton
+
+    def match_words(self, words):
+        """正規化済みプロンプトワードを完全一致で翻訳する"""
+        translated = {}
+        for word in words:
+            for en_word in self.exact.get(word, ()):
+                translated[en_word] = self.word_map[en_word]
+        return translated
+
+    def find_in(self, text):
+        """text中に部分文字列として含まれるキーのインデックスをword_mapの順で返す"""
+        goto, fail, output, always = self.automaton or self.build_automaton()
+        found = set(always)
+        state = 0
+        for char in text:
+            while state and char not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(char, 0)
+            if output[state]:
+                found.update(output[state])
+        return sorted(found)
+
+    def match_substrings(self, words):
+        """ファイル名の各単語に含まれるキーを翻訳する"""
+        translated = {}
+        for word in words:
+            for index in self.find_in(word):
+                en_word = self.keys[index]
+                translated[en_word] = self.word_map[en_word]
+        return translated
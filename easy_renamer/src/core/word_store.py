@@ -0,0 +1,174 @@
+import csv
+import hashlib
+import logging
+import os
+import sqlite3
+import threading
+from collections.abc import MutableMapping
+
+logger = logging.getLogger(__name__)
+
+EMPTY_DIGEST = "0" * 40
+HEADERS = (("en", "jp"), ("英語", "日本語"))
+
+def entry_digest(en, jp):
+    return int.from_bytes(hashlib.sha1(f"{en}\x00{jp}".encode("utf-8")).digest(), "big")
+
+class WordStore(MutableMapping):
+    """word_map（英語ワード -> 日本語）をSQLiteに保存する辞書
+
+    追加・変更・削除はその項目だけを書き込む。内容は初めて読む時にまとめて読み込み、
+    以降はメモリ上の辞書から返す。並び順は追加した順（変更しても位置は変わらない）。
+    変更のたびにon_change(削除したキーのリスト, 追加・変更した{英語: 日本語})を呼ぶ。
+    """
+
+    SCHEMA_VERSION = 1
+
+    def __init__(self, db_path, on_change=None):
+        self.db_path = db_path
+        self.on_change = on_change
+        self.lock = threading.RLock()
+        self.conn = sqlite3.connect(db_path, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS words ("
+            "id INTEGER PRIMARY KEY AUTOINCREMENT, en TEXT NOT NULL UNIQUE, jp TEXT NOT NULL)"
+        )
+        self.conn.execute("CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT)")
+        self.conn.execute(f"PRAGMA user_version={self.SCHEMA_VERSION}")
+        self.conn.commit()
+        self.entries = None  # 読み込み済みの内容（未読み込みならNone）
+
+    def load(self):
+        """全件を読み込んだ辞書を返す（2回目以降は読み込み済みのもの）"""
+        with self.lock:
+            if self.entries is None:
+                self.entries = dict(self.conn.execute("SELECT en, jp FROM words ORDER BY id"))
+                logger.debug("Loaded %d words from %s", len(self.entries), self.db_path)
+            return self.entries
+
+    def __getitem__(self, en):
+        return self.load()[en]
+
+    def __contains__(self, en):
+        return en in self.load()
+
+    def __iter__(self):
+        return iter(list(self.load()))
+
+    def __len__(self):
+        with self.lock:
+            if self.entries is not None:
+                return len(self.entries)
+            return self.conn.execute("SELECT COUNT(*) FROM words").fetchone()[0]
+
+    def __setitem__(self, en, jp):
+        self.apply({en: jp})
+
+    def __delitem__(self, en):
+        if en not in self:
+            raise KeyError(en)
+        self.apply(removed=[en])
+
+    def update(self, other=(), **kwargs):
+        """まとめて追加・変更する（1回のトランザクション・1回の通知）"""
+        changed = dict(other)
+        changed.update(kwargs)
+        self.apply(changed)
+
+    def clear(self):
+        self.apply(removed=list(self))
+
+    def replace(self, word_map):
+        """内容をword_mapと同じにする（差分だけを書き込む）"""
+        current = self.load()
+        removed = [en for en in current if en not in word_map]
+        changed = {en: jp for en, jp in word_map.items() if current.get(en) != jp}
+        return self.apply(changed, removed)
+
+    def apply(self, changed=None, removed=()):
+        """削除と追加・変更を1回のトランザクションで書き込み、実際に変わった分を (削除, 追加・変更) で返す"""
+        changed = changed or {}
+        with self.lock:
+            digest = int(self.digest(), 16)
+            done_removed = []
+            done_changed = {}
+            with self.conn:
+                for en in removed:
+                    if en in changed:
+                        continue
+                    row = self.conn.execute("SELECT jp FROM words WHERE en = ?", (en,)).fetchone()
+                    if row is None:
+                        continue
+                    self.conn.execute("DELETE FROM words WHERE en = ?", (en,))
+                    digest ^= entry_digest(en, row[0])
+                    done_removed.append(en)
+                for en, jp in changed.items():
+                    en, jp = str(en), str(jp)
+                    row = self.conn.execute("SELECT jp FROM words WHERE en = ?", (en,)).fetchone()
+                    if row is not None:
+                        if row[0] == jp:
+                            continue
+                        self.conn.execute("UPDATE words SET jp = ? WHERE en = ?", (jp, en))
+                        digest ^= entry_digest(en, row[0])
+                    else:
+                        self.conn.execute("INSERT INTO words (en, jp) VALUES (?, ?)", (en, jp))
+                    digest ^= entry_digest(en, jp)
+                    done_changed[en] = jp
+                if done_removed or done_changed:
+                    self.conn.execute("INSERT OR REPLACE INTO meta VALUES ('digest', ?)", (f"{digest:040x}",))
+            if self.entries is not None:
+                for en in done_removed:
+                    del self.entries[en]
+                self.entries.update(done_changed)
+        if (done_removed or done_changed) and self.on_change is not None:
+            self.on_change(done_removed, done_changed)
+        return done_removed, done_changed
+
+    def digest(self):
+        """内容のハッシュ（変更のたびに差分だけで更新するので、全件を読み込まずに得られる）"""
+        with self.lock:
+            row = self.conn.execute("SELECT value FROM meta WHERE key = 'digest'").fetchone()
+        return row[0] if row else EMPTY_DIGEST
+
+    def import_file(self, path, replace=False):
+        """CSV/TSVファイルの (英語, 日本語) を取り込み、変わった件数を返す。replaceなら他の項目は削除する"""
+        word_map = dict(read_table(path))
+        if replace:
+            removed, changed = self.replace(word_map)
+        else:
+            removed, changed = self.apply(word_map)
+        logger.info("Imported %d words from %s (%d changed, %d removed)", len(word_map), path, len(changed), len(removed))
+        return len(removed) + len(changed)
+
+    def export_file(self, path):
+        """CSV/TSVファイルに全件を書き出し、件数を返す"""
+        entries = dict(self.load())
+        write_table(path, entries.items())
+        return len(entries)
+
+    def close(self):
+        with self.lock:
+            self.conn.close()
+
+def table_dialect(path):
+    """拡張子が.tsv/.txtならタブ区切り、それ以外はカンマ区切り"""
+    return "excel-tab" if os.path.splitext(path)[1].lower() in (".tsv", ".txt") else "excel"
+
+def read_table(path):
+    """CSV/TSVから (英語, 日本語) を読む。見出し行と空行、列が足りない行は飛ばす"""
+    # Excelで保存したCSVのBOMも読めるようにutf-8-sigで開く
+    with open(path, "r", encoding="utf-8-sig", newline="") as f:
+        for index, row in enumerate(csv.reader(f, table_dialect(path))):
+            if len(row) < 2 or not row[0].strip():
+                continue
+            en, jp = row[0].strip(), row[1].strip()
+            if index == 0 and (en.lower(), jp.lower()) in HEADERS:
+                continue
+            yield en, jp
+
+def write_table(path, items):
+    with open(path, "w", encoding="utf-8", newline="") as f:
+        writer = csv.writer(f, table_dialect(path))
+        writer.writerow(HEADERS[0])
+        writer.writerows(items)
@@ -1,13 +1,35 @@
 import sys
 import os
-from PyQt5.QtWidgets import QApplication
-from PyQt5.QtGui import QIcon
-from ui.main_window import MainWindow
 
-if __name__ == "__main__":
+# モジュールはsrcを起点に読み込む（core, ui, utils, cli）。インストールしたコンソールスクリプトから
+# src.main:mainとして呼ばれた場合もsrcが検索パスに無いので、先に追加しておく
+SRC_DIR = os.path.dirname(os.path.abspath(__file__))
+if SRC_DIR not in sys.path:
+    sys.path.insert(0, SRC_DIR)
+
+from utils.log import setup_logging
+
+VERBOSE_FLAGS = ("-v", "--verbose")
+
+def main():
+    args = sys.argv[1:]
+    # --verbose以外の引数があればGUIを起動せずにコマンドラインモードで動かす（PyQt5を読み込まない）
+    if [arg for arg in args if arg not in VERBOSE_FLAGS]:
+        from cli import main as cli_main
+        return cli_main(args)
+    
+    setup_logging(verbose=bool(args))
+    
+    from PyQt5.QtWidgets import QApplication
+    from PyQt5.QtGui import QIcon
+    from ui.main_window import MainWindow
+    
     app = QApplication(sys.argv)
     if os.path.exists("assets/icon.ico"):
         app.setWindowIcon(QIcon("assets/icon.ico"))
     window = MainWindow()
     window.show()
-    sys.exit(app.exec_())
+    return app.exec_()
+
+if __name__ == "__main__":
+    sys.exit(main())
\ No newline at end of file
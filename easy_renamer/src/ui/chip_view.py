@@ -0,0 +1,229 @@
+from PyQt5.QtWidgets import QAbstractScrollArea
+from PyQt5.QtCore import pyqtSignal, Qt, QAbstractListModel, QModelIndex, QRect, QSize
+from PyQt5.QtGui import QPainter, QColor, QFontMetrics
+from bisect import bisect_right
+
+KEY_ROLE = Qt.UserRole  # チップのキー（検索ワードや英語ワード）を返すロール
+
+class ChipModel(QAbstractListModel):
+    """チップ（キーと表示文字列の組）の一覧。追加・変更・削除はその行だけを通知する"""
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.keys = []
+        self.texts = []
+        self.rows = {}  # キー -> 行番号（同じキーが複数あれば最後の行）
+
+    def rowCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self.keys)
+
+    def data(self, index, role=Qt.DisplayRole):
+        if not index.isValid():
+            return None
+        if role == Qt.DisplayRole:
+            return self.texts[index.row()]
+        if role == KEY_ROLE:
+            return self.keys[index.row()]
+        return None
+
+    def key(self, row):
+        return self.keys[row]
+
+    def row_of(self, key):
+        return self.rows.get(key)
+
+    def set_items(self, items):
+        """(キー, 表示文字列) の一覧で全体を入れ替える"""
+        self.beginResetModel()
+        self.keys = [key for key, _ in items]
+        self.texts = [text for _, text in items]
+        self.rows = {key: row for row, key in enumerate(self.keys)}
+        self.endResetModel()
+
+    def append_chip(self, key, text):
+        row = len(self.keys)
+        self.beginInsertRows(QModelIndex(), row, row)
+        self.keys.append(key)
+        self.texts.append(text)
+        self.rows[key] = row
+        self.endInsertRows()
+
+    def set_chip(self, row, key, text):
+        if self.rows.get(self.keys[row]) == row:
+            del self.rows[self.keys[row]]
+        self.keys[row] = key
+        self.texts[row] = text
+        self.rows[key] = row
+        index = self.index(row)
+        self.dataChanged.emit(index, index, [Qt.DisplayRole])
+
+    def remove_chip(self, row):
+        self.beginRemoveRows(QModelIndex(), row, row)
+        del self.keys[row]
+        del self.texts[row]
+        # 後ろの行だけ番号を詰める
+        self.rows = {key: r for key, r in self.rows.items() if r < row}
+        for r in range(row, len(self.keys)):
+            self.rows[self.keys[r]] = r
+        self.endRemoveRows()
+
+class ChipView(QAbstractScrollArea):
+    """ChipModelのチップを左から折り返して並べるビュー
+
+    チップの幅は追加・変更された時にだけ測って表に持ち、折り返し位置は変わった行から
+    後ろだけを表の数値から計算し直す（ウィジェットは作らない）。描画とクリック判定は
+    見えている表示行だけを対象にする。
+    """
+    chipClicked = pyqtSignal(int)  # 行番号
+
+    CHIP_HEIGHT = 18
+    SPACING = 2
+    PADDING = 2
+    MARGIN = 2
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.model = None
+        self.widths = []        # 行番号 -> チップの幅
+        self.line_starts = [0]  # 表示行 -> 先頭のチップの行番号
+        self.layout_width = 0
+        self.current_row = None
+        self.setHorizontalScrollBarPolicy(Qt.ScrollBarAlwaysOff)
+        self.setVerticalScrollBarPolicy(Qt.ScrollBarAsNeeded)
+        self.verticalScrollBar().setSingleStep(self.CHIP_HEIGHT + self.SPACING)
+        self.setStyleSheet("QAbstractScrollArea { border: 1px solid #a0a0a0; background-color: #ffffff; }")
+
+    def setModel(self, model):
+        self.model = model
+        model.modelReset.connect(self.reset_widths)
+        model.rowsInserted.connect(self.rows_inserted)
+        model.rowsRemoved.connect(self.rows_removed)
+        model.dataChanged.connect(self.data_changed)
+        self.reset_widths()
+
+    def sizeHint(self):
+        return QSize(400, 100)
+
+    def chip_widths(self, first, last):
+        """first〜last行のチップの幅（文字列の幅＋余白と枠線）"""
+        metrics = QFontMetrics(self.font())
+        extra = self.PADDING * 2 + 2
+        return [metrics.horizontalAdvance(self.model.data(self.model.index(row))) + extra
+                for row in range(first, last + 1)]
+
+    def reset_widths(self):
+        self.current_row = None
+        self.widths = self.chip_widths(0, self.model.rowCount() - 1)
+        self.relayout_from(0)
+
+    def rows_inserted(self, parent, first, last):
+        self.widths[first:first] = self.chip_widths(first, last)
+        if self.current_row is not None and self.current_row >= first:
+            self.current_row += last - first + 1
+        self.relayout_from(first)
+
+    def rows_removed(self, parent, first, last):
+        del self.widths[first:last + 1]
+        if self.current_row is not None:
+            if first <= self.current_row <= last:
+                self.current_row = None
+            elif self.current_row > last:
+                self.current_row -= last - first + 1
+        self.relayout_from(first)
+
+    def data_changed(self, top_left, bottom_right, roles=()):
+        first, last = top_left.row(), bottom_right.row()
+        self.widths[first:last + 1] = self.chip_widths(first, last)
+        self.relayout_from(first)
+
+    def relayout_from(self, row):
+        """rowを含む表示行から後ろの折り返し位置を計算し直す（それより前は変わらない）"""
+        line = max(0, bisect_right(self.line_starts, row) - 1)
+        if line and self.line_starts[line] == row:
+            line -= 1  # 行頭のチップが変わると、前の行に収まるようになることがある
+        del self.line_starts[line + 1:]
+        available = self.layout_width - self.MARGIN * 2
+        x = 0
+        for index in range(self.line_starts[line], len(self.widths)):
+            width = self.widths[index]
+            if x and x + width > available:
+                self.line_starts.append(index)
+                x = 0
+            x += width + self.SPACING
+        self.update_scroll_range()
+        self.viewport().update()
+
+    def line_count(self):
+        return len(self.line_starts) if self.widths else 0
+
+    def line_end(self, line):
+        return self.line_starts[line + 1] if line + 1 < len(self.line_starts) else len(self.widths)
+
+    def update_scroll_range(self):
+        line_height = self.CHIP_HEIGHT + self.SPACING
+        total = self.MARGIN * 2 + self.line_count() * line_height
+        page = self.viewport().height()
+        bar = self.verticalScrollBar()
+        bar.setPageStep(page)
+        bar.setRange(0, max(0, total - page))
+
+    def resizeEvent(self, event):
+        super().resizeEvent(event)
+        width = self.viewport().width()
+        if width != self.layout_width:
+            self.layout_width = width
+            self.relayout_from(0)
+        else:
+            self.update_scroll_range()
+
+    def visible_lines(self):
+        line_height = self.CHIP_HEIGHT + self.SPACING
+        top = self.verticalScrollBar().value()
+        first = max(0, (top - self.MARGIN) // line_height)
+        last = min(self.line_count() - 1, (top + self.viewport().height() - self.MARGIN) // line_height)
+        return range(first, last + 1)
+
+    def line_top(self, line):
+        return self.MARGIN + line * (self.CHIP_HEIGHT + self.SPACING) - self.verticalScrollBar().value()
+
+    def paintEvent(self, event):
+        painter = QPainter(self.viewport())
+        painter.fillRect(self.viewport().rect(), QColor("#ffffff"))
+        border = QColor("#a0a0a0")
+        selected = QColor("#0078d7")
+        for line in self.visible_lines():
+            y = self.line_top(line)
+            x = self.MARGIN
+            for row in range(self.line_starts[line], self.line_end(line)):
+                rect = QRect(x, y, self.widths[row], self.CHIP_HEIGHT)
+                if row == self.current_row:
+                    painter.fillRect(rect, selected)
+                    painter.setPen(Qt.white)
+                else:
+                    painter.setPen(Qt.black)
+                painter.drawText(rect.adjusted(self.PADDING + 1, 0, -self.PADDING, 0), Qt.AlignVCenter | Qt.AlignLeft,
+                                 self.model.data(self.model.index(row)))
+                painter.setPen(border)
+                painter.drawRect(rect.adjusted(0, 0, -1, -1))
+                x += self.widths[row] + self.SPACING
+
+    def chip_at(self, pos):
+        """座標にあるチップの行番号（無ければNone）"""
+        for line in self.visible_lines():
+            y = self.line_top(line)
+            if not y <= pos.y() < y + self.CHIP_HEIGHT:
+                continue
+            x = self.MARGIN
+            for row in range(self.line_starts[line], self.line_end(line)):
+                if x <= pos.x() < x + self.widths[row]:
+                    return row
+                x += self.widths[row] + self.SPACING
+        return None
+
+    def mousePressEvent(self, event):
+        row = self.chip_at(event.pos())
+        if row is not None:
+            self.current_row = row
+            self.viewport().update()
+            self.chipClicked.emit(row)
+        super().mousePressEvent(event)
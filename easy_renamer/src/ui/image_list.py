@@ -1,7 +1,145 @@
-from PyQt5.QtWidgets import QListWidget, QPushButton, QVBoxLayout, QWidget, QListWidgetItem, QApplication
-from PyQt5.QtCore import pyqtSignal, Qt
+from PyQt5.QtWidgets import QListView, QVBoxLayout, QWidget, QAbstractItemView, QCheckBox
+from PyQt5.QtCore import pyqtSignal, Qt, QThread, QAbstractListModel, QModelIndex, QObject, QRunnable, QThreadPool, QSize
+from PyQt5.QtGui import QImage, QPixmap, QIcon
+from collections import OrderedDict
+from core.scanner import scan_images
+from core.thumbnail_cache import ThumbnailCache
+import logging
 import os
 
+logger = logging.getLogger(__name__)
+
+THUMBNAIL_SIZE = 128
+
+class FolderScanner(QThread):
+    """フォルダをバックグラウンドで走査し、見つかった画像パスをバッチごとに通知する"""
+    batch_found = pyqtSignal(int, list)
+    scan_finished = pyqtSignal(int)
+
+    def __init__(self, folder, generation, first_batch_size, parent=None):
+        super().__init__(parent)
+        self.folder = folder
+        self.generation = generation
+        self.first_batch_size = first_batch_size
+
+    def run(self):
+        try:
+            for batch in scan_images(self.folder, is_cancelled=self.isInterruptionRequested,
+                                     first_batch_size=self.first_batch_size):
+                self.batch_found.emit(self.generation, batch)
+        except OSError as e:
+            logger.warning("Error scanning folder %s: %s", self.folder, e)
+        self.scan_finished.emit(self.generation)
+
+PATH_ROLE = 32  # 画像のフルパスを返すロール
+
+class ThumbnailSignals(QObject):
+    loaded = pyqtSignal(int, str, QImage)  # 世代番号, パス, 画像（失敗ならnull）
+
+class ThumbnailTask(QRunnable):
+    """ワーカースレッドでサムネイルを生成（またはディスクキャッシュから読み込み）する"""
+
+    def __init__(self, cache, image_path, signals, generation):
+        super().__init__()
+        self.cache = cache
+        self.image_path = image_path
+        self.signals = signals
+        self.generation = generation
+
+    def run(self):
+        try:
+            image = QImage(self.cache.get(self.image_path))
+        except Exception as e:
+            logger.warning("Failed to create thumbnail for %s: %s", self.image_path, e)
+            image = QImage()
+        self.signals.loaded.emit(self.generation, self.image_path, image)
+
+class ImageListModel(QAbstractListModel):
+    """フォルダ内の全画像パスを保持するモデル（表示名は必要になった行だけ計算する）"""
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.images = []
+        self.rows = {}  # パス -> 行番号
+        self.show_thumbnails = False
+        self.thumbnail_cache = None
+        # メモリ上のサムネイル（件数上限付きLRU）。読み直すと同じパスが別の画像になっていることがあるので、
+        # clearで空にし、それより前に依頼した生成の結果は世代番号で捨てる
+        self.thumbnails = OrderedDict()
+        self.generation = 0
+        self.max_thumbnails = 1000
+        self.pending = set()
+        self.thread_pool = QThreadPool(self)
+        self.thread_pool.setMaxThreadCount(max(1, min(4, QThreadPool.globalInstance().maxThreadCount())))
+        self.signals = ThumbnailSignals(self)
+        self.signals.loaded.connect(self.handle_thumbnail_loaded)
+
+    def rowCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self.images)
+
+    def data(self, index, role=Qt.DisplayRole):
+        if not index.isValid():
+            return None
+        if role == Qt.DisplayRole:
+            return os.path.basename(self.images[index.row()])
+        if role == PATH_ROLE:
+            return self.images[index.row()]
+        if role == Qt.DecorationRole and self.show_thumbnails:
+            return self.thumbnail(self.images[index.row()])
+        return None
+
+    def set_show_thumbnails(self, enabled):
+        self.show_thumbnails = enabled
+        if enabled and self.thumbnail_cache is None:
+            self.thumbnail_cache = ThumbnailCache(os.path.abspath("thumbnail_cache"), THUMBNAIL_SIZE)
+        if self.images:
+            self.dataChanged.emit(self.index(0), self.index(len(self.images) - 1), [Qt.DecorationRole])
+
+    def thumbnail(self, image_path):
+        """表示中の行のサムネイルを返す。未生成ならバックグラウンドで生成を依頼してNoneを返す"""
+        icon = self.thumbnails.get(image_path)
+        if icon is not None:
+            self.thumbnails.move_to_end(image_path)
+            return icon
+        if image_path not in self.pending:
+            self.pending.add(image_path)
+            self.thread_pool.start(ThumbnailTask(self.thumbnail_cache, image_path, self.signals, self.generation))
+        return None
+
+    def handle_thumbnail_loaded(self, generation, image_path, image):
+        if generation != self.generation:
+            return
+        self.pending.discard(image_path)
+        row = self.rows.get(image_path)
+        if row is None:
+            return
+        # 読めなかった画像も空のアイコンとして覚え、再描画のたびに生成を依頼し直さない
+        self.thumbnails[image_path] = QIcon() if image.isNull() else QIcon(QPixmap.fromImage(image))
+        if len(self.thumbnails) > self.max_thumbnails:
+            self.thumbnails.popitem(last=False)
+        index = self.index(row)
+        self.dataChanged.emit(index, index, [Qt.DecorationRole])
+
+    def clear(self):
+        self.beginResetModel()
+        self.thread_pool.clear()  # 前のフォルダの未着手のサムネイル生成を破棄
+        self.generation += 1
+        self.pending = set()
+        self.thumbnails.clear()
+        self.images = []
+        self.rows = {}
+        self.endResetModel()
+
+    def append_images(self, paths):
+        if not paths:
+            return
+        start = len(self.images)
+        self.beginInsertRows(QModelIndex(), start, start + len(paths) - 1)
+        self.images.extend(paths)
+        for row, path in enumerate(paths, start):
+            self.rows[path] = row
+        self.endInsertRows()
+
 class ImageList(QWidget):
     itemClicked = pyqtSignal(object)
 
@@ -9,75 +147,102 @@ class ImageList(QWidget):
         super().__init__()
         self.layout = QVBoxLayout(self)
         self.layout.setContentsMargins(0, 0, 0, 0)  # マージンをゼロに
-        self.list_widget = QListWidget()
-        self.list_widget.setSelectionMode(QListWidget.ExtendedSelection)
-        self.list_widget.setStyleSheet("border: 1px solid #808080;")  # 枠線を明確に
+        self.model = ImageListModel(self)
+        self.list_view = QListView()
+        self.list_view.setModel(self.model)
+        self.list_view.setSelectionMode(QAbstractItemView.ExtendedSelection)
+        # 全行を同じ高さとして扱い、見えている範囲だけを少しずつレイアウトする
+        self.list_view.setUniformItemSizes(True)
+        self.list_view.setLayoutMode(QListView.Batched)
+        self.list_view.setBatchSize(500)
+        self.list_view.setStyleSheet("border: 1px solid #808080;")  # 枠線を明確に
+        self.thumbnail_check = QCheckBox("サムネイル表示")
+        self.thumbnail_check.toggled.connect(self.set_thumbnail_mode)
+        self.layout.addWidget(self.thumbnail_check)
+        self.layout.addWidget(self.list_view)
         
-        self.prev_button = QPushButton("前へ")
-        self.next_button = QPushButton("次へ")
-        self.layout.addWidget(self.list_widget)
-        self.layout.addWidget(self.prev_button)
-        self.layout.addWidget(self.next_button)
-        
-        self.images = []
-        self.page_size = 20
-        self.current_page = 0
-        self.last_selected = None
+        self.first_batch_size = 100  # 最初に表示する件数
+        self.scanner = None
+        self.scan_generation = 0  # 古い走査結果を無視するための世代番号
+        self.running_scanners = set()  # 中断を依頼した後も含め、まだ終わっていない走査のスレッド
         
-        self.prev_button.clicked.connect(self.prev_page)
-        self.next_button.clicked.connect(self.next_page)
-        self.list_widget.itemClicked.connect(self.handle_item_clicked)
+        self.list_view.selectionModel().currentChanged.connect(self.handle_current_changed)
+    
+    def set_thumbnail_mode(self, enabled):
+        """ファイル名一覧とサムネイルグリッドを切り替える"""
+        if enabled:
+            self.list_view.setViewMode(QListView.IconMode)
+            self.list_view.setIconSize(QSize(THUMBNAIL_SIZE, THUMBNAIL_SIZE))
+            self.list_view.setGridSize(QSize(THUMBNAIL_SIZE + 24, THUMBNAIL_SIZE + 36))
+            self.list_view.setMovement(QListView.Static)
+            self.list_view.setResizeMode(QListView.Adjust)
+        else:
+            self.list_view.setViewMode(QListView.ListMode)
+            self.list_view.setIconSize(QSize())
+            self.list_view.setGridSize(QSize())
+        self.model.set_show_thumbnails(enabled)
+    
+    @property
+    def images(self):
+        return self.model.images
     
     def load_images(self, folder):
-        self.images = []
-        for file in os.listdir(folder):
-            if file.lower().endswith(('.png', '.jpg', '.jpeg')):
-                self.images.append(os.path.join(folder, file))
-        print(f"Loaded images: {self.images}")
-        self.current_page = 0
-        self.show_page()
+        """フォルダの走査をバックグラウンドで開始する（結果は届いた分から表示）"""
+        self.cancel_scan()
+        self.scan_generation += 1
+        self.model.clear()
+        self.scanner = FolderScanner(folder, self.scan_generation, self.first_batch_size, self)
+        self.scanner.batch_found.connect(self.add_images)
+        self.scanner.scan_finished.connect(self.handle_scan_finished)
+        self.scanner.finished.connect(self.scanner.deleteLater)
+        scanner = self.scanner
+        scanner.finished.connect(lambda: self.running_scanners.discard(scanner))
+        self.running_scanners.add(scanner)
+        scanner.start()
     
-    def show_page(self):
-        self.list_widget.clear()
-        start = self.current_page * self.page_size
-        end = min(start + self.page_size, len(self.images))
-        print(f"Showing page {self.current_page} with images: {self.images[start:end]}")
-        for i in range(start, end):
-            item = QListWidgetItem(os.path.basename(self.images[i]))
-            item.setData(32, self.images[i])
-            self.list_widget.addItem(item)
-        self.prev_button.setEnabled(self.current_page > 0)
-        self.next_button.setEnabled(end < len(self.images))
-        self.last_selected = None
+    def cancel_scan(self):
+        """走査中なら中断する（別のフォルダを選んだ時など）"""
+        if self.scanner is not None:
+            self.scanner.requestInterruption()
+            self.scanner = None
     
-    def prev_page(self):
-        if self.current_page > 0:
-            self.current_page -= 1
-            self.show_page()
+    def shutdown(self):
+        """終了時に走査のスレッドを中断して終わるまで待つ（動いたまま破棄するとアプリごと異常終了する）"""
+        self.cancel_scan()
+        for scanner in list(self.running_scanners):
+            scanner.requestInterruption()
+            scanner.wait()
+        self.running_scanners.clear()
+        # 未着手のサムネイル生成は捨て、実行中のものは終わるまで待つ
+        self.model.thread_pool.clear()
+        self.model.thread_pool.waitForDone()
     
-    def next_page(self):
-        if (self.current_page + 1) * self.page_size < len(self.images):
-            self.current_page += 1
-            self.show_page()
+    def add_images(self, generation, batch):
+        if generation == self.scan_generation:
+            self.model.append_images(batch)
     
-    def handle_item_clicked(self, item):
-        modifiers = QApplication.keyboardModifiers()
-        if modifiers == Qt.ControlModifier:
-            if item.isSelected():
-                item.setSelected(False)
-            else:
-                item.setSelected(True)
-        elif modifiers == Qt.ShiftModifier and self.last_selected is not None:
-            start = self.list_widget.row(self.last_selected)
-            end = self.list_widget.row(item)
-            for i in range(min(start, end), max(start, end) + 1):
-                self.list_widget.item(i).setSelected(True)
-        else:
-            self.list_widget.clearSelection()
-            item.setSelected(True)
-            self.last_selected = item
-        self.itemClicked.emit(item)
+    def handle_scan_finished(self, generation):
+        if generation == self.scan_generation:
+            logger.info("Loaded %d images", len(self.images))
+            self.scanner = None
+    
+    def handle_current_changed(self, current, previous):
+        if current.isValid():
+            self.itemClicked.emit(current)
+    
+    def current_item(self):
+        """選択中の先頭の項目（なければNone）"""
+        rows = self.list_view.selectionModel().selectedRows()
+        if not rows:
+            return None
+        return min(rows, key=lambda index: index.row())
+    
+    def neighbor_paths(self, index):
+        """indexの次と前の画像パス（プレビューの先読み用）"""
+        row = index.row()
+        return [self.images[i] for i in (row + 1, row - 1) if 0 <= i < len(self.images)]
     
     def get_selected_images(self):
-        selected_items = self.list_widget.selectedItems()
-        return [os.path.normpath(item.data(32)) for item in selected_items]
\ No newline at end of file
+        """フォルダ全体から選択中の画像パスを行順で返す"""
+        rows = sorted(index.row() for index in self.list_view.selectionModel().selectedRows())
+        return [os.path.normpath(self.images[row]) for row in rows]
\ No newline at end of file
@@ -1,14 +1,20 @@
 from PyQt5.QtWidgets import QMainWindow, QWidget, QVBoxLayout, QHBoxLayout, QPushButton, QFileDialog, QLabel, QSplitter, QMessageBox
-from PyQt5.QtCore import Qt
+from PyQt5.QtCore import Qt, QTimer
 from PyQt5.QtGui import QPalette, QColor, QIcon
 from ui.image_list import ImageList
 from ui.preview import Preview
 from ui.word_blocks import WordBlocks
 from ui.settings_dialog import SettingsDialog
-from core.renamer import Renamer
-from utils.helpers import count_fullwidth_chars
+from ui.rename_progress import RenameWorker, RenameProgressDialog
+from core.renamer import Renamer, MAX_NAME_WIDTH
+from core.stats import STATS
+from core.template import TemplateError, parse_start
+from utils.width import display_width
+import logging
 import os
 
+logger = logging.getLogger(__name__)
+
 class MainWindow(QMainWindow):
     def __init__(self):
         super().__init__()
@@ -37,12 +43,14 @@ class MainWindow(QMainWindow):
         self.refresh_button = QPushButton("再読み込み")
         self.settings_button = QPushButton("設定")
         self.rename_button = QPushButton("リネーム実行")
+        self.undo_button = QPushButton("元に戻す")
         
         if os.path.exists("assets/icon.ico"):
             self.folder_button.setIcon(QIcon("assets/icon.ico"))
             self.refresh_button.setIcon(QIcon("assets/icon.ico"))
             self.settings_button.setIcon(QIcon("assets/icon.ico"))
             self.rename_button.setIcon(QIcon("assets/icon.ico"))
+            self.undo_button.setIcon(QIcon("assets/icon.ico"))
         
         right_layout.addWidget(QLabel("プレビュー:"))
         right_layout.addWidget(self.preview, 7)
@@ -52,8 +60,16 @@ class MainWindow(QMainWindow):
         right_layout.addWidget(self.refresh_button)
         right_layout.addWidget(self.settings_button)
         right_layout.addWidget(self.rename_button)
+        right_layout.addWidget(self.undo_button)
         right_widget.setMinimumWidth(200)  # リネームエリアの最小幅
         
+        # 段階ごとの処理件数と時間をステータスバーに表示する（詳細はツールチップ）
+        self.stats_label = QLabel("")
+        self.statusBar().addPermanentWidget(self.stats_label, 1)
+        self.stats_timer = QTimer(self)
+        self.stats_timer.timeout.connect(self.update_stats)
+        self.stats_timer.start(1000)
+        
         self.splitter.addWidget(right_widget)
         self.splitter.setSizes([300, 1100])  # 初期サイズ（合計1400px）
         
@@ -64,13 +80,22 @@ class MainWindow(QMainWindow):
         self.folder_button.clicked.connect(self.select_folder)
         self.refresh_button.clicked.connect(self.refresh_metadata)
         self.rename_button.clicked.connect(self.execute_rename)
+        self.undo_button.clicked.connect(self.undo_rename)
         self.settings_button.clicked.connect(self.open_settings)
         self.image_list.itemClicked.connect(self.update_preview)
         self.word_blocks.pattern_input.textChanged.connect(self.check_pattern)
         
         self.renamer = Renamer()
         self.current_folder = None  # 選択したフォルダを保持
+        self.rename_worker = None
+        QTimer.singleShot(0, self.check_interrupted_rename)
 
+    def update_stats(self):
+        summary = STATS.summary()
+        if summary != self.stats_label.text():
+            self.stats_label.setText(summary)
+            self.stats_label.setToolTip(STATS.to_json())
+    
     def on_splitter_moved(self, pos, index):
         """スプリッターが動いている間のウィンドウサイズ固定"""
         if not self.is_dragging:
@@ -95,25 +120,32 @@ class MainWindow(QMainWindow):
         image_path = item.data(32)
         if os.path.exists(image_path):
             self.preview.update_image(image_path)
+            self.preview.prefetch(self.image_list.neighbor_paths(item))
             metadata = self.renamer.get_metadata(image_path)
-            print(f"Translated metadata: {metadata}")
+            logger.debug("Translated metadata: %s", metadata)
             self.word_blocks.update_candidates(metadata)
         else:
-            print(f"Skipping preview update: File not found - {image_path}")
+            logger.warning("Skipping preview update: File not found - %s", image_path)
             self.preview.clear()
     
     def refresh_metadata(self):
-        self.renamer.update_word_map()
-        selected_items = self.image_list.list_widget.selectedItems()
-        if selected_items:
-            self.update_preview(selected_items[0])
+        # word_mapの変更は設定の通知で照合器に反映済み
+        selected_item = self.image_list.current_item()
+        if selected_item is not None:
+            self.update_preview(selected_item)
         else:
-            print("No selected items to refresh.")
+            logger.debug("No selected items to refresh.")
     
     def check_pattern(self):
         pattern = self.word_blocks.get_rename_pattern()
-        char_count = count_fullwidth_chars(pattern)
-        if char_count > 65:
+        fixed_part, start_number = self.word_blocks.get_sequence_info()
+        try:
+            self.renamer.compile_pattern(pattern, fixed_part, start_number)
+        except TemplateError as e:
+            self.warning_label.setText(f"警告: パターンが正しくありません（{e}）")
+            self.warning_label.setStyleSheet("color: red;")
+            return
+        if display_width(pattern) > MAX_NAME_WIDTH:
             self.warning_label.setText("警告: 文字数が65文字を超えています")
             self.warning_label.setStyleSheet("color: red;")
         else:
@@ -127,10 +159,15 @@ class MainWindow(QMainWindow):
         
         pattern = self.word_blocks.get_rename_pattern()
         fixed_part, start_number = self.word_blocks.get_sequence_info()
-        base_sequence = f"{fixed_part}{start_number}"  # 連番の開始値（例: gr441）
+        try:
+            # パターンは実行前に一度だけ解析し、誤りはファイルごとではなくここで報告する
+            template = self.renamer.compile_pattern(pattern, fixed_part, start_number)
+        except TemplateError as e:
+            QMessageBox.warning(self, "警告", f"パターンが正しくありません。\n{e}")
+            return
         
         # 単一リネーム時のみ、連番未追加の確認
-        if len(selected_images) == 1 and base_sequence not in pattern:
+        if len(selected_images) == 1 and not template.has_sequence:
             reply = QMessageBox.question(
                 self, "確認",
                 "連番がパターンに含まれていません。このまま実行しますか？",
@@ -140,37 +177,131 @@ class MainWindow(QMainWindow):
                 return
         
         # 複数選択時に連番設定が必須（警告のみ）
-        if len(selected_images) > 1 and base_sequence not in pattern:
+        if len(selected_images) > 1 and not template.has_sequence:
             QMessageBox.warning(self, "警告", "複数画像のリネームには連番設定が必要です。")
             return
         
-        print(f"Pattern: {pattern}, Fixed: {fixed_part}, Start: {start_number}")
-        print(f"Selected images: {selected_images}")
+        logger.debug("Pattern: %s, Fixed: %s, Start: %s", pattern, fixed_part, start_number)
+        logger.debug("Selected images: %d", len(selected_images))
+        
+        # 計画と実行はワーカースレッドで行い、その間もウィンドウは応答する
+        def plan_task(progress):
+            return self.renamer.plan_renames(selected_images, pattern, fixed_part, start_number, progress=progress)
+        
+        def confirm_and_execute(plan):
+            if not plan.pending():
+                logger.info("Nothing to rename.")
+                return
+            message = self.renamer.confirm_message(plan, len(selected_images))
+            if message and not self.confirm(message, True):
+                logger.info("Rename was canceled.")
+                return
+            self.run_rename_task(lambda progress: self.renamer.execute(plan, progress),
+                                 lambda new_paths: self.finish_rename(new_paths, selected_images, start_number))
         
-        new_paths = self.renamer.rename_files(selected_images, pattern, self, fixed_part, start_number)
+        self.run_rename_task(plan_task, confirm_and_execute)
+    
+    def run_rename_task(self, task, on_success):
+        """taskをワーカースレッドで実行し、進捗ダイアログを表示する"""
+        self.rename_button.setEnabled(False)
+        self.undo_button.setEnabled(False)
+        worker = RenameWorker(task, self)
+        dialog = RenameProgressDialog(worker, self)
+        worker.succeeded.connect(on_success)
+        worker.cancelled.connect(lambda: logger.info("Rename was canceled."))
+        worker.failed.connect(lambda error: QMessageBox.warning(self, "エラー", f"リネームに失敗しました: {error}"))
+        worker.finished.connect(self.rename_task_finished)
+        worker.finished.connect(worker.deleteLater)
+        worker.finished.connect(dialog.deleteLater)
+        self.rename_worker = worker
+        worker.start()
+    
+    def rename_task_finished(self):
+        # 計画のワーカーのfinishedは、succeededで実行のワーカーを始めた後に届くことがある
+        if self.sender() is not self.rename_worker:
+            return
+        self.rename_worker = None
+        self.rename_button.setEnabled(True)
+        self.undo_button.setEnabled(True)
+    
+    def closeEvent(self, event):
+        """リネームの途中で閉じる場合は、処理中のファイルが終わったところで止め、スレッドの終了を待つ
+
+        フォルダの走査も中断し、スレッドが終わってから閉じる。
+        """
+        worker = self.rename_worker
+        if worker is not None:
+            # 閉じた後に確認や次の段階が始まらないよう、結果は受け取らない
+            worker.succeeded.disconnect()
+            worker.requestInterruption()
+            worker.wait()
+        self.image_list.shutdown()
+        super().closeEvent(event)
+    
+    def finish_rename(self, new_paths, selected_images, start_number):
         if new_paths:
-            print(f"Renamed paths: {new_paths}")
+            logger.info("Renamed %d files", len(new_paths))
             if self.current_folder:
                 self.image_list.load_images(self.current_folder)
-                print(f"Reloaded folder: {self.current_folder}")
+                logger.debug("Reloaded folder: %s", self.current_folder)
             self.preview.clear()
             
-            # 単一リネームの場合、番号をカウントアップ
+            # 単一リネームの場合、番号をカウントアップ（"001"なら"002"のように桁数を保つ）
             if len(selected_images) == 1:
-                current_num = int(start_number) if start_number.isdigit() else 1
-                next_num = current_num + 1
-                self.word_blocks.number_input.setText(str(next_num))
-                print(f"Updated number_input to: {next_num}")
+                current_num, width = parse_start(start_number)
+                next_num = f"{current_num + 1:0{width}d}"
+                self.word_blocks.number_input.setText(next_num)
+                logger.debug("Updated number_input to: %s", next_num)
         else:
-            print("Rename failed or was canceled.")
+            logger.info("Rename failed or was canceled.")
+
+    def check_interrupted_rename(self):
+        """前回のリネームが途中で終わっていれば、続きを実行するか破棄するか尋ねる（「後で」なら次回また尋ねる）"""
+        # 起動時に毎回読むので、件数と状態だけを読む
+        batch = self.renamer.journal.incomplete_batch(summary=True)
+        if batch is None:
+            return
+        box = QMessageBox(QMessageBox.Question, "確認",
+                          f"前回のリネーム（{batch.count}件）が途中で終了しています。\n続きを実行しますか？\n"
+                          "（破棄すると残りは実行せず、次回から尋ねません）", parent=self)
+        resume_button = box.addButton("続きを実行", QMessageBox.AcceptRole)
+        discard_button = box.addButton("破棄", QMessageBox.DestructiveRole)
+        box.addButton("後で", QMessageBox.RejectRole)
+        box.setDefaultButton(resume_button)
+        box.exec_()
+        if box.clickedButton() is resume_button:
+            results = self.renamer.resume()
+            failed = [r for r in results if r[2] not in ("renamed", "already")]
+            if failed:
+                QMessageBox.warning(self, "警告", f"{len(failed)}件のリネームを再開できませんでした。")
+        elif box.clickedButton() is discard_button:
+            left = self.renamer.discard_interrupted()
+            if left:
+                QMessageBox.warning(self, "警告", f"{len(left)}件のファイルを元の名前に戻せませんでした。\n" + "\n".join(left[:10]))
+    
+    def undo_rename(self):
+        """最後に実行したリネームを元に戻す"""
+        batch = self.renamer.journal.last_committed_batch(summary=True)
+        if batch is None:
+            QMessageBox.information(self, "情報", "元に戻せるリネームはありません。")
+            return
+        if not self.confirm(f"最後のリネーム（{batch.origin.count}件）を元に戻しますか？", False):
+            return
+        results = self.renamer.undo_last()
+        failed = [r for r in results if r[2] not in ("renamed", "already")]
+        if failed:
+            QMessageBox.warning(self, "警告", f"{len(failed)}件は元に戻せませんでした。")
+        if self.current_folder:
+            self.image_list.load_images(self.current_folder)
+        self.preview.clear()
+    
+    def confirm(self, message, default_yes):
+        """リネーム処理からの確認をダイアログで尋ねる"""
+        default = QMessageBox.Yes if default_yes else QMessageBox.No
+        reply = QMessageBox.question(self, "確認", message, QMessageBox.Yes | QMessageBox.No, default)
+        return reply == QMessageBox.Yes
 
     def open_settings(self):
-        print("Opening settings dialog...")
         dialog = SettingsDialog(self)
         dialog.settings_updated.connect(self.refresh_metadata)
-        print("Connected settings_updated signal to refresh_metadata")
-        dialog.templates_updated.connect(self.word_blocks.refresh_templates)
-        print("Connected templates_updated signal to word_blocks.refresh_templates")
-        dialog.templates_updated.connect(lambda: print("templates_updated signal received in MainWindow"))
-        dialog.exec_()
-        print("Settings dialog closed")
\ No newline at end of file
+        dialog.exec_()
\ No newline at end of file
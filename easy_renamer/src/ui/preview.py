@@ -1,8 +1,122 @@
 from PyQt5.QtWidgets import QLabel, QVBoxLayout, QPushButton, QWidget, QDialog
-from PyQt5.QtGui import QPixmap
-from PyQt5.QtCore import Qt
+from PyQt5.QtGui import QPixmap, QImage, QImageReader
+from PyQt5.QtCore import Qt, QSize, QObject, QRunnable, QThreadPool, QTimer, pyqtSignal
+from collections import OrderedDict
+import logging
 import os
 
+logger = logging.getLogger(__name__)
+
+DECODE_STEP = 128  # デコードサイズをこの単位に切り上げ、キャッシュを再利用しやすくする
+
+def decode_size(label_size):
+    """ラベルのサイズを切り上げたデコード目標サイズ"""
+    width = max(DECODE_STEP, -(-label_size.width() // DECODE_STEP) * DECODE_STEP)
+    height = max(DECODE_STEP, -(-label_size.height() // DECODE_STEP) * DECODE_STEP)
+    return QSize(width, height)
+
+def load_scaled_image(image_path, target_size):
+    """QImageReaderで目標サイズ程度に縮小しながらデコードする（JPEGはデコード自体が軽くなる）"""
+    reader = QImageReader(image_path)
+    reader.setAutoTransform(True)
+    size = reader.size()
+    if size.isValid() and (size.width() > target_size.width() or size.height() > target_size.height()):
+        reader.setScaledSize(size.scaled(target_size, Qt.KeepAspectRatio))
+    return reader.read()
+
+class ImageCache:
+    """最近表示した画像をメモリ使用量の上限付きで保持するLRU"""
+
+    def __init__(self, max_bytes=128 * 1024 * 1024):
+        self.max_bytes = max_bytes
+        self.total_bytes = 0
+        self.images = OrderedDict()
+
+    @staticmethod
+    def key(image_path, target_size):
+        try:
+            mtime = os.stat(image_path).st_mtime_ns
+        except OSError:
+            mtime = None
+        return (image_path, mtime, target_size.width(), target_size.height())
+
+    def get(self, key):
+        image = self.images.get(key)
+        if image is not None:
+            self.images.move_to_end(key)
+        return image
+
+    def put(self, key, image):
+        if key in self.images:
+            self.total_bytes -= self.images.pop(key).sizeInBytes()
+        self.images[key] = image
+        self.total_bytes += image.sizeInBytes()
+        while self.total_bytes > self.max_bytes and len(self.images) > 1:
+            _, old = self.images.popitem(last=False)
+            self.total_bytes -= old.sizeInBytes()
+
+class ScaledPixmapCache:
+    """元のピクセルマップを (表示サイズ, 倍率) ごとに縮小した結果を保持する"""
+
+    def __init__(self, max_entries=8):
+        self.max_entries = max_entries
+        self.pixmaps = OrderedDict()
+        self.source_key = None
+
+    def scaled(self, pixmap, label_size, scale_factor, smooth=True, max_pixel_size=None):
+        """表示サイズに収めて倍率をかけた画像を1回の縮小で作る（滑らかな縮小のみキャッシュ）"""
+        if self.source_key != pixmap.cacheKey():
+            # 元画像が変わったらキャッシュを破棄
+            self.pixmaps.clear()
+            self.source_key = pixmap.cacheKey()
+        key = (label_size.width(), label_size.height(), round(scale_factor, 4))
+        if smooth:
+            cached = self.pixmaps.get(key)
+            if cached is not None:
+                self.pixmaps.move_to_end(key)
+                return cached
+
+        fitted = pixmap.size().scaled(label_size, Qt.KeepAspectRatio)
+        final_width = max(1, int(fitted.width() * scale_factor))
+        final_height = max(1, int(fitted.height() * scale_factor))
+        # ピクセルサイズが上限を超えないように制限
+        if max_pixel_size and (final_width > max_pixel_size or final_height > max_pixel_size):
+            scale_down = min(max_pixel_size / final_width, max_pixel_size / final_height)
+            final_width = int(final_width * scale_down)
+            final_height = int(final_height * scale_down)
+
+        transformation = Qt.SmoothTransformation if smooth else Qt.FastTransformation
+        result = pixmap.scaled(final_width, final_height, Qt.KeepAspectRatio, transformation)
+        if smooth:
+            self.pixmaps[key] = result
+            if len(self.pixmaps) > self.max_entries:
+                self.pixmaps.popitem(last=False)
+        return result
+
+def make_resize_timer(parent, callback):
+    """リサイズが止まってから一度だけcallbackを呼ぶタイマー"""
+    timer = QTimer(parent)
+    timer.setSingleShot(True)
+    timer.setInterval(150)
+    timer.timeout.connect(callback)
+    return timer
+
+class PrefetchSignals(QObject):
+    loaded = pyqtSignal(object, QImage)
+
+class PrefetchTask(QRunnable):
+    """前後の画像をバックグラウンドでデコードする"""
+
+    def __init__(self, key, image_path, target_size, signals):
+        super().__init__()
+        self.key = key
+        self.image_path = image_path
+        self.target_size = target_size
+        self.signals = signals
+
+    def run(self):
+        self.signals.loaded.emit(self.key, load_scaled_image(self.image_path, self.target_size))
+
 class ZoomDialog(QDialog):
     def __init__(self, pixmap, parent=None):
         super().__init__(parent)
@@ -22,6 +136,8 @@ class ZoomDialog(QDialog):
         self.max_scale = 2.0  # 拡大上限
         self.min_scale = 0.2  # 縮小下限
         self.max_pixel_size = 3000  # ピクセルサイズの上限
+        self.scaled_cache = ScaledPixmapCache()
+        self.resize_timer = make_resize_timer(self, self.update_display)
         
         self.zoom_in_button.clicked.connect(self.zoom_in)
         self.zoom_out_button.clicked.connect(self.zoom_out)
@@ -29,38 +145,21 @@ class ZoomDialog(QDialog):
         self.update_display()
         self.resize(600, 600)
     
-    def update_display(self):
+    def update_display(self, smooth=True):
         if self.current_pixmap:
-            print(f"Updating display with scale_factor: {self.scale_factor}")  # デバッグ出力
-            label_size = self.image_label.size()
-            # まずウィジェットのサイズに合わせてスケーリング
-            scaled_pixmap = self.current_pixmap.scaled(
-                label_size,
-                Qt.KeepAspectRatio,
-                Qt.SmoothTransformation
-            )
-            # スケールファクターを適用
-            final_width = int(scaled_pixmap.width() * self.scale_factor)
-            final_height = int(scaled_pixmap.height() * self.scale_factor)
-            
-            # ピクセルサイズが上限を超えないように制限
-            if final_width > self.max_pixel_size or final_height > self.max_pixel_size:
-                scale_down = min(self.max_pixel_size / final_width, self.max_pixel_size / final_height)
-                final_width = int(final_width * scale_down)
-                final_height = int(final_height * scale_down)
-                print(f"Pixel size limited: {final_width}x{final_height}")  # デバッグ出力
-            
-            scaled_pixmap = scaled_pixmap.scaled(
-                final_width,
-                final_height,
-                Qt.KeepAspectRatio,
-                Qt.SmoothTransformation
+            logger.debug("Updating display with scale_factor: %s", self.scale_factor)
+            scaled_pixmap = self.scaled_cache.scaled(
+                self.current_pixmap,
+                self.image_label.size(),
+                self.scale_factor,
+                smooth,
+                self.max_pixel_size
             )
-            print(f"Scaled pixmap size: {scaled_pixmap.width()}x{scaled_pixmap.height()}")  # デバッグ出力
+            logger.debug("Scaled pixmap size: %dx%d", scaled_pixmap.width(), scaled_pixmap.height())
             self.image_label.setPixmap(scaled_pixmap)
     
     def zoom_in(self):
-        print(f"Before zoom_in: scale_factor = {self.scale_factor}")  # デバッグ出力
+        logger.debug("Before zoom_in: scale_factor = %s", self.scale_factor)
         # 新しいスケールを計算
         new_scale = self.scale_factor * 1.2
         # 上限チェック
@@ -68,12 +167,12 @@ class ZoomDialog(QDialog):
             self.scale_factor = new_scale
         else:
             self.scale_factor = self.max_scale
-            print(f"Maximum scale reached: {self.scale_factor}")
-        print(f"After zoom_in: scale_factor = {self.scale_factor}")  # デバッグ出力
+            logger.debug("Maximum scale reached: %s", self.scale_factor)
+        logger.debug("After zoom_in: scale_factor = %s", self.scale_factor)
         self.update_display()
     
     def zoom_out(self):
-        print(f"Before zoom_out: scale_factor = {self.scale_factor}")  # デバッグ出力
+        logger.debug("Before zoom_out: scale_factor = %s", self.scale_factor)
         # 新しいスケールを計算
         new_scale = self.scale_factor / 1.2
         # 下限チェック
@@ -81,12 +180,14 @@ class ZoomDialog(QDialog):
             self.scale_factor = new_scale
         else:
             self.scale_factor = self.min_scale
-            print(f"Minimum scale reached: {self.scale_factor}")
-        print(f"After zoom_out: scale_factor = {self.scale_factor}")  # デバッグ出力
+            logger.debug("Minimum scale reached: %s", self.scale_factor)
+        logger.debug("After zoom_out: scale_factor = %s", self.scale_factor)
         self.update_display()
     
     def resizeEvent(self, event):
-        self.update_display()
+        # ドラッグ中は高速な縮小で追従し、止まったら滑らかな縮小を一度だけ行う
+        self.update_display(smooth=False)
+        self.resize_timer.start()
         super().resizeEvent(event)
 
 class Preview(QWidget):
@@ -104,40 +205,73 @@ class Preview(QWidget):
         self.layout.addWidget(self.zoom_out_button)
         
         self.current_pixmap = None
+        self.current_path = None
+        self.decoded_size = None
         self.scale_factor = 1.0
         self.max_scale = 2.0  # 通常のプレビューも上限を小さく
         self.min_scale = 0.2
         
+        self.image_cache = ImageCache()
+        self.scaled_cache = ScaledPixmapCache()
+        self.resize_timer = make_resize_timer(self, self.finish_resize)
+        self.prefetching = set()
+        self.prefetch_pool = QThreadPool(self)
+        self.prefetch_pool.setMaxThreadCount(2)
+        self.prefetch_signals = PrefetchSignals(self)
+        self.prefetch_signals.loaded.connect(self.handle_prefetched)
+        
         self.zoom_in_button.clicked.connect(self.open_zoom_dialog)
         self.zoom_out_button.clicked.connect(self.zoom_out)
     
+    def load_image(self, image_path):
+        """表示サイズ程度に縮小した画像をキャッシュから（なければデコードして）返す"""
+        target_size = decode_size(self.image_label.size())
+        self.decoded_size = target_size
+        key = ImageCache.key(image_path, target_size)
+        image = self.image_cache.get(key)
+        if image is None:
+            image = load_scaled_image(image_path, target_size)
+            if not image.isNull():
+                self.image_cache.put(key, image)
+        return image
+    
+    def prefetch(self, image_paths):
+        """次に表示されそうな画像を先にデコードしておく（矢印キーでの移動を即時にする）"""
+        target_size = decode_size(self.image_label.size())
+        for image_path in image_paths:
+            key = ImageCache.key(image_path, target_size)
+            if key in self.prefetching or self.image_cache.get(key) is not None:
+                continue
+            self.prefetching.add(key)
+            self.prefetch_pool.start(PrefetchTask(key, image_path, target_size, self.prefetch_signals))
+    
+    def handle_prefetched(self, key, image):
+        self.prefetching.discard(key)
+        if not image.isNull():
+            self.image_cache.put(key, image)
+    
     def update_image(self, image_path):
         """画像パスからピクセルマップを読み込み、プレビューを更新"""
         if os.path.exists(image_path):
-            self.current_pixmap = QPixmap(image_path)
+            self.current_path = image_path
+            self.current_pixmap = QPixmap.fromImage(self.load_image(image_path))
             if not self.current_pixmap.isNull():
                 self.scale_factor = 1.0
                 self.update_display()
             else:
-                print(f"Failed to load image: {image_path}")
+                logger.warning("Failed to load image: %s", image_path)
                 self.clear()
         else:
-            print(f"File not found: {image_path}")
+            logger.warning("File not found: %s", image_path)
             self.clear()
     
-    def update_display(self):
+    def update_display(self, smooth=True):
         if self.current_pixmap:
-            label_size = self.image_label.size()
-            scaled_pixmap = self.current_pixmap.scaled(
-                label_size,
-                Qt.KeepAspectRatio,
-                Qt.SmoothTransformation
-            )
-            scaled_pixmap = scaled_pixmap.scaled(
-                int(scaled_pixmap.width() * self.scale_factor),
-                int(scaled_pixmap.height() * self.scale_factor),
-                Qt.KeepAspectRatio,
-                Qt.SmoothTransformation
+            scaled_pixmap = self.scaled_cache.scaled(
+                self.current_pixmap,
+                self.image_label.size(),
+                self.scale_factor,
+                smooth
             )
             self.image_label.setPixmap(scaled_pixmap)
         else:
@@ -146,11 +280,14 @@ class Preview(QWidget):
     def clear(self):
         """プレビューをクリア"""
         self.current_pixmap = None
+        self.current_path = None
         self.image_label.setPixmap(QPixmap())
     
     def open_zoom_dialog(self):
         if self.current_pixmap:
-            dialog = ZoomDialog(self.current_pixmap, self)
+            # 拡大表示では縮小デコードではなく元の解像度を使う
+            pixmap = QPixmap(self.current_path) if self.current_path else self.current_pixmap
+            dialog = ZoomDialog(pixmap if not pixmap.isNull() else self.current_pixmap, self)
             dialog.exec_()
     
     def zoom_out(self):
@@ -158,6 +295,17 @@ class Preview(QWidget):
             self.scale_factor /= 1.2
             self.update_display()
     
-    def resizeEvent(self, event):
+    def finish_resize(self):
+        """リサイズが止まった時の処理（必要なら読み直し、滑らかに縮小して表示）"""
+        if self.current_path and self.current_pixmap and self.decoded_size != decode_size(self.image_label.size()):
+            # デコード済みの画像を拡大表示することになる場合だけ、大きいサイズで読み直す
+            fitted = self.current_pixmap.size().scaled(self.image_label.size(), Qt.KeepAspectRatio)
+            if fitted.width() > self.current_pixmap.width():
+                self.current_pixmap = QPixmap.fromImage(self.load_image(self.current_path))
         self.update_display()
+    
+    def resizeEvent(self, event):
+        # ドラッグ中は高速な縮小で追従し、止まったら滑らかな縮小を一度だけ行う
+        self.update_display(smooth=False)
+        self.resize_timer.start()
         super().resizeEvent(event)
\ No newline at end of file
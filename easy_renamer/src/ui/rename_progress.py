@@ -0,0 +1,66 @@
+from PyQt5.QtWidgets import QProgressDialog
+from PyQt5.QtCore import pyqtSignal, Qt, QThread
+from core.pipeline import Progress, Cancelled, STAGE_LABELS
+import logging
+
+logger = logging.getLogger(__name__)
+
+class RenameWorker(QThread):
+    """task(progress) をワーカースレッドで実行し、進捗と結果をシグナルで通知する"""
+    progress_changed = pyqtSignal(str, int, int, float, float)  # 段階, 処理済み, 全件, 件/秒, 残り秒
+    succeeded = pyqtSignal(object)
+    cancelled = pyqtSignal()
+    failed = pyqtSignal(str)
+
+    def __init__(self, task, parent=None):
+        super().__init__(parent)
+        self.task = task
+
+    def run(self):
+        progress = Progress(self.progress_changed.emit, self.isInterruptionRequested)
+        try:
+            result = self.task(progress)
+        except Cancelled:
+            self.cancelled.emit()
+            return
+        except Exception as e:
+            logger.exception("Rename task failed: %s", e)
+            self.failed.emit(str(e))
+            return
+        self.succeeded.emit(result)
+
+def format_seconds(seconds):
+    seconds = int(seconds + 0.5)
+    if seconds >= 60:
+        return f"{seconds // 60}分{seconds % 60}秒"
+    return f"{seconds}秒"
+
+class RenameProgressDialog(QProgressDialog):
+    """段階・件数・速度・残り時間を表示し、キャンセルをワーカーに伝えるダイアログ"""
+
+    def __init__(self, worker, parent=None):
+        super().__init__("準備中...", "キャンセル", 0, 0, parent)
+        self.setWindowTitle("リネーム")
+        self.setWindowModality(Qt.WindowModal)
+        self.setMinimumDuration(500)  # すぐ終わる処理では表示しない
+        self.setAutoClose(False)
+        self.setAutoReset(False)
+        self.worker = worker
+        worker.progress_changed.connect(self.update_progress)
+        worker.finished.connect(self.close)
+        self.canceled.connect(self.request_cancel)
+
+    def update_progress(self, stage, done, total, rate, eta):
+        self.setMaximum(max(total, 1))
+        self.setValue(min(done, max(total, 1)))
+        text = f"{STAGE_LABELS.get(stage, stage)}: {done} / {total} 件"
+        if rate > 0:
+            text += f"\n{rate:.1f} 件/秒"
+            if eta >= 0 and done < total:
+                text += f"  残り約{format_seconds(eta)}"
+        self.setLabelText(text)
+
+    def request_cancel(self):
+        """処理中のファイルが終わったところで止める"""
+        self.setLabelText("キャンセルしています...")
+        self.worker.requestInterruption()
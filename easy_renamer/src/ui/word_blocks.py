@@ -2,17 +2,16 @@ from PyQt5.QtWidgets import QListWidget, QLineEdit, QVBoxLayout, QWidget, QPushB
 from PyQt5.QtCore import Qt, QMimeData, QSize, pyqtSignal
 from PyQt5.QtGui import QDrag, QFont, QFontMetrics
 from core.settings import Settings
-import json
-import os
 
 class WordBlocks(QWidget):
     templates_updated = pyqtSignal()
+    settings_changed = pyqtSignal(object)  # 別スレッドからの変更通知もGUIスレッドで反映する
 
     def __init__(self):
         super().__init__()
         self.layout = QVBoxLayout(self)
         self.settings = Settings()
-        self.config_file = "settings.json"
+        self.metadata = {}
         
         word_blocks_layout = QVBoxLayout()
         font = QFont()
@@ -83,6 +82,8 @@ class WordBlocks(QWidget):
         self.layout.addLayout(self.sequence_layout)
 
         self.templates_updated.connect(self.refresh_templates)
+        self.settings_changed.connect(self.apply_settings)
+        self.settings.subscribe(self.notify_settings)
 
     def adjust_item_width(self, list_widget):
         font_metrics = QFontMetrics(list_widget.font())
@@ -99,6 +100,7 @@ class WordBlocks(QWidget):
         return ""
 
     def update_candidates(self, metadata):
+        self.metadata = metadata
         current_words = set()
         for i in range(self.word_list.count()):
             current_words.add(self.word_list.item(i).text())
@@ -159,19 +161,31 @@ class WordBlocks(QWidget):
         """連番設定（固定部分と開始番号）を返す"""
         return self.fixed_part_input.text(), self.number_input.text() or "001"
     
+    def notify_settings(self, changes):
+        self.settings_changed.emit(changes)
+    
+    def apply_settings(self, changes):
+        """変わった設定だけを画面に反映する"""
+        if "templates" in changes:
+            self.set_template_items(changes["templates"][1])
+        if "search_words" in changes:
+            self.update_candidates(self.metadata)
+    
     def refresh_templates(self):
-        base_path = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..'))
-        settings_path = os.path.join(base_path, 'settings.json')
-        try:
-            with open(settings_path, 'r', encoding='utf-8') as f:
-                settings_data = json.load(f)
-            templates = settings_data.get('templates', [])
-        except (FileNotFoundError, json.JSONDecodeError):
-            templates = []
-
-        self.template_combo.clear()
-        if not templates:
-            self.template_combo.addItem("No templates available")
-        else:
-            self.template_combo.addItems(templates)
-        self.template_combo.setCurrentIndex(-1)
\ No newline at end of file
+        self.set_template_items(self.settings.get_templates())
+    
+    def set_template_items(self, templates):
+        """コンボボックスの定型文を入れ替える（先頭から変わっていない項目と選択はそのまま残す）"""
+        templates = templates or ["No templates available"]
+        combo = self.template_combo
+        same = 0
+        while same < min(combo.count(), len(templates)) and combo.itemText(same) == templates[same]:
+            same += 1
+        current = combo.currentIndex()
+        # 項目の削除で選択が変わってもパターン入力を書き換えない
+        combo.blockSignals(True)
+        while combo.count() > same:
+            combo.removeItem(combo.count() - 1)
+        combo.addItems(templates[same:])
+        combo.setCurrentIndex(current if current < same else -1)
+        combo.blockSignals(False)
@@ -1,9 +1,5 @@
+from utils.width import display_width
+
 def count_fullwidth_chars(text):
-    """全角文字を1、半角文字を0.5としてカウント"""
-    count = 0
-    for char in text:
-        if ord(char) > 127:  # 全角文字
-            count += 1
-        else:
-            count += 0.5
-    return count
+    """全角文字を1、半角文字を0.5としてカウント（utils.width.display_widthの半分）"""
+    return display_width(text) / 2
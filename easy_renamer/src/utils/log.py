@@ -0,0 +1,9 @@
+import logging
+import sys
+
+LOG_FORMAT = "%(asctime)s %(levelname)s %(name)s: %(message)s"
+
+def setup_logging(verbose=False):
+    """ログを標準エラーに出す。通常はINFO以上（ファイルごとの処理は出さない）、verboseならDEBUG以上"""
+    logging.basicConfig(level=logging.DEBUG if verbose else logging.INFO, format=LOG_FORMAT,
+                        datefmt="%H:%M:%S", stream=sys.stderr)
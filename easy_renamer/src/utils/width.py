@@ -0,0 +1,138 @@
+"""ファイル名の表示幅（半角=1, 全角=2）と長さ制限のための関数
+
+幅はEast Asian Widthから求める（日本語環境に合わせ、曖昧幅（A）は全角として扱う）。
+初回使用時に全ての文字の幅の表を作っておき、str.translateで各文字を幅に置き換えてから
+「文字数＋全角の数－幅0の数」を数えるので、Pythonで1文字ずつ回す必要がない。
+"""
+import os
+import re
+import sys
+import unicodedata
+
+WIDE = ("W", "F", "A")
+ZWJ = "\u200d"
+REGIONAL_INDICATORS = range(0x1F1E6, 0x1F200)
+EMOJI_MODIFIERS = range(0x1F3FB, 0x1F400)
+DEFAULT_NAME_MAX = 255
+
+_table = None  # 文字コード -> 幅を表す1文字（"\x00", "\x01", "\x02"）。BMPと第1面の分
+
+def compute_width(char):
+    """1文字の幅をunicodedataから計算する"""
+    code = ord(char)
+    if code < 0x20 or 0x7F <= code < 0xA0:
+        return 0
+    if code in EMOJI_MODIFIERS or 0xFE00 <= code <= 0xFE0F or 0xE0000 <= code <= 0xE0FFF:
+        return 0  # 肌の色・異体字セレクタ・タグ
+    if 0x1160 <= code <= 0x11FF:
+        return 0  # ハングルの中声・終声は前の字母と結合する
+    if unicodedata.category(char) in ("Mn", "Me", "Cf"):
+        return 0
+    if 0x20000 <= code <= 0x3FFFD:
+        return 2  # CJK統合漢字拡張
+    return 2 if unicodedata.east_asian_width(char) in WIDE else 1
+
+def width_table():
+    global _table
+    if _table is None:
+        codes = ("\x00", "\x01", "\x02")
+        _table = [codes[1 if 0xD800 <= code <= 0xDFFF else compute_width(chr(code))] for code in range(0x20000)]
+    return _table
+
+def width_codes(text):
+    """各文字をその幅を表す1文字に置き換えた文字列（str.translateで表を引くだけ）"""
+    codes = text.translate(width_table())
+    if not codes.isascii():
+        # 表に無い第2面以降の文字はそのまま残るので個別に計算する
+        codes = "".join(code if code < "\x03" else chr(compute_width(code)) for code in codes)
+    if ZWJ in text:
+        # ZWJで連結された絵文字は最初の1文字分の幅で表示される
+        codes = list(codes)
+        for match in re.finditer(ZWJ + ".", text):
+            codes[match.end() - 1] = "\x00"
+        codes = "".join(codes)
+    return codes
+
+def codes_width(codes):
+    return len(codes) + codes.count("\x02") - codes.count("\x00")
+
+def display_width(text):
+    """文字列の表示幅（半角=1, 全角=2）"""
+    if text.isascii():
+        return len(text)
+    return codes_width(width_codes(text))
+
+def is_extender(char):
+    """直前の文字と1つの書記素クラスタになる文字か"""
+    code = ord(char)
+    if code < 0x300:
+        return False
+    if char == ZWJ or code in EMOJI_MODIFIERS or 0xFE00 <= code <= 0xFE0F or 0xE0000 <= code <= 0xE0FFF:
+        return True
+    return unicodedata.category(char) in ("Mn", "Me", "Mc") or 0x1160 <= code <= 0x11FF
+
+def cluster_boundary(text, index):
+    """index以前で最も近い書記素クラスタの境界を返す（結合文字・異体字セレクタ・ZWJ連結・国旗を考慮した簡略版）"""
+    while 0 < index < len(text):
+        if is_extender(text[index]) or text[index - 1] == ZWJ or text[index - 1:index + 1] == "\r\n":
+            index -= 1
+            continue
+        if ord(text[index]) in REGIONAL_INDICATORS:
+            # 国旗は地域指示子2文字。直前に続く地域指示子が奇数個ならペアの途中
+            run = index
+            while run > 0 and ord(text[run - 1]) in REGIONAL_INDICATORS:
+                run -= 1
+            if (index - run) % 2:
+                index -= 1
+                continue
+        break
+    return index
+
+def truncate_to_width(text, max_width, ellipsis=""):
+    """表示幅がmax_width以下になるよう末尾を切り、切った場合はellipsisを付ける（書記素クラスタは分割しない）"""
+    if text.isascii():
+        if len(text) <= max_width:
+            return text
+        return text[:max(max_width - display_width(ellipsis), 0)] + ellipsis
+    codes = width_codes(text)
+    if codes_width(codes) <= max_width:
+        return text
+    budget = max_width - display_width(ellipsis)
+    # 幅を表す文字列は元の文字列と1対1に対応するので、切る位置を二分探索で求める
+    low, high = 0, len(codes)
+    while low < high:
+        middle = (low + high + 1) // 2
+        if codes_width(codes[:middle]) <= budget:
+            low = middle
+        else:
+            high = middle - 1
+    return text[:cluster_boundary(text, low)] + ellipsis
+
+def name_max(folder):
+    """フォルダのファイルシステムで使えるファイル名の最大長（POSIXはバイト数、WindowsはUTF-16の単位数）"""
+    if hasattr(os, "pathconf"):
+        try:
+            return os.pathconf(folder or ".", "PC_NAME_MAX")
+        except (OSError, ValueError):
+            pass
+    return DEFAULT_NAME_MAX
+
+def name_length(name):
+    """name_maxと比べるためのファイル名の長さ"""
+    if sys.platform == "win32":
+        return len(name.encode("utf-16-le", "surrogatepass")) // 2
+    return len(os.fsencode(name))
+
+def truncate_to_length(text, max_length, ellipsis=""):
+    """name_lengthがmax_length以下になるよう書記素クラスタ単位で末尾を切る"""
+    if name_length(text) <= max_length:
+        return text
+    budget = max_length - name_length(ellipsis)
+    low, high = 0, len(text)
+    while low < high:
+        middle = (low + high + 1) // 2
+        if name_length(text[:middle]) <= budget:
+            low = middle
+        else:
+            high = middle - 1
+    return text[:cluster_boundary(text, low)] + ellipsis
@@ -0,0 +1,37 @@
+import os
+import sys
+
+import pytest
+
+# アプリと同じく、モジュールはsrcを起点に読み込む（from core.plan import ...）
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "src"))
+
+def make_files(folder, *names):
+    """中身が自分の名前のファイルを作り、パスのリストを返す（リネーム後の中身で移動先を確かめる）"""
+    paths = []
+    for name in names:
+        path = os.path.join(folder, name)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, "w", encoding="utf-8") as f:
+            f.write(name)
+        paths.append(path)
+    return paths
+
+def contents(folder):
+    """フォルダ内の {ファイル名: 中身}（一時名やジャーナルも含む）"""
+    result = {}
+    for name in os.listdir(folder):
+        path = os.path.join(folder, name)
+        if os.path.isfile(path):
+            with open(path, "r", encoding="utf-8") as f:
+                result[name] = f.read()
+    return result
+
+@pytest.fixture(params=[True, False], ids=["dir_fd", "paths"])
+def dir_fd(request, monkeypatch):
+    """フォルダのディスクリプタを使う実行と、パスを使う実行（Windowsと同じ）の両方で試す"""
+    import core.executor
+    if request.param and not core.executor.SUPPORTS_DIR_FD:
+        pytest.skip("dir_fd is not supported on this platform")
+    monkeypatch.setattr(core.executor, "SUPPORTS_DIR_FD", request.param)
+    return request.param
@@ -0,0 +1,71 @@
+import struct
+
+import pytest
+
+from core.exif import read_user_comment, decode_user_comment, ASCII_PREFIX, UNICODE_PREFIX, JIS_PREFIX, UNDEFINED_PREFIX
+
+def tiff(comment, byte_order="<"):
+    """IFD0 -> Exif IFD -> UserComment(0x9286, UNDEFINED) だけを持つTIFF構造を組み立てる"""
+    mark = b"II" if byte_order == "<" else b"MM"
+    exif_ifd = 8 + 2 + 12 + 4
+    value = exif_ifd + 2 + 12 + 4
+    data = mark + struct.pack(byte_order + "HI", 42, 8)
+    data += struct.pack(byte_order + "HHHII", 1, 0x8769, 4, 1, exif_ifd) + struct.pack(byte_order + "I", 0)
+    if len(comment) > 4:
+        entry = struct.pack(byte_order + "HHHII", 1, 0x9286, 7, len(comment), value)
+    else:
+        entry = struct.pack(byte_order + "HHHI", 1, 0x9286, 7, len(comment)) + comment.ljust(4, b"\x00")
+    data += entry + struct.pack(byte_order + "I", 0)
+    return data + comment if len(comment) > 4 else data
+
+@pytest.mark.parametrize("byte_order", ["<", ">"])
+def test_read_user_comment_walks_ifds(byte_order):
+    data = tiff(ASCII_PREFIX + b"1girl, solo", byte_order)
+    assert read_user_comment(data) == "1girl, solo"
+    assert read_user_comment(b"Exif\x00\x00" + data) == "1girl, solo"
+
+def test_read_user_comment_without_exif_ifd():
+    data = b"II" + struct.pack("<HI", 42, 8) + struct.pack("<H", 0) + struct.pack("<I", 0)
+    assert read_user_comment(data) is None
+
+@pytest.mark.parametrize("data", [b"", b"XX\x2a\x00", b"II\x2b\x00\x08\x00\x00\x00", b"II\x2a\x00\xff\x00\x00\x00"])
+def test_read_user_comment_rejects_broken_data(data):
+    assert read_user_comment(data) is None
+
+def test_truncated_value_does_not_raise():
+    data = tiff(ASCII_PREFIX + b"1girl, solo")[:-6]
+    assert read_user_comment(data) == "1girl"
+
+@pytest.mark.parametrize("body, expected", [
+    (b"1girl, solo\x00\x00", "1girl, solo"),
+    ("少女, 笑顔".encode("utf-8"), "少女, 笑顔"),  # ASCII指定でもUTF-8を書き込むツールがある
+])
+def test_ascii_prefix(body, expected):
+    assert decode_user_comment(ASCII_PREFIX + body) == expected
+
+def test_jis_prefix_is_cp932():
+    assert decode_user_comment(JIS_PREFIX + "少女、笑顔".encode("cp932")) == "少女、笑顔"
+
+def test_undefined_and_unknown_prefix_are_utf8():
+    assert decode_user_comment(UNDEFINED_PREFIX + "少女 ".encode("utf-8")) == "少女"
+    assert decode_user_comment("no prefix".encode("utf-8")) == "no prefix"
+
+@pytest.mark.parametrize("text", ["masterpiece, 1girl", "masterpiece, 少女"])
+@pytest.mark.parametrize("encoding", ["utf-16-le", "utf-16-be"])
+@pytest.mark.parametrize("byte_order", ["<", ">"])
+def test_unicode_guesses_byte_order_from_zero_bytes(text, encoding, byte_order):
+    # TIFFのバイト順と違うバイト順で書き込むツールがあるので、上位バイトの0の位置で判定する
+    assert decode_user_comment(UNICODE_PREFIX + text.encode(encoding), byte_order) == text
+
+@pytest.mark.parametrize("encoding", ["utf-16-le", "utf-16-be"])
+def test_unicode_bom_wins(encoding):
+    bom = "\ufeff".encode(encoding)
+    assert decode_user_comment(UNICODE_PREFIX + bom + "少女".encode(encoding), "<" if encoding.endswith("be") else ">") == "少女"
+
+@pytest.mark.parametrize("byte_order, encoding", [("<", "utf-16-le"), (">", "utf-16-be")])
+def test_unicode_without_zero_bytes_uses_tiff_byte_order(byte_order, encoding):
+    text = "少女笑顔"
+    assert decode_user_comment(UNICODE_PREFIX + text.encode(encoding), byte_order) == text
+
+def test_unicode_odd_length_is_trimmed():
+    assert decode_user_comment(UNICODE_PREFIX + "abc".encode("utf-16-le") + b"\x00", "<") == "abc"
@@ -0,0 +1,182 @@
+import os
+
+import pytest
+
+import core.executor
+from core.executor import execute_plan
+from core.journal import RenameJournal
+from core.plan import build_plan, SUFFIX, RENAMED, FAILED
+from tests.conftest import make_files, contents
+
+class Crash(BaseException):
+    """プロセスの強制終了の代わり（OSErrorと違い、実行側では捕まえない）"""
+
+def crash(*args):
+    raise Crash()
+
+def journal_path(tmp_path):
+    return str(tmp_path / "rename_journal.jsonl")
+
+def drop_unsynced_done(path):
+    """fsyncされずに失われた実行済みの印を再現する"""
+    with open(path, "r", encoding="utf-8") as f:
+        lines = [line for line in f if '"type": "done"' not in line]
+    with open(path, "w", encoding="utf-8") as f:
+        f.writelines(lines)
+
+CYCLE = [("a.png", "b.png"), ("b.png", "c.png"), ("c.png", "a.png"), ("d.png", "e.png")]
+RENAMED_CONTENTS = {"b.png": "a.png", "c.png": "b.png", "a.png": "c.png", "e.png": "d.png"}
+ORIGINAL_CONTENTS = {"a.png": "a.png", "b.png": "b.png", "c.png": "c.png", "d.png": "d.png"}
+
+def crash_cycle(tmp_path, monkeypatch, crash_at):
+    """3つの循環と直接リネーム1件を実行し、途中で止める
+
+    crash_atが数値なら1段階目（一時名への移動）の後、2段階目のcrash_at件目で止める。
+    "direct"なら2段階目が終わった後の直接リネームで、"commit"なら全て移動した後の完了の記録で止める。
+    """
+    folder = tmp_path / "images"
+    make_files(folder, "a.png", "b.png", "c.png", "d.png")
+    pairs = [(str(folder / s), str(folder / t)) for s, t in CYCLE]
+    journal = RenameJournal(journal_path(tmp_path))
+    original_move = core.executor.DirectoryHandles.move
+    finished = []
+
+    def move(self, source, target, overwrite=False):
+        if source.endswith(".renaming"):
+            if len(finished) == crash_at:
+                raise Crash()
+            finished.append(source)
+        elif crash_at == "direct" and source.endswith("d.png"):
+            raise Crash()
+        original_move(self, source, target, overwrite)
+
+    monkeypatch.setattr(core.executor.DirectoryHandles, "move", move)
+    if crash_at == "commit":
+        monkeypatch.setattr(RenameJournal, "commit", crash)
+    with pytest.raises(Crash):
+        list(execute_plan(build_plan(pairs), journal))
+    journal.close()
+    monkeypatch.undo()
+    drop_unsynced_done(journal.path)
+    if isinstance(crash_at, int):
+        assert any(name.endswith(".renaming") for name in os.listdir(folder))
+    return folder
+
+@pytest.mark.parametrize("crash_at", [0, 1, 2, "direct", "commit"])
+def test_resume_after_crash(tmp_path, monkeypatch, crash_at):
+    folder = crash_cycle(tmp_path, monkeypatch, crash_at)
+    journal = RenameJournal(journal_path(tmp_path))
+    assert journal.incomplete_batch() is not None
+    results = journal.resume()
+    assert all(status in ("renamed", "already", "target exists") for _, _, status in results)
+    # 2段階目で移動済みの循環を（元の名前に別のファイルがあっても）もう一度回さない
+    assert contents(folder) == RENAMED_CONTENTS
+    assert journal.incomplete_batch() is None
+
+    # 再開したバッチもまとめて取り消せる
+    journal.undo_last()
+    assert contents(folder) == ORIGINAL_CONTENTS
+    assert journal.undo_last() == []
+
+def test_resume_swap_after_crash_before_commit(tmp_path, monkeypatch):
+    folder = tmp_path / "images"
+    make_files(folder, "a.png", "b.png")
+    journal = RenameJournal(journal_path(tmp_path))
+    monkeypatch.setattr(RenameJournal, "commit", crash)
+    pairs = [(str(folder / s), str(folder / t)) for s, t in [("a.png", "b.png"), ("b.png", "a.png")]]
+    with pytest.raises(Crash):
+        list(execute_plan(build_plan(pairs), journal))
+    journal.close()
+    monkeypatch.undo()
+    drop_unsynced_done(journal.path)
+
+    RenameJournal(journal_path(tmp_path)).resume()
+    assert contents(folder) == {"a.png": "b.png", "b.png": "a.png"}
+
+def test_discard_after_crash(tmp_path, monkeypatch):
+    folder = crash_cycle(tmp_path, monkeypatch, 0)
+    journal = RenameJournal(journal_path(tmp_path))
+    assert journal.discard() == []
+    # 一時名のファイルは元の名前に戻り、次回からは再開も取り消しも尋ねない
+    assert contents(folder) == ORIGINAL_CONTENTS
+    assert journal.incomplete_batch() is None
+    assert journal.last_committed_batch() is None
+    assert journal.discard() == []
+
+def test_discard_keeps_temp_when_source_is_taken(tmp_path, monkeypatch):
+    folder = crash_cycle(tmp_path, monkeypatch, 1)
+    journal = RenameJournal(journal_path(tmp_path))
+    left = journal.discard()
+    # 2段階目で実行済みの操作が元の名前の1つを使っているので、その一時名だけは残す
+    assert len(left) == 1 and os.path.exists(left[0])
+    assert sorted(contents(folder).values()) == ["a.png", "b.png", "c.png", "d.png"]
+    assert journal.incomplete_batch() is None
+
+def test_resume_without_incomplete_batch(tmp_path):
+    assert RenameJournal(journal_path(tmp_path)).resume() == []
+
+def test_undo_last(tmp_path, dir_fd):
+    folder = tmp_path / "images"
+    make_files(folder, "a.png", "b.png")
+    journal = RenameJournal(journal_path(tmp_path))
+    pairs = [(str(folder / s), str(folder / t)) for s, t in [("a.png", "b.png"), ("b.png", "a.png")]]
+    list(execute_plan(build_plan(pairs), journal))
+    assert contents(folder) == {"a.png": "b.png", "b.png": "a.png"}
+    journal.undo_last()
+    assert contents(folder) == {"a.png": "a.png", "b.png": "b.png"}
+    # 取り消しのバッチ自体は取り消しの対象にならない
+    assert journal.undo_last() == []
+
+def test_undo_last_after_partial_failure(tmp_path):
+    folder = tmp_path / "images"
+    make_files(folder, "a.png", "b.png", "c.png")
+    journal = RenameJournal(journal_path(tmp_path))
+    pairs = [(str(folder / s), str(folder / t)) for s, t in [("a.png", "x.png"), ("b.png", "y.png"), ("c.png", "z.png")]]
+    plan = build_plan(pairs, SUFFIX)
+    # 計画した後に別のプログラムがy.pngを作った
+    make_files(folder, "y.png")
+    list(execute_plan(plan, journal))
+    assert [op.status for op in plan.ops] == [RENAMED, FAILED, RENAMED]
+    assert contents(folder) == {"x.png": "a.png", "b.png": "b.png", "y.png": "y.png", "z.png": "c.png"}
+
+    results = journal.undo_last()
+    # 失敗した操作の新しい名前にある別のファイルは動かさない
+    assert contents(folder) == {"a.png": "a.png", "b.png": "b.png", "c.png": "c.png", "y.png": "y.png"}
+    assert sorted(status for _, _, status in results) == ["renamed", "renamed", "target exists"]
+    assert journal.undo_last() == []
+
+def rename_back_and_forth(folder, journal, times):
+    for number in range(times):
+        source, target = ("a.png", "b.png") if number % 2 == 0 else ("b.png", "a.png")
+        list(execute_plan(build_plan([(str(folder / source), str(folder / target))]), journal))
+
+def test_compact_keeps_only_undoable_batches(tmp_path):
+    folder = tmp_path / "images"
+    make_files(folder, "a.png")
+    journal = RenameJournal(journal_path(tmp_path))
+    rename_back_and_forth(folder, journal, RenameJournal.UNDO_DEPTH + 2)
+    assert len(journal.read_batches()) == RenameJournal.UNDO_DEPTH
+    # 残したバッチは全て順に元に戻せる
+    for _ in range(RenameJournal.UNDO_DEPTH):
+        assert [status for _, _, status in journal.undo_last()] == ["renamed"]
+    assert journal.undo_last() == []
+    assert contents(folder) == {"a.png": "a.png"}
+    # 取り消したバッチと取り消しのバッチも取り除かれる
+    assert journal.read_batches() == []
+
+def test_compact_keeps_incomplete_batch(tmp_path, monkeypatch):
+    folder = crash_cycle(tmp_path, monkeypatch, 0)
+    journal = RenameJournal(journal_path(tmp_path))
+    make_files(tmp_path / "other", "x.png")
+    rename_back_and_forth(tmp_path / "other", journal, 1)
+    assert journal.incomplete_batch(summary=True).count == len(CYCLE)
+    journal.resume()
+    assert contents(folder) == RENAMED_CONTENTS
+
+def test_summary_skips_operations(tmp_path):
+    folder = tmp_path / "images"
+    make_files(folder, "a.png")
+    journal = RenameJournal(journal_path(tmp_path))
+    rename_back_and_forth(folder, journal, 1)
+    batch = journal.last_committed_batch(summary=True)
+    assert batch.count == 1 and batch.ops == [] and batch.origin.count == 1
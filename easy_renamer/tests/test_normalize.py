@@ -0,0 +1,30 @@
+import unicodedata
+
+import pytest
+
+from core.normalize import normalize_string, normalize_prompt
+
+def previous_normalize(s):
+    """MetadataParser.normalize_stringにあった元の実装"""
+    s = unicodedata.normalize("NFC", s.replace("\x00", ""))
+    s = "".join(c for c in s if unicodedata.category(c) not in ("Cc", "Cf"))
+    return " ".join(s.split()).strip()
+
+@pytest.mark.parametrize("text", [
+    "  masterpiece  ",
+    "1girl\x00",
+    "a\tb\x7fc",
+    "ｶﾞ が",
+    "(smile:1.2)\u200b",
+    "少女 笑顔",
+    "\U000E0041tag",
+])
+def test_normalize_string_matches_previous(text):
+    assert normalize_string(text) == previous_normalize(text)
+
+def test_normalize_prompt_splits_and_normalizes():
+    assert normalize_prompt("masterpiece,\n1girl , 少女\r\n笑顔,,") == ["masterpiece", "1girl", "少女 笑顔"]
+
+def test_words_empty_after_normalization_are_dropped():
+    # 以前は空文字列として残っていた（空かどうかを正規化の前に判定していた）
+    assert normalize_prompt("1girl, \u200b, \x00,smile") == ["1girl", "smile"]
@@ -0,0 +1,136 @@
+import os
+
+import pytest
+
+from core.executor import execute_plan
+from core.plan import (build_plan, suffixed_path, SUFFIX, SKIP, OVERWRITE, PENDING, UNCHANGED, SKIPPED,
+                       RENAMED)
+from tests.conftest import make_files, contents
+
+def run(plan):
+    return list(execute_plan(plan))
+
+def rename_pairs(folder, pairs):
+    return [(os.path.join(folder, source), os.path.join(folder, target)) for source, target in pairs]
+
+def test_swap(tmp_path, dir_fd):
+    make_files(tmp_path, "a.png", "b.png")
+    plan = build_plan(rename_pairs(tmp_path, [("a.png", "b.png"), ("b.png", "a.png")]))
+    assert [op.status for op in plan.ops] == [PENDING, PENDING]
+    assert len(plan.cycles) == 1
+    run(plan)
+    assert contents(tmp_path) == {"a.png": "b.png", "b.png": "a.png"}
+    assert all(op.status == RENAMED for op in plan.ops)
+
+def test_three_cycle(tmp_path, dir_fd):
+    make_files(tmp_path, "a.png", "b.png", "c.png")
+    plan = build_plan(rename_pairs(tmp_path, [("a.png", "b.png"), ("b.png", "c.png"), ("c.png", "a.png")]))
+    assert sorted(plan.cycles[0]) == [0, 1, 2]
+    run(plan)
+    assert contents(tmp_path) == {"b.png": "a.png", "c.png": "b.png", "a.png": "c.png"}
+
+def test_chain(tmp_path, dir_fd):
+    make_files(tmp_path, "001.png", "002.png")
+    plan = build_plan(rename_pairs(tmp_path, [("001.png", "002.png"), ("002.png", "003.png")]))
+    # 名前を空ける側（002→003）から実行し、番号は付けない
+    assert plan.order == [1, 0]
+    assert not plan.cycles
+    assert all(op.reason is None for op in plan.ops)
+    run(plan)
+    assert contents(tmp_path) == {"002.png": "001.png", "003.png": "002.png"}
+
+def test_chain_across_folders(tmp_path, dir_fd):
+    make_files(tmp_path, "x/a.png", "y/a.png")
+    plan = build_plan([(str(tmp_path / "x" / "a.png"), str(tmp_path / "y" / "b.png")),
+                       (str(tmp_path / "y" / "a.png"), str(tmp_path / "x" / "a.png"))])
+    run(plan)
+    assert contents(tmp_path / "x") == {"a.png": "y/a.png"}
+    assert contents(tmp_path / "y") == {"b.png": "x/a.png"}
+
+def test_case_only(tmp_path, dir_fd):
+    make_files(tmp_path, "a.png")
+    plan = build_plan(rename_pairs(tmp_path, [("a.png", "A.png")]))
+    assert plan.ops[0].status == PENDING
+    run(plan)
+    assert contents(tmp_path) == {"A.png": "a.png"}
+
+def test_case_only_on_case_insensitive_keys(tmp_path, dir_fd, monkeypatch):
+    """Windowsと同じく大文字小文字を区別しない場合は、一時名を経由してリネームする"""
+    monkeypatch.setattr(os.path, "normcase", str.lower)
+    make_files(tmp_path, "a.png", "b.png")
+    plan = build_plan(rename_pairs(tmp_path, [("a.png", "A.png"), ("b.png", "b.png")]))
+    assert plan.ops[0].case_only
+    assert plan.ops[1].status == UNCHANGED
+    run(plan)
+    assert plan.ops[0].temp is not None
+    assert contents(tmp_path) == {"A.png": "a.png", "b.png": "b.png"}
+
+@pytest.mark.parametrize("policy", [SUFFIX, SKIP, OVERWRITE])
+def test_conflict_in_plan(tmp_path, policy):
+    make_files(tmp_path, "a.png", "b.png")
+    plan = build_plan(rename_pairs(tmp_path, [("a.png", "x.png"), ("b.png", "x.png")]), policy)
+    run(plan)
+    if policy == SKIP:
+        assert plan.ops[1].status == SKIPPED
+        assert contents(tmp_path) == {"x.png": "a.png", "b.png": "b.png"}
+    else:
+        # 計画内どうしの重複はOVERWRITEでも番号で解決する（計画した画像を失わない）
+        assert plan.ops[1].reason == "suffixed"
+        assert not plan.ops[1].overwrite
+        assert contents(tmp_path) == {"x.png": "a.png", "x (2).png": "b.png"}
+
+@pytest.mark.parametrize("policy", [SUFFIX, SKIP, OVERWRITE])
+def test_conflict_on_disk(tmp_path, policy):
+    make_files(tmp_path, "a.png", "x.png", "x (2).png")
+    plan = build_plan(rename_pairs(tmp_path, [("a.png", "x.png")]), policy)
+    run(plan)
+    if policy == SUFFIX:
+        assert plan.ops[0].target == str(tmp_path / "x (3).png")
+        assert contents(tmp_path) == {"x.png": "x.png", "x (2).png": "x (2).png", "x (3).png": "a.png"}
+    elif policy == SKIP:
+        assert plan.ops[0].status == SKIPPED
+        assert contents(tmp_path) == {"a.png": "a.png", "x.png": "x.png", "x (2).png": "x (2).png"}
+    else:
+        assert plan.ops[0].overwrite
+        assert contents(tmp_path) == {"x.png": "a.png", "x (2).png": "x (2).png"}
+
+@pytest.mark.parametrize("policy", [SUFFIX, SKIP, OVERWRITE])
+def test_unchanged_blocks_target(tmp_path, policy):
+    """後から名前が変わらないと分かった画像の名前は、先に決めた操作に使わせない"""
+    make_files(tmp_path, "a.png", "b.png")
+    plan = build_plan(rename_pairs(tmp_path, [("b.png", "a.png"), ("a.png", "a.png")]), policy)
+    assert plan.ops[1].status == UNCHANGED
+    run(plan)
+    if policy == SKIP:
+        assert plan.ops[0].status == SKIPPED
+        assert contents(tmp_path) == {"a.png": "a.png", "b.png": "b.png"}
+    else:
+        assert plan.ops[0].target == str(tmp_path / "a (2).png")
+        assert contents(tmp_path) == {"a.png": "a.png", "a (2).png": "b.png"}
+
+def test_skipped_blocks_chain(tmp_path):
+    """スキップした画像が元の名前に残る場合、その名前への連鎖もスキップする"""
+    make_files(tmp_path, "b.png", "c.png", "x.png")
+    plan = build_plan(rename_pairs(tmp_path, [("b.png", "c.png"), ("c.png", "x.png")]), SKIP)
+    assert [op.status for op in plan.ops] == [SKIPPED, SKIPPED]
+    run(plan)
+    assert contents(tmp_path) == {"b.png": "b.png", "c.png": "c.png", "x.png": "x.png"}
+
+def test_unknown_policy():
+    with pytest.raises(ValueError):
+        build_plan([], "replace")
+
+@pytest.mark.parametrize("name, expected", [
+    ("x.png", "x (2).png"),
+    ("x.tar.gz", "x.tar (2).gz"),
+    (".png", " (2).png"),
+    ("noext", "noext (2)"),
+])
+def test_suffixed_path_keeps_extension(tmp_path, name, expected):
+    assert suffixed_path(str(tmp_path / name), 2) == str(tmp_path / expected)
+
+def test_suffix_for_extension_only_name(tmp_path):
+    make_files(tmp_path, "a.png", ".png")
+    plan = build_plan(rename_pairs(tmp_path, [("a.png", ".png")]))
+    run(plan)
+    assert contents(tmp_path) == {".png": ".png", " (2).png": "a.png"}
@@ -0,0 +1,105 @@
+import struct
+import zlib
+
+import pytest
+
+from core.prompt_reader import read_prompt, parse_parameters, PNG_SIGNATURE
+
+PARAMETERS = "1girl, 少女\nNegative prompt: lowres\nSteps: 20, Sampler: Euler a, CFG scale: 7"
+
+def chunk(chunk_type, data):
+    return struct.pack(">I", len(data)) + chunk_type + data + struct.pack(">I", zlib.crc32(chunk_type + data))
+
+def png(*chunks):
+    """IHDRと指定のチャンク、画素データの代わりのIDAT、IENDだけのPNG"""
+    ihdr = chunk(b"IHDR", struct.pack(">IIBBBBB", 1, 1, 8, 2, 0, 0, 0))
+    return PNG_SIGNATURE + ihdr + b"".join(chunks) + chunk(b"IDAT", b"\x00" * 64) + chunk(b"IEND", b"")
+
+def write(tmp_path, data, name="image.png"):
+    path = tmp_path / name
+    path.write_bytes(data)
+    return str(path)
+
+def test_png_text(tmp_path):
+    text = "masterpiece, café\nSteps: 20"
+    path = write(tmp_path, png(chunk(b"tEXt", b"parameters\x00" + text.encode("latin-1"))))
+    assert read_prompt(path) == ("text", text)
+
+@pytest.mark.parametrize("compressed", [0, 1])
+def test_png_itxt(tmp_path, compressed):
+    text = PARAMETERS.encode("utf-8")
+    if compressed:
+        text = zlib.compress(text)
+    data = b"parameters\x00" + bytes([compressed, 0]) + b"ja\x00parameters\x00" + text
+    path = write(tmp_path, png(chunk(b"iTXt", data)))
+    assert read_prompt(path) == ("text", PARAMETERS)
+
+def test_png_ztxt(tmp_path):
+    text = "masterpiece, 1girl"
+    data = b"parameters\x00\x00" + zlib.compress(text.encode("latin-1"))
+    path = write(tmp_path, png(chunk(b"zTXt", data)))
+    assert read_prompt(path) == ("text", text)
+
+def test_png_skips_other_keywords_and_broken_chunks(tmp_path):
+    path = write(tmp_path, png(
+        chunk(b"tEXt", b"Software\x00editor"),
+        chunk(b"zTXt", b"parameters\x00\x00not zlib"),
+        chunk(b"tEXt", b"no separator"),
+        chunk(b"tEXt", b"parameters\x00found"),
+    ))
+    assert read_prompt(path) == ("text", "found")
+
+def test_png_exif_chunk(tmp_path):
+    path = write(tmp_path, png(chunk(b"eXIf", b"II*\x00exif")))
+    assert read_prompt(path) == ("exif", b"II*\x00exif")
+
+def test_png_without_prompt(tmp_path):
+    assert read_prompt(write(tmp_path, png())) is None
+    assert read_prompt(write(tmp_path, png()[:40])) is None  # 途中で切れたファイル
+
+def segment(marker, data):
+    return b"\xff" + bytes([marker]) + struct.pack(">H", len(data) + 2) + data
+
+def test_jpeg_app1_exif(tmp_path):
+    data = (b"\xff\xd8" + segment(0xE0, b"JFIF\x00\x01\x01") + b"\xff\xff"  # フィルバイト
+            + segment(0xE1, b"Exif\x00\x00II*\x00exif") + segment(0xDA, b"\x00" * 8) + b"\xff\xd9")
+    assert read_prompt(write(tmp_path, data, "image.jpg")) == ("exif", b"II*\x00exif")
+
+def test_jpeg_header_only(tmp_path):
+    # 画像データが無くても（ヘッダーだけでも）APP1を読める
+    data = b"\xff\xd8" + segment(0xE1, b"Exif\x00\x00MM\x00*")
+    assert read_prompt(write(tmp_path, data, "image.jpg")) == ("exif", b"MM\x00*")
+
+@pytest.mark.parametrize("data", [
+    b"\xff\xd8" + segment(0xE1, b"http://ns.adobe.com/xap/1.0/\x00<x/>"),  # XMPのAPP1
+    b"\xff\xd8" + segment(0xDA, b"\x00" * 8) + segment(0xE1, b"Exif\x00\x00II*\x00"),  # SOSより後
+    b"\xff\xd8\xff\xe1\x00",  # 長さの途中で切れている
+    b"\xff\xd8",
+])
+def test_jpeg_without_exif(tmp_path, data):
+    assert read_prompt(write(tmp_path, data, "image.jpg")) is None
+
+def test_unknown_format(tmp_path):
+    assert read_prompt(write(tmp_path, b"GIF89a", "image.gif")) is None
+
+def test_parse_parameters():
+    assert parse_parameters(PARAMETERS) == {
+        "prompt": "1girl, 少女",
+        "negative_prompt": "lowres",
+        "steps": "20",
+        "sampler": "Euler a",
+        "cfg_scale": "7",
+    }
+
+def test_parse_parameters_multiline_and_quoted_values():
+    text = ('masterpiece,\n1girl\nNegative prompt: lowres,\nbad hands\n'
+            'Steps: 30, Lora hashes: "a: 1, b: \\"2\\"", Hires upscaler: Latent, Size: 512x768')
+    fields = parse_parameters(text)
+    assert fields["prompt"] == "masterpiece,\n1girl"
+    assert fields["negative_prompt"] == "lowres,\nbad hands"
+    assert fields["lora_hashes"] == 'a: 1, b: "2"'
+    assert fields["hires_upscaler"] == "Latent"
+    assert fields["size"] == "512x768"
+
+def test_parse_parameters_without_settings_line():
+    assert parse_parameters("1girl, solo\n") == {"prompt": "1girl, solo", "negative_prompt": ""}
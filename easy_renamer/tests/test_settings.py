@@ -0,0 +1,98 @@
+import json
+import logging
+import os
+import stat
+
+import pytest
+
+from core.settings import Settings
+
+@pytest.fixture
+def settings(tmp_path, monkeypatch):
+    """tmp_pathのsettings.jsonを読む新しいSettings（プロセスで共有されるインスタンスは差し替える）"""
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(Settings, "_instance", None)
+    instance = Settings()
+    yield instance
+    instance.flush()
+    instance.dirty = False  # 終了時のflushで書き込まない
+    instance.word_store.close()
+
+def saved(path):
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+def test_flush_failure_keeps_changes(settings, monkeypatch, caplog):
+    settings.set_search_words(["a"])
+    settings.save_config()
+
+    def fail(config):
+        raise OSError(28, "No space left on device")
+
+    original_write = settings.write_config
+    monkeypatch.setattr(settings, "write_config", fail)
+    with caplog.at_level(logging.ERROR, logger="core.settings"):
+        settings.flush()
+    assert settings.dirty
+    assert "No space left on device" in caplog.text
+    assert not os.path.exists(settings.config_file)
+
+    # 次のflush（終了時など）で書き込まれる
+    monkeypatch.setattr(settings, "write_config", original_write)
+    settings.flush()
+    assert not settings.dirty
+    assert saved(settings.config_file)["search_words"] == ["a"]
+
+@pytest.mark.skipif(os.name == "nt", reason="POSIX permissions")
+def test_new_file_respects_umask(settings):
+    umask = os.umask(0o027)
+    try:
+        settings.set_search_words(["a"])
+        settings.save_config()
+        settings.flush()
+    finally:
+        os.umask(umask)
+    assert stat.S_IMODE(os.stat(settings.config_file).st_mode) == 0o640
+
+@pytest.mark.skipif(os.name == "nt", reason="POSIX permissions")
+def test_existing_file_keeps_mode(settings):
+    settings.set_search_words(["a"])
+    settings.save_config()
+    settings.flush()
+    os.chmod(settings.config_file, 0o604)
+    settings.set_search_words(["b"])
+    settings.save_config()
+    settings.flush()
+    assert stat.S_IMODE(os.stat(settings.config_file).st_mode) == 0o604
+    assert saved(settings.config_file)["search_words"] == ["b"]
+    assert saved(settings.config_file + ".bak.1")["search_words"] == ["a"]
+
+def test_word_map_moves_from_settings_json(tmp_path, monkeypatch):
+    """旧形式のsettings.json内のword_mapはストアに移してsettings.jsonから取り除く"""
+    with open(tmp_path / "settings.json", "w", encoding="utf-8") as f:
+        json.dump({"search_words": ["a"], "word_map": {"1girl": "少女", "smile": "笑顔"}}, f)
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(Settings, "_instance", None)
+    instance = Settings()
+    try:
+        assert dict(instance.get_word_map()) == {"1girl": "少女", "smile": "笑顔"}
+        assert instance.get_search_words() == ["a"]
+        config = saved(instance.config_file)
+        assert "word_map" not in config
+        assert config["search_words"] == ["a"]
+        digest = instance.word_map_hash()
+    finally:
+        instance.flush()
+        instance.dirty = False
+        instance.word_store.close()
+
+    # 移した後に起動し直しても同じ内容を読む
+    monkeypatch.setattr(Settings, "_instance", None)
+    instance = Settings()
+    try:
+        assert dict(instance.get_word_map()) == {"1girl": "少女", "smile": "笑顔"}
+        assert instance.word_map_hash() == digest
+    finally:
+        instance.flush()
+        instance.dirty = False
+        instance.word_store.close()
@@ -0,0 +1,70 @@
+import os
+from datetime import datetime
+
+import pytest
+
+from core.normalize import normalize_string
+from core.renamer import Renamer
+from core.template import compile_template, sanitize, TemplateError
+from core.word_matcher import WordMatcher
+
+PROMPT = "(masterpiece:1.2), 1girl\nBREAK ../../etc"
+
+def matcher(word_map=None):
+    return WordMatcher(word_map or {}, normalize_string)
+
+class FakeParser:
+    """parse_manyだけを持つMetadataParserの代わり"""
+
+    def __init__(self, fields):
+        self.fields = fields
+
+    def parse_many(self, image_paths, jobs=None):
+        for path in image_paths:
+            yield path, {}, self.fields
+
+def test_placeholder_values_are_sanitized():
+    template = compile_template("{prompt}_{date:%Y/%m}_{field:foo}", matcher(), now=datetime(2026, 10, 18))
+    name = template.render(0, "/x/a.png", {}, {"prompt": PROMPT, "foo": "a\\b"})
+    assert name == "(masterpiece_1.2), 1girl BREAK .._.._etc_2026_10_a_b"
+
+@pytest.mark.parametrize("value, expected", [
+    ('a<b>c:d"e/f\\g|h?i*j', "a_b_c_d_e_f_g_h_i_j"),
+    ("tab\there\r\nnext", "tab here  next"),
+    ("trailing. . ", "trailing"),
+    ("..", ""),
+])
+def test_sanitize(value, expected):
+    assert sanitize(value) == expected
+
+def test_word_tag_is_sanitized():
+    template = compile_template("{long hair} gr1", matcher({"long hair": "長い髪/ロング"}), "gr", "1")
+    assert template.render(0, "/x/a.png", {"long hair": "長い髪/ロング"}, {}) == "長い髪_ロング gr1"
+
+def test_render_names_stays_in_folder(tmp_path):
+    renamer = Renamer.__new__(Renamer)
+    renamer.metadata_parser = FakeParser({"prompt": PROMPT, "model": "../model"})
+    template = compile_template("{model} {prompt}", matcher())
+    path = str(tmp_path / "a.png")
+    [(source, target)] = renamer.render_names([path], template)
+    assert source == path
+    assert os.path.dirname(target) == str(tmp_path)
+    assert "\n" not in target
+
+def test_unknown_placeholder():
+    with pytest.raises(TemplateError) as info:
+        compile_template("{nope} {seed}", matcher())
+    assert info.value.unknown == ["nope"]
+
+def test_missing_word_tags_do_not_leave_spaces():
+    template = compile_template("{long hair} {seed} {smile} gr1", matcher({"long hair": "長髪", "smile": "笑顔"}), "gr", "1")
+    assert template.render(1, "/x/a.png", {}, {"seed": "2709900430"}) == "2709900430 gr2"
+    assert template.render(0, "/x/a.png", {"smile": "笑顔"}, {}) == "笑顔 gr1"
+
+def test_empty_name_keeps_original_stem(tmp_path):
+    renamer = Renamer.__new__(Renamer)
+    renamer.metadata_parser = FakeParser({})
+    template = compile_template("{long hair}", matcher({"long hair": "長髪"}))
+    path = str(tmp_path / "img.png")
+    [(_, target)] = renamer.render_names([path], template)
+    assert target == path
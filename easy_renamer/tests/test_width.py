@@ -0,0 +1,46 @@
+import pytest
+
+from utils.width import display_width, truncate_to_width, truncate_to_length, name_length
+
+@pytest.mark.parametrize("text, width", [
+    ("abc", 3),
+    ("少女", 4),
+    ("ｱｲｳ", 3),                   # 半角カナ
+    ("①②", 4),                   # 曖昧幅は全角
+    ("e\u0301", 1),               # 結合文字
+    ("\U0001F44D\U0001F3FD", 2),  # 肌の色の修飾子
+    ("\U0001F468\u200d\U0001F469\u200d\U0001F467", 2),  # ZWJで連結した絵文字
+    ("\U0001F1EF\U0001F1F5", 2),  # 国旗
+    ("\U00020B9F", 2),             # CJK統合漢字拡張B
+])
+def test_display_width(text, width):
+    assert display_width(text) == width
+
+@pytest.mark.parametrize("text, max_width, ellipsis, expected", [
+    ("abcdef", 4, "", "abcd"),
+    ("abcdef", 4, "…", "ab…"),  # 三点リーダーは曖昧幅なので全角
+    ("abc", 3, "…", "abc"),
+    ("少女笑顔", 5, "", "少女"),
+    ("少女笑顔", 6, "…", "少女…"),
+    ("abc\u00e9", 4, "", "abc"),  # é（合成済み）は曖昧幅
+    ("abce\u0301", 4, "", "abce\u0301"),  # 幅0の結合文字は収まる
+    ("a\u0915\u093f", 2, "", "a"),  # 幅のある結合文字（Mc）を基底の文字から切り離さない
+    ("a\U0001F468\u200d\U0001F469b", 3, "", "a\U0001F468\u200d\U0001F469"),  # ZWJ連結は全体で1文字分の幅
+    ("a\U0001F1EF\U0001F1F5\U0001F1FA\U0001F1F8", 4, "", "a\U0001F1EF\U0001F1F5"),  # 国旗（地域指示子2文字）を分けない
+])
+def test_truncate_to_width(text, max_width, ellipsis, expected):
+    result = truncate_to_width(text, max_width, ellipsis)
+    assert result == expected
+    assert display_width(result) <= max_width
+
+def test_truncate_to_length_counts_encoded_units():
+    text = "少女" * 100
+    result = truncate_to_length(text, 100, "…")
+    assert name_length(result) <= 100
+    assert result.endswith("…")
+    assert text.startswith(result[:-1])
+
+def test_truncate_to_length_keeps_clusters():
+    text = "e\u0301" * 10
+    result = truncate_to_length(text, name_length("e\u0301" * 3) + 1)
+    assert result == "e\u0301" * 3
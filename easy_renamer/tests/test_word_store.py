@@ -0,0 +1,76 @@
+import pytest
+
+from core.word_store import WordStore, EMPTY_DIGEST, entry_digest
+
+def full_digest(word_map):
+    """全件から計算し直したハッシュ（差分で更新したものと一致するはず）"""
+    digest = 0
+    for en, jp in word_map.items():
+        digest ^= entry_digest(en, jp)
+    return f"{digest:040x}"
+
+@pytest.fixture
+def store(tmp_path):
+    store = WordStore(str(tmp_path / "words.sqlite3"))
+    yield store
+    store.close()
+
+def test_digest_follows_changes(store):
+    assert store.digest() == EMPTY_DIGEST
+    store.update({"1girl": "少女", "smile": "笑顔", "solo": "ソロ"})
+    assert store.digest() == full_digest(store)
+    store["smile"] = "微笑み"
+    del store["solo"]
+    store["cat"] = "猫"
+    assert store.digest() == full_digest({"1girl": "少女", "smile": "微笑み", "cat": "猫"})
+    store.clear()
+    assert store.digest() == full_digest({})
+
+def test_digest_ignores_order_and_no_op_writes(tmp_path, store):
+    store.update({"a": "あ", "b": "い"})
+    digest = store.digest()
+    assert store.apply({"a": "あ"}, removed=["missing"]) == ([], {})
+    assert store.digest() == digest
+    other = WordStore(str(tmp_path / "other.sqlite3"))
+    other.update({"b": "い", "a": "あ"})
+    assert other.digest() == digest
+    other.close()
+
+def test_digest_distinguishes_key_and_value(store):
+    store["ab"] = "c"
+    digest = store.digest()
+    store.replace({"a": "bc"})
+    assert store.digest() != digest
+
+def test_contents_persist_in_insertion_order(tmp_path, store):
+    store.update({"z": "1", "a": "2"})
+    store["z"] = "3"  # 変更しても位置は変わらない
+    reopened = WordStore(store.db_path)
+    assert list(reopened.items()) == [("z", "3"), ("a", "2")]
+    assert reopened.digest() == store.digest()
+    reopened.close()
+
+def test_on_change_reports_only_real_changes(tmp_path):
+    calls = []
+    store = WordStore(str(tmp_path / "words.sqlite3"), lambda removed, changed: calls.append((removed, changed)))
+    store.update({"a": "あ", "b": "い"})
+    store.replace({"a": "あ", "c": "う"})
+    store.replace({"a": "あ", "c": "う"})
+    store.close()
+    assert calls == [([], {"a": "あ", "b": "い"}), (["b"], {"c": "う"})]
+
+@pytest.mark.parametrize("name", ["words.csv", "words.tsv"])
+def test_import_export_round_trip(tmp_path, store, name):
+    store.update({"1girl": "少女", "a, b": "\"引用\""})
+    path = str(tmp_path / name)
+    assert store.export_file(path) == 2
+    store.clear()
+    store["old"] = "古い"
+    assert store.import_file(path, replace=True) == 3
+    assert dict(store) == {"1girl": "少女", "a, b": "\"引用\""}
+
+def test_read_table_skips_bom_header_and_short_rows(tmp_path, store):
+    path = tmp_path / "words.csv"
+    path.write_bytes("\ufeff英語,日本語\n1girl,少女\n\nonly\n ,空\n".encode("utf-8"))
+    store.import_file(str(path))
+    assert dict(store) == {"1girl": "少女"}